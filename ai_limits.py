@@ -0,0 +1,216 @@
+"""
+AI Provider Limits
+Per-provider caps on AI API calls: how many requests may be in flight at once and how many
+may start in any 60 second window. Every job calling a provider goes through the same limiter,
+so concurrent per-page extractions (and concurrent uploads) stay within the account limits.
+request() blocks the calling thread, request_async() only suspends the calling coroutine
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Tuple
+
+
+# Finestra del limite di richieste al minuto (secondi)
+RATE_WINDOW_SECONDS = 60.0
+
+
+def parse_provider_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Per-provider overrides from "key=concurrency/rpm,..." (e.g. "gemini=8/60,claude=4/50";
+    rpm may be omitted, 0 means unlimited). Returns {provider_key: (concurrency, rpm)}
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        key, _, value = item.partition('=')
+        concurrency, _, rpm = value.partition('/')
+        limits[key.strip()] = (int(concurrency), int(rpm or 0))
+    return limits
+
+
+class _SlotWaiter:
+    """A thread or coroutine queued for a concurrency slot (wake is called once the slot is handed over)"""
+    __slots__ = ('wake', 'granted')
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+
+
+def _resolve_waiter(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ProviderLimiter:
+    """Concurrency slots and a sliding-window requests-per-minute budget for one provider"""
+
+    def __init__(self, max_concurrency: int = 4, requests_per_minute: int = 0):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.requests_per_minute = requests_per_minute
+        self._lock = threading.Lock()
+        # Slot condivisi tra thread (request) e coroutine (request_async): chi rilascia
+        # passa lo slot al primo in coda, svegliandolo con un Event o sul suo event loop
+        self._slots_used = 0
+        self._slot_waiters = deque()
+        self._starts = deque()  # monotonic start times of the requests in the current window
+        self._in_flight = 0
+        self.stats = {
+            'requests': 0,
+            'max_in_flight': 0,
+            'rate_waits': 0,
+            'rate_wait_seconds': 0.0
+        }
+
+    @contextmanager
+    def request(self):
+        """Hold a concurrency slot and a rate token for the duration of one API call"""
+        self._acquire_slot()
+        try:
+            while True:
+                delay = self._reserve_rate()
+                if not delay:
+                    break
+                time.sleep(delay)
+            self._start()
+            try:
+                yield
+            finally:
+                self._finish()
+        finally:
+            self._release_slot()
+
+    @asynccontextmanager
+    async def request_async(self):
+        """request() for coroutines: waits for the slot and the rate token without blocking the event loop"""
+        await self._acquire_slot_async()
+        try:
+            while True:
+                delay = self._reserve_rate()
+                if not delay:
+                    break
+                await asyncio.sleep(delay)
+            self._start()
+            try:
+                yield
+            finally:
+                self._finish()
+        finally:
+            self._release_slot()
+
+    def _take_slot(self, wake):
+        """Take a free slot (returns None) or queue a waiter that gets the next released one"""
+        with self._lock:
+            if self._slots_used < self.max_concurrency and not self._slot_waiters:
+                self._slots_used += 1
+                return None
+            waiter = _SlotWaiter(wake)
+            self._slot_waiters.append(waiter)
+            return waiter
+
+    def _acquire_slot(self):
+        event = threading.Event()
+        if self._take_slot(event.set) is not None:
+            event.wait()
+
+    async def _acquire_slot_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = self._take_slot(lambda: self._wake_async(loop, future))
+        if waiter is None:
+            return
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._slot_waiters.remove(waiter)
+            if granted:
+                # Lo slot era già stato passato a questa coroutine: va al prossimo in coda
+                self._release_slot()
+            raise
+
+    def _wake_async(self, loop, future):
+        try:
+            loop.call_soon_threadsafe(_resolve_waiter, future)
+        except RuntimeError:
+            # Event loop chiuso: nessuno userà lo slot
+            self._release_slot()
+
+    def _release_slot(self):
+        """Hand the slot to the first queued waiter, or free it"""
+        with self._lock:
+            if not self._slot_waiters:
+                self._slots_used -= 1
+                return
+            waiter = self._slot_waiters.popleft()
+            waiter.granted = True
+        waiter.wake()
+
+    def _reserve_rate(self) -> float:
+        """Take a rate token: 0 if the request may start now, else the seconds to wait before retrying"""
+        if self.requests_per_minute <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            while self._starts and now - self._starts[0] >= RATE_WINDOW_SECONDS:
+                self._starts.popleft()
+            if len(self._starts) < self.requests_per_minute:
+                self._starts.append(now)
+                return 0.0
+            delay = RATE_WINDOW_SECONDS - (now - self._starts[0])
+            self.stats['rate_waits'] += 1
+            self.stats['rate_wait_seconds'] = round(self.stats['rate_wait_seconds'] + delay, 3)
+            return delay
+
+    def _start(self):
+        with self._lock:
+            self._in_flight += 1
+            self.stats['requests'] += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self._in_flight)
+
+    def _finish(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'requests_per_minute': self.requests_per_minute,
+                'in_flight': self._in_flight,
+                **self.stats
+            }
+
+
+class ProviderLimits:
+    def __init__(self, max_concurrency: int = 4, requests_per_minute: int = 0,
+                 overrides: Dict[str, Tuple[int, int]] = None):
+        """Initialize with the default limits and per-provider (concurrency, rpm) overrides"""
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.overrides = overrides or {}
+        self._lock = threading.Lock()
+        self._limiters = {}  # provider_key -> ProviderLimiter
+
+    def get(self, provider_key: str) -> ProviderLimiter:
+        """Limiter shared by all calls to a provider"""
+        with self._lock:
+            limiter = self._limiters.get(provider_key)
+            if limiter is None:
+                concurrency, rpm = self.overrides.get(provider_key,
+                                                      (self.max_concurrency, self.requests_per_minute))
+                limiter = ProviderLimiter(concurrency, rpm)
+                self._limiters[provider_key] = limiter
+            return limiter
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {provider_key: limiter.get_stats() for provider_key, limiter in limiters.items()}
@@ -6,18 +6,83 @@ Supported providers:
 - OpenAI - GPT-4.1 (latest model with enhanced vision for technical drawings - 20250414)
 - Google Gemini 2.5 Pro
 - Novita AI (Qwen 3 VL 235B - Thinking)
+
+Every provider also has an asyncio interface (analyze_text_async, analyze_vision_async,
+chat_async and the batch analyze_vision_many): native async SDK clients for Claude, OpenAI
+and Novita, the blocking call in a worker thread for Gemini. An async client lives for one
+async_session() block (a batch, a job) and is closed with its connections at the end
 """
 
 import os
 import json
+import asyncio
+import contextvars
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
 from typing import Optional, Dict, Any, Union, List
 
+# Requests in flight at once in analyze_vision_many (default)
+VISION_MANY_CONCURRENCY = 8
+
+
+def _claude_vision_content(prompt: str, image_base64: Union[str, List[str]]) -> List[Dict]:
+    """Claude message content: the images (base64 PNG), then the prompt"""
+    # Convert single image to list for uniform processing
+    images = [image_base64] if isinstance(image_base64, str) else image_base64
+
+    content = []
+    for img in images:
+        # Remove data URL prefix if present
+        if ',' in img:
+            img = img.split(',')[1]
+
+        content.append({
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": "image/png",
+                "data": img
+            }
+        })
+
+    # Add prompt text at the end
+    content.append({
+        "type": "text",
+        "text": prompt
+    })
+    return content
+
+
+def _openai_vision_content(prompt: str, image_base64: Union[str, List[str]]) -> List[Dict]:
+    """OpenAI-compatible message content: the prompt, then the images as data URLs"""
+    # Convert single image to list for uniform processing
+    images = [image_base64] if isinstance(image_base64, str) else image_base64
+
+    content = [{"type": "text", "text": prompt}]
+    for img in images:
+        # Ensure proper data URL format
+        if not img.startswith('data:'):
+            img = f"data:image/png;base64,{img}"
+
+        content.append({
+            "type": "image_url",
+            "image_url": {"url": img}
+        })
+    return content
+
+
+def _chat_messages(messages: list) -> list:
+    """Keep only well-formed {'role', 'content'} messages (OpenAI-compatible APIs)"""
+    return [msg for msg in messages if isinstance(msg, dict) and 'role' in msg and 'content' in msg]
+
+
 class AIProvider(ABC):
     """Abstract base class for AI providers"""
 
     def __init__(self, api_key: str):
         self.api_key = api_key
+        # Client of the async_session() block the current task runs in
+        self._session_client = contextvars.ContextVar(f"{type(self).__name__}_async_client", default=None)
 
     @abstractmethod
     def analyze_text(self, prompt: str, text: str) -> str:
@@ -49,10 +114,74 @@ class AIProvider(ABC):
         """Get provider capabilities"""
         pass
 
+    def _create_async_client(self):
+        """Async SDK client (providers with a native async API override this)"""
+        return None
+
+    @asynccontextmanager
+    async def async_session(self):
+        """
+        One async SDK client shared by the async calls made inside the block (and by the tasks
+        they start), closed at exit together with its connections. Nested blocks reuse it
+        """
+        if self._session_client.get() is not None:
+            yield
+            return
+        client = self._create_async_client()
+        if client is None:
+            yield
+            return
+
+        token = self._session_client.set(client)
+        try:
+            yield
+        finally:
+            self._session_client.reset(token)
+            await client.close()
+
+    @asynccontextmanager
+    async def _async_client(self):
+        """Client of the enclosing async_session(), or one for this call only"""
+        client = self._session_client.get()
+        if client is not None:
+            yield client
+            return
+        async with self.async_session():
+            yield self._session_client.get()
+
+    async def analyze_text_async(self, prompt: str, text: str) -> str:
+        """Async analyze_text (default: the blocking call in a worker thread)"""
+        return await asyncio.to_thread(self.analyze_text, prompt, text)
+
+    async def analyze_vision_async(self, prompt: str, image_base64: Union[str, List[str]]) -> str:
+        """Async analyze_vision (default: the blocking call in a worker thread)"""
+        return await asyncio.to_thread(self.analyze_vision, prompt, image_base64)
+
+    async def chat_async(self, messages: list) -> str:
+        """Async chat (default: the blocking call in a worker thread)"""
+        return await asyncio.to_thread(self.chat, messages)
+
+    async def analyze_vision_many(self, prompt: str, images: List[Union[str, List[str]]],
+                                  max_concurrency: int = VISION_MANY_CONCURRENCY) -> List[Union[str, Exception]]:
+        """
+        One vision request per entry of images (an image or a list of images), at most
+        max_concurrency in flight. Results in input order; a failed request gives its exception
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def analyze(image):
+            async with semaphore:
+                return await self.analyze_vision_async(prompt, image)
+
+        async with self.async_session():
+            return await asyncio.gather(*(analyze(image) for image in images), return_exceptions=True)
+
 
 class ClaudeProvider(AIProvider):
     """Claude (Anthropic) provider"""
 
+    MODEL = "claude-opus-4-1-20250805"
+
     def __init__(self, api_key: str):
         super().__init__(api_key)
         self.client = None
@@ -63,72 +192,58 @@ class ClaudeProvider(AIProvider):
             except ImportError:
                 print("Warning: anthropic package not installed")
 
-    def analyze_text(self, prompt: str, text: str) -> str:
-        if not self.client:
-            raise Exception("Claude client not initialized")
+    def _create_async_client(self):
+        from anthropic import AsyncAnthropic
+        return AsyncAnthropic(api_key=self.api_key)
 
-        message = self.client.messages.create(
-            model="claude-opus-4-1-20250805",
-            max_tokens=4096,
-            temperature=1.0,
-            messages=[{
-                "role": "user",
-                "content": f"{prompt}\n\n{text}"
-            }]
-        )
-        return message.content[0].text
-
-    def analyze_vision(self, prompt: str, image_base64: Union[str, List[str]]) -> str:
+    def _request(self, messages: list) -> Dict[str, Any]:
+        """messages.create arguments (shared by the sync and async calls)"""
         if not self.client:
             raise Exception("Claude client not initialized")
+        return {
+            "model": self.MODEL,
+            "max_tokens": 4096,
+            "temperature": 1.0,
+            "messages": messages
+        }
 
-        # Convert single image to list for uniform processing
-        images = [image_base64] if isinstance(image_base64, str) else image_base64
+    def _text_messages(self, prompt: str, text: str) -> list:
+        return [{"role": "user", "content": f"{prompt}\n\n{text}"}]
 
-        # Build content array with all images
-        content = []
+    def _vision_messages(self, prompt: str, image_base64: Union[str, List[str]]) -> list:
+        return [{"role": "user", "content": _claude_vision_content(prompt, image_base64)}]
 
-        for img in images:
-            # Remove data URL prefix if present
-            if ',' in img:
-                img = img.split(',')[1]
+    def analyze_text(self, prompt: str, text: str) -> str:
+        request = self._request(self._text_messages(prompt, text))
+        message = self.client.messages.create(**request)
+        return message.content[0].text
 
-            content.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": "image/png",
-                    "data": img
-                }
-            })
+    def analyze_vision(self, prompt: str, image_base64: Union[str, List[str]]) -> str:
+        request = self._request(self._vision_messages(prompt, image_base64))
+        message = self.client.messages.create(**request)
+        return message.content[0].text
 
-        # Add prompt text at the end
-        content.append({
-            "type": "text",
-            "text": prompt
-        })
+    def chat(self, messages: list) -> str:
+        request = self._request(messages)
+        message = self.client.messages.create(**request)
+        return message.content[0].text
 
-        message = self.client.messages.create(
-            model="claude-opus-4-1-20250805",
-            max_tokens=4096,
-            temperature=1.0,
-            messages=[{
-                "role": "user",
-                "content": content
-            }]
-        )
+    async def analyze_text_async(self, prompt: str, text: str) -> str:
+        request = self._request(self._text_messages(prompt, text))
+        async with self._async_client() as client:
+            message = await client.messages.create(**request)
         return message.content[0].text
 
-    def chat(self, messages: list) -> str:
-        if not self.client:
-            raise Exception("Claude client not initialized")
+    async def analyze_vision_async(self, prompt: str, image_base64: Union[str, List[str]]) -> str:
+        request = self._request(self._vision_messages(prompt, image_base64))
+        async with self._async_client() as client:
+            message = await client.messages.create(**request)
+        return message.content[0].text
 
-        message = self.client.messages.create(
-            model="claude-opus-4-1-20250805",
-            max_tokens=4096,
-            temperature=1.0,
-            messages=messages
-        )
+    async def chat_async(self, messages: list) -> str:
+        request = self._request(messages)
+        async with self._async_client() as client:
+            message = await client.messages.create(**request)
         return message.content[0].text
 
     def is_available(self) -> bool:
@@ -146,101 +261,19 @@ class ClaudeProvider(AIProvider):
         }
 
 
-class ClaudeSonnetProvider(AIProvider):
+class ClaudeSonnetProvider(ClaudeProvider):
     """Claude Sonnet 4.5 (Anthropic) provider - Best for coding and complex agents"""
 
-    def __init__(self, api_key: str):
-        super().__init__(api_key)
-        self.client = None
-        if api_key:
-            try:
-                from anthropic import Anthropic
-                self.client = Anthropic(api_key=api_key)
-            except ImportError:
-                print("Warning: anthropic package not installed")
-
-    def analyze_text(self, prompt: str, text: str) -> str:
-        if not self.client:
-            raise Exception("Claude Sonnet client not initialized")
-
-        message = self.client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=4096,
-            temperature=1.0,
-            messages=[{
-                "role": "user",
-                "content": f"{prompt}\n\n{text}"
-            }]
-        )
-        return message.content[0].text
-
-    def analyze_vision(self, prompt: str, image_base64: Union[str, List[str]]) -> str:
-        if not self.client:
-            raise Exception("Claude Sonnet client not initialized")
-
-        # Convert single image to list for uniform processing
-        images = [image_base64] if isinstance(image_base64, str) else image_base64
-
-        # Build content array with all images
-        content = []
-
-        for img in images:
-            # Remove data URL prefix if present
-            if ',' in img:
-                img = img.split(',')[1]
-
-            content.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": "image/png",
-                    "data": img
-                }
-            })
-
-        # Add prompt text at the end
-        content.append({
-            "type": "text",
-            "text": prompt
-        })
-
-        message = self.client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=4096,
-            temperature=1.0,
-            messages=[{
-                "role": "user",
-                "content": content
-            }]
-        )
-        return message.content[0].text
+    MODEL = "claude-sonnet-4-5-20250929"
 
-    def chat(self, messages: list) -> str:
+    def _request(self, messages: list) -> Dict[str, Any]:
         if not self.client:
             raise Exception("Claude Sonnet client not initialized")
-
-        message = self.client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=4096,
-            temperature=1.0,
-            messages=messages
-        )
-        return message.content[0].text
-
-    def is_available(self) -> bool:
-        return self.client is not None
+        return super()._request(messages)
 
     def get_name(self) -> str:
         return "Claude Sonnet 4.5"
 
-    def get_capabilities(self) -> Dict[str, bool]:
-        return {
-            "text_analysis": True,
-            "vision_analysis": True,
-            "chat": True,
-            "dimension_extraction": True
-        }
-
 
 class OpenAIProvider(AIProvider):
     """OpenAI (GPT-4.1) provider - Latest model with enhanced vision for technical drawings"""
@@ -255,68 +288,61 @@ class OpenAIProvider(AIProvider):
             except ImportError:
                 print("Warning: openai package not installed")
 
-    def analyze_text(self, prompt: str, text: str) -> str:
+    def _create_async_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key)
+
+    def _request(self, messages: list) -> Dict[str, Any]:
+        """chat.completions.create arguments (shared by the sync and async calls)"""
         if not self.client:
             raise Exception("OpenAI client not initialized")
+        return {
+            "model": "gpt-4.1-2025-04-14",
+            "messages": messages,
+            "max_tokens": 4096,
+            "temperature": 0.7
+        }
 
-        response = self.client.chat.completions.create(
-            model="gpt-4.1-2025-04-14",
-            messages=[
-                {"role": "system", "content": "You are a helpful AI assistant analyzing PDF documents."},
-                {"role": "user", "content": f"{prompt}\n\n{text}"}
-            ],
-            max_tokens=4096,
-            temperature=0.7
-        )
+    def _text_messages(self, prompt: str, text: str) -> list:
+        return [
+            {"role": "system", "content": "You are a helpful AI assistant analyzing PDF documents."},
+            {"role": "user", "content": f"{prompt}\n\n{text}"}
+        ]
+
+    def _vision_messages(self, prompt: str, image_base64: Union[str, List[str]]) -> list:
+        return [{"role": "user", "content": _openai_vision_content(prompt, image_base64)}]
+
+    def analyze_text(self, prompt: str, text: str) -> str:
+        request = self._request(self._text_messages(prompt, text))
+        response = self.client.chat.completions.create(**request)
         return response.choices[0].message.content
 
     def analyze_vision(self, prompt: str, image_base64: Union[str, List[str]]) -> str:
-        if not self.client:
-            raise Exception("OpenAI client not initialized")
-
-        # Convert single image to list for uniform processing
-        images = [image_base64] if isinstance(image_base64, str) else image_base64
+        request = self._request(self._vision_messages(prompt, image_base64))
+        response = self.client.chat.completions.create(**request)
+        return response.choices[0].message.content
 
-        # Build content array
-        content = [{"type": "text", "text": prompt}]
+    def chat(self, messages: list) -> str:
+        request = self._request(_chat_messages(messages))
+        response = self.client.chat.completions.create(**request)
+        return response.choices[0].message.content
 
-        for img in images:
-            # Ensure proper data URL format
-            if not img.startswith('data:'):
-                img = f"data:image/png;base64,{img}"
-
-            content.append({
-                "type": "image_url",
-                "image_url": {"url": img}
-            })
-
-        response = self.client.chat.completions.create(
-            model="gpt-4.1-2025-04-14",
-            messages=[{
-                "role": "user",
-                "content": content
-            }],
-            max_tokens=4096,
-            temperature=0.7
-        )
+    async def analyze_text_async(self, prompt: str, text: str) -> str:
+        request = self._request(self._text_messages(prompt, text))
+        async with self._async_client() as client:
+            response = await client.chat.completions.create(**request)
         return response.choices[0].message.content
 
-    def chat(self, messages: list) -> str:
-        if not self.client:
-            raise Exception("OpenAI client not initialized")
+    async def analyze_vision_async(self, prompt: str, image_base64: Union[str, List[str]]) -> str:
+        request = self._request(self._vision_messages(prompt, image_base64))
+        async with self._async_client() as client:
+            response = await client.chat.completions.create(**request)
+        return response.choices[0].message.content
 
-        # Convert messages format if needed
-        formatted_messages = []
-        for msg in messages:
-            if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
-                formatted_messages.append(msg)
-
-        response = self.client.chat.completions.create(
-            model="gpt-4.1-2025-04-14",
-            messages=formatted_messages,
-            max_tokens=4096,
-            temperature=0.7
-        )
+    async def chat_async(self, messages: list) -> str:
+        request = self._request(_chat_messages(messages))
+        async with self._async_client() as client:
+            response = await client.chat.completions.create(**request)
         return response.choices[0].message.content
 
     def is_available(self) -> bool:
@@ -480,11 +506,11 @@ class GeminiProvider(AIProvider):
         }
 
 
-class NovitaAIProvider(AIProvider):
+class NovitaAIProvider(OpenAIProvider):
     """Novita AI provider (Qwen 3 VL 235B and other models)"""
 
     def __init__(self, api_key: str):
-        super().__init__(api_key)
+        AIProvider.__init__(self, api_key)
         self.client = None
         self.base_url = "https://api.novita.ai/openai"
         if api_key:
@@ -499,102 +525,30 @@ class NovitaAIProvider(AIProvider):
             except ImportError:
                 print("Warning: openai package not installed")
 
-    def analyze_text(self, prompt: str, text: str) -> str:
-        if not self.client:
-            raise Exception("Novita AI client not initialized")
-
-        response = self.client.chat.completions.create(
-            model="qwen/qwen3-vl-235b-a22b-thinking",
-            messages=[
-                {"role": "system", "content": "You are a helpful AI assistant analyzing PDF documents."},
-                {"role": "user", "content": f"{prompt}\n\n{text}"}
-            ],
-            max_tokens=32768,
-            temperature=0.6,
-            top_p=0.95,
-            extra_body={
-                "enable_thinking": True,
-                "top_k": 20,
-                "min_p": 0
-            }
-        )
-        return response.choices[0].message.content
+    def _create_async_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=300.0)
 
-    def analyze_vision(self, prompt: str, image_base64: Union[str, List[str]]) -> str:
+    def _request(self, messages: list) -> Dict[str, Any]:
+        """chat.completions.create arguments (shared by the sync and async calls)"""
         if not self.client:
             raise Exception("Novita AI client not initialized")
-
-        # Convert single image to list for uniform processing
-        images = [image_base64] if isinstance(image_base64, str) else image_base64
-
-        # Build content array
-        content = [{"type": "text", "text": prompt}]
-
-        for img in images:
-            # Ensure proper data URL format
-            if not img.startswith('data:'):
-                img = f"data:image/png;base64,{img}"
-
-            content.append({
-                "type": "image_url",
-                "image_url": {"url": img}
-            })
-
-        response = self.client.chat.completions.create(
-            model="qwen/qwen3-vl-235b-a22b-thinking",
-            messages=[{
-                "role": "user",
-                "content": content
-            }],
-            max_tokens=32768,
-            temperature=0.6,
-            top_p=0.95,
-            extra_body={
-                "enable_thinking": True,
-                "top_k": 20,
-                "min_p": 0
-            }
-        )
-        return response.choices[0].message.content
-
-    def chat(self, messages: list) -> str:
-        if not self.client:
-            raise Exception("Novita AI client not initialized")
-
-        # Convert messages format if needed
-        formatted_messages = []
-        for msg in messages:
-            if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
-                formatted_messages.append(msg)
-
-        response = self.client.chat.completions.create(
-            model="qwen/qwen3-vl-235b-a22b-thinking",
-            messages=formatted_messages,
-            max_tokens=32768,
-            temperature=0.6,
-            top_p=0.95,
-            extra_body={
+        return {
+            "model": "qwen/qwen3-vl-235b-a22b-thinking",
+            "messages": messages,
+            "max_tokens": 32768,
+            "temperature": 0.6,
+            "top_p": 0.95,
+            "extra_body": {
                 "enable_thinking": True,
                 "top_k": 20,
                 "min_p": 0
             }
-        )
-        return response.choices[0].message.content
-
-    def is_available(self) -> bool:
-        return self.client is not None
+        }
 
     def get_name(self) -> str:
         return "Qwen 3 VL 235B (Novita AI)"
 
-    def get_capabilities(self) -> Dict[str, bool]:
-        return {
-            "text_analysis": True,
-            "vision_analysis": True,
-            "chat": True,
-            "dimension_extraction": True
-        }
-
 
 class AIProviderManager:
     """Manages multiple AI providers and allows switching between them"""
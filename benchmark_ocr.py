@@ -0,0 +1,67 @@
+"""
+Benchmark OCR: costo del filtro di densità a 90°
+
+Confronta la pipeline attuale (riusa il passaggio PSM 6 a 90° di process_single_rotation)
+con il vecchio approccio, che ruotava e pre-processava di nuovo l'immagine ed eseguiva
+un settimo image_to_data PSM 6 solo per calcolare la densità.
+
+Uso: python benchmark_ocr.py [file.pdf] [pagina] [ripetizioni]
+"""
+
+import sys
+import time
+
+import pytesseract
+
+import unified_app as app_module
+
+
+def rerun_density_pass(image):
+    """Vecchio filtro di densità: rotazione + preprocessing + OCR PSM 6 ripetuti"""
+    rotated_image = app_module.rotate_image(image, 90)
+    processed_image = app_module.preprocess_image(rotated_image)
+    ocr_data = pytesseract.image_to_data(processed_image, lang='ita+eng',
+                                         config=r'--oem 3 --psm 6',
+                                         output_type=pytesseract.Output.DICT)
+    return app_module.get_density_elements(ocr_data, min_conf=30)
+
+
+def main():
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else 'uploads/current.pdf'
+    page_num = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    processor = app_module.PDFProcessor(pdf_path)
+    image = processor.get_page_array(page_num=page_num, dpi=300)
+    if image is None:
+        print(f"Pagina {page_num} non trovata in {pdf_path}")
+        return
+
+    print(f"Pagina {page_num + 1} di {pdf_path}: {image.shape[1]}x{image.shape[0]} px")
+
+    pipeline_times = []
+    removed_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _, raw_90 = app_module.process_single_rotation(image, 90, '90 gradi (Verticale)', return_raw=True)
+        reused = app_module.get_density_elements(raw_90[6], min_conf=30)
+        pipeline_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rerun = rerun_density_pass(image)
+        removed_times.append(time.perf_counter() - start)
+
+        if rerun != reused:
+            print("ATTENZIONE: gli elementi riusati differiscono da quelli ricalcolati")
+
+    after = min(pipeline_times)
+    saved = min(removed_times)
+    print("\n=== Risultati (migliore di", repeats, "esecuzioni) ===")
+    print(f"Rotazione 90° con riuso PSM 6:        {after:.2f}s")
+    print(f"Passaggio di densità eliminato:       {saved:.2f}s")
+    print(f"Prima (rotazione 90° + passaggio):    {after + saved:.2f}s")
+    print(f"Risparmio:                            {saved / (after + saved) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
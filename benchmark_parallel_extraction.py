@@ -0,0 +1,51 @@
+"""
+Benchmark estrazione parallela di tutte le pagine (extract_pages_parallel)
+
+Misura il tempo di estrazione di un PDF testuale con un numero crescente di
+processi worker (EXTRACT_WORKERS, pool già avviato) e verifica che i risultati, uniti in ordine
+di pagina, siano identici all'estrazione seriale.
+
+Uso: python benchmark_parallel_extraction.py file.pdf [n_worker ...]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import unified_app as app_module
+
+
+def extract(path, page_count, workers):
+    # Pool condiviso sostituito con uno di `workers` processi, avviati prima della misura
+    # (in esercizio il pool resta attivo tra le richieste)
+    app_module.extract_pool.shutdown()
+    app_module.extract_pool = app_module.ExtractionPool(max_workers=workers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        app_module.extract_pages_parallel(path, page_count)
+        start = time.perf_counter()
+        pages = app_module.extract_pages_parallel(path, page_count)
+    return pages, time.perf_counter() - start
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+    path = sys.argv[1]
+    cpu_count = os.cpu_count() or 1
+    counts = [int(arg) for arg in sys.argv[2:]] or sorted({1, 2, 4, cpu_count})
+
+    page_count = app_module.PDFProcessor(path).get_page_count()
+    print(f"{path}: {page_count} pagine, {cpu_count} CPU, backend {app_module.app.config['PDF_TEXT_BACKEND']}")
+
+    reference, serial_time = extract(path, page_count, 1)
+    print(f"{'worker':>6} {'tempo':>9} {'speedup':>8} {'uguale':>7}")
+    for workers in counts:
+        pages, elapsed = extract(path, page_count, workers) if workers > 1 else (reference, serial_time)
+        print(f"{workers:>6} {elapsed:>8.2f}s {serial_time / elapsed:>7.2f}x {'si' if pages == reference else 'NO':>7}")
+
+
+if __name__ == '__main__':
+    main()
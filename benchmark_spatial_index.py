@@ -0,0 +1,102 @@
+"""
+Benchmark indice spaziale per la geometria di estrazione
+
+Confronta la scansione completa (O(n^2)) con le query su GridIndex per
+merge_vertical_chars, extract_context_around e calculate_text_density_around,
+su pagine sintetiche con un numero crescente di parole. Verifica anche che
+l'output sia identico nei due casi.
+
+Uso: python benchmark_spatial_index.py [n_parole ...]
+"""
+
+import random
+import sys
+import time
+
+import page_extraction
+import unified_app as app_module
+from word_table import WordTable
+
+
+PAGE_WIDTH = 3370   # A0 orizzontale in punti PDF
+PAGE_HEIGHT = 2384
+
+
+def synthetic_words(count, seed=0):
+    """Parole pdfplumber casuali: numeri, caratteri singoli e colonne di testo verticale"""
+    rng = random.Random(seed)
+    words = []
+    while len(words) < count:
+        x = rng.uniform(0, PAGE_WIDTH)
+        y = rng.uniform(0, PAGE_HEIGHT)
+        if rng.random() < 0.1:
+            for k in range(4):
+                words.append({'text': str(k), 'x0': x, 'x1': x + 5, 'top': y + k * 9, 'bottom': y + k * 9 + 8})
+        elif rng.random() < 0.3:
+            words.append({'text': rng.choice('0123456789AB'), 'x0': x, 'x1': x + 5, 'top': y, 'bottom': y + 9})
+        else:
+            width = rng.uniform(10, 40)
+            words.append({'text': str(rng.randint(10, 9999)), 'x0': x, 'x1': x + width,
+                          'top': y, 'bottom': y + 9})
+    return words[:count]
+
+
+def to_elements(words):
+    return [{'x': w['x0'], 'y': w['top'], 'width': w['x1'] - w['x0'], 'height': w['bottom'] - w['top']}
+            for w in words]
+
+
+def merge_vertical_chars_scan(words):
+    """merge_vertical_chars con l'indice disattivato (una sola cella = scansione di tutte le parole)"""
+    original = page_extraction.GridIndex
+    page_extraction.GridIndex = lambda points: original(points, cell_size=float('inf'))
+    try:
+        return page_extraction.merge_vertical_chars(words)
+    finally:
+        page_extraction.GridIndex = original
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def run_case(words):
+    elements = to_elements(words)
+    table = WordTable.from_records(words)
+    rows = []
+
+    scan, scan_time = timed(lambda: merge_vertical_chars_scan(table).to_records())
+    indexed, indexed_time = timed(lambda: page_extraction.merge_vertical_chars(table).to_records())
+    rows.append(('merge_vertical_chars', scan_time, indexed_time, scan == indexed))
+
+    scan, scan_time = timed(lambda: [page_extraction.extract_context_around(table, i) for i in range(len(table))])
+    indexed, indexed_time = timed(lambda: [page_extraction.extract_context_around(table, i, index=index)
+                                           for index in [page_extraction.build_word_center_index(table)]
+                                           for i in range(len(table))])
+    rows.append(('extract_context_around', scan_time, indexed_time, scan == indexed))
+
+    scan, scan_time = timed(lambda: [app_module.calculate_text_density_around(e, elements, 2.5)
+                                     for e in elements])
+    indexed, indexed_time = timed(lambda: [app_module.calculate_text_density_around(e, elements, 2.5, index=index)
+                                           for index in [app_module.build_element_center_index(elements)]
+                                           for e in elements])
+    rows.append(('calculate_text_density_around', scan_time, indexed_time, scan == indexed))
+
+    return rows
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [500, 1000, 2000, 5000]
+
+    print(f"{'parole':>7} {'funzione':30} {'scansione':>10} {'indice':>9} {'speedup':>8} {'uguale':>7}")
+    for count in counts:
+        words = synthetic_words(count)
+        for name, scan_time, indexed_time, same in run_case(words):
+            print(f"{count:>7} {name:30} {scan_time:>9.3f}s {indexed_time:>8.3f}s "
+                  f"{scan_time / indexed_time:>7.1f}x {'si' if same else 'NO':>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Parità e benchmark dei backend di testo (pdfplumber vs PyMuPDF rawdict)
+
+Per ogni pagina dei PDF di un corpus:
+- misura chars + parole + testo con entrambi i backend (documenti aperti da zero,
+  senza il pool dell'applicazione) e riporta le pagine/sec di ciascuno;
+- confronta le uscite: parole (testo e scostamento dei centri delle bbox),
+  caratteri ruotati a 90°/270°, somiglianza del testo di pagina e numeri/date/unità
+  di extract_data_from_pdfplumber (testo e tipo).
+pdfplumber è il riferimento. Esce con codice 1 se un confronto supera le tolleranze.
+
+Uso: python benchmark_text_backends.py [cartella_corpus] [max_pagine_per_pdf]
+"""
+
+import contextlib
+import difflib
+import glob
+import io
+import os
+import sys
+import time
+from collections import Counter
+
+import fitz  # PyMuPDF
+import pdfplumber
+
+import unified_app as app_module
+from text_backend import extract_text, extract_words, pymupdf_page_chars
+
+
+# Tolleranze di parità (punti PDF / rapporti)
+MAX_CENTER_OFFSET = 2.0
+MIN_TEXT_RATIO = 0.98
+
+
+def is_rotated(char):
+    matrix = char.get('matrix', (1, 0, 0, 1, 0, 0))
+    return abs(matrix[0]) < 0.1 and abs(matrix[1]) > 0.9
+
+
+def pdfplumber_pages(path, max_pages):
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages[:max_pages]:
+            chars = page.chars
+            yield chars, extract_words(chars), page.extract_text()
+
+
+def pymupdf_pages(path, max_pages):
+    with fitz.open(path) as doc:
+        for page_num in range(min(len(doc), max_pages)):
+            page = doc[page_num]
+            chars = pymupdf_page_chars(page)
+            yield chars, extract_words(chars), extract_text(chars, page.rect.width, page.rect.height)
+
+
+def timed_pages(pages):
+    start = time.perf_counter()
+    result = list(pages)
+    return result, time.perf_counter() - start
+
+
+def center(word):
+    return (word['x0'] + word['x1']) / 2, (word['top'] + word['bottom']) / 2
+
+
+def compare_words(reference, candidate):
+    """(parole mancanti, parole in più, scostamento massimo dei centri per parole con lo stesso testo)"""
+    ref_counts = Counter(w['text'] for w in reference)
+    cand_counts = Counter(w['text'] for w in candidate)
+    missing = sum((ref_counts - cand_counts).values())
+    extra = sum((cand_counts - ref_counts).values())
+
+    by_text = {}
+    for word in candidate:
+        by_text.setdefault(word['text'], []).append(center(word))
+
+    max_offset = 0.0
+    for word in reference:
+        centers = by_text.get(word['text'])
+        if not centers:
+            continue
+        x, y = center(word)
+        max_offset = max(max_offset, min(max(abs(x - cx), abs(y - cy)) for cx, cy in centers))
+
+    return missing, extra, max_offset
+
+
+def extracted_items(path, page_num, backend):
+    app_module.app.config['PDF_TEXT_BACKEND'] = backend
+    with contextlib.redirect_stdout(io.StringIO()):
+        items = app_module.extract_data_from_pdfplumber(path, page_num)
+    return Counter((item['text'], item['type']) for item in items)
+
+
+def main():
+    corpus_dir = sys.argv[1] if len(sys.argv) > 1 else 'uploads'
+    max_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    pdf_files = sorted(glob.glob(os.path.join(corpus_dir, '*.pdf')))
+    if not pdf_files:
+        print(f"Nessun PDF trovato in {corpus_dir}")
+        return
+
+    configured_backend = app_module.app.config['PDF_TEXT_BACKEND']
+    totals = {'pages': 0, 'pdfplumber': 0.0, 'pymupdf': 0.0}
+    failures = 0
+
+    print(f"{'PDF':28} {'pag':>4} {'parole':>7} {'mancanti':>8} {'in più':>6} {'offset':>7} "
+          f"{'ruotati':>11} {'testo':>6} {'numeri':>7}")
+
+    for path in pdf_files:
+        reference_pages, reference_time = timed_pages(pdfplumber_pages(path, max_pages))
+        candidate_pages, candidate_time = timed_pages(pymupdf_pages(path, max_pages))
+        totals['pages'] += len(reference_pages)
+        totals['pdfplumber'] += reference_time
+        totals['pymupdf'] += candidate_time
+
+        for page_num, (reference, candidate) in enumerate(zip(reference_pages, candidate_pages)):
+            ref_chars, ref_words, ref_text = reference
+            cand_chars, cand_words, cand_text = candidate
+
+            missing, extra, max_offset = compare_words(ref_words, cand_words)
+            ref_rotated = sum(1 for c in ref_chars if is_rotated(c))
+            cand_rotated = sum(1 for c in cand_chars if is_rotated(c))
+            text_ratio = difflib.SequenceMatcher(None, ref_text or '', cand_text or '', autojunk=False).ratio()
+            ref_items = extracted_items(path, page_num, 'pdfplumber')
+            cand_items = extracted_items(path, page_num, 'pymupdf')
+            items_diff = sum(((ref_items - cand_items) + (cand_items - ref_items)).values())
+
+            ok = (missing == 0 and extra == 0 and max_offset <= MAX_CENTER_OFFSET and
+                  ref_rotated == cand_rotated and text_ratio >= MIN_TEXT_RATIO and items_diff == 0)
+            failures += 0 if ok else 1
+
+            print(f"{os.path.basename(path)[:28]:28} {page_num + 1:>4} {len(ref_words):>7} {missing:>8} {extra:>6} "
+                  f"{max_offset:>6.2f}p {ref_rotated:>5}/{cand_rotated:<5} {text_ratio * 100:>5.1f}% "
+                  f"{items_diff:>7}{'' if ok else '  <-- DIFF'}")
+
+    app_module.app.config['PDF_TEXT_BACKEND'] = configured_backend
+
+    print(f"\nPagine: {totals['pages']}")
+    for backend in ('pdfplumber', 'pymupdf'):
+        print(f"  {backend:10} {totals[backend]:>7.2f}s  {totals['pages'] / totals[backend]:>7.1f} pagine/sec")
+    print(f"  speedup pymupdf: {totals['pdfplumber'] / totals['pymupdf']:.1f}x")
+    print(f"Pagine fuori tolleranza: {failures}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark OCR su regioni di testo vs pagina intera
+
+Per ogni pagina dei PDF di un corpus di riferimento esegue extract_numbers_advanced
+sulla pagina intera e sul mosaico delle regioni di testo, e riporta tempo OCR,
+speedup e recall (numeri della pagina intera ritrovati con stesso testo e IoU >= 0.5).
+Il preprocessing è già in cache prima di cronometrare, quindi si misura solo l'OCR.
+La cache OCR su SQLite viene sostituita con un database temporaneo.
+
+Uso: python benchmark_text_regions.py [cartella_corpus] [max_pagine_per_pdf]
+"""
+
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import unified_app as app_module
+from document_cache import DocumentCache
+
+
+def iou(a, b):
+    x0 = max(a['x'], b['x'])
+    y0 = max(a['y'], b['y'])
+    x1 = min(a['x'] + a['width'], b['x'] + b['width'])
+    y1 = min(a['y'] + a['height'], b['y'] + b['height'])
+    intersection = max(0, x1 - x0) * max(0, y1 - y0)
+    union = a['width'] * a['height'] + b['width'] * b['height'] - intersection
+    return intersection / union if union else 0.0
+
+
+def recall(reference, candidates):
+    """Frazione dei numeri di riferimento ritrovati (stesso testo, IoU >= 0.5)"""
+    if not reference:
+        return 1.0
+    found = 0
+    for ref in reference:
+        if any(c['text'] == ref['text'] and iou(c['bbox'], ref['bbox']) >= 0.5 for c in candidates):
+            found += 1
+    return found / len(reference)
+
+
+def timed_extraction(image, text_regions):
+    start = time.perf_counter()
+    all_numbers, _, _ = app_module.extract_numbers_advanced(image, text_regions=text_regions)
+    return all_numbers, time.perf_counter() - start
+
+
+def main():
+    corpus_dir = sys.argv[1] if len(sys.argv) > 1 else 'uploads'
+    max_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    pdf_files = sorted(glob.glob(os.path.join(corpus_dir, '*.pdf')))
+    if not pdf_files:
+        print(f"Nessun PDF trovato in {corpus_dir}")
+        return
+
+    # Cache OCR vuota: entrambi i percorsi eseguono davvero Tesseract
+    temp_dir = tempfile.mkdtemp(prefix='bench_ocr_')
+    app_module.doc_cache = DocumentCache(os.path.join(temp_dir, 'ocr_bench.db'))
+
+    rows = []
+    for pdf_path in pdf_files:
+        processor = app_module.PDFProcessor(pdf_path)
+        for page_num in range(min(processor.get_page_count(), max_pages)):
+            image = processor.get_page_array(page_num=page_num, dpi=300)
+
+            # Preprocessing in cache prima di cronometrare
+            digest = app_module.compute_image_digest(image)
+            app_module.preprocess_pipeline.get_binary(image, digest, profile=app_module.app.config['OCR_PREPROCESS_PROFILE'])
+
+            full_numbers, full_time = timed_extraction(image, text_regions=False)
+            region_numbers, region_time = timed_extraction(image, text_regions=True)
+
+            rows.append((os.path.basename(pdf_path), page_num + 1, full_time, region_time,
+                         recall(full_numbers, region_numbers), len(full_numbers), len(region_numbers)))
+
+    print("\n=== Risultati ===")
+    print(f"{'PDF':30} {'pag':>4} {'intera':>8} {'regioni':>8} {'speedup':>8} {'recall':>7} {'n':>5} {'n reg':>6}")
+    for name, page, full_time, region_time, page_recall, n_full, n_regions in rows:
+        print(f"{name[:30]:30} {page:>4} {full_time:>7.2f}s {region_time:>7.2f}s "
+              f"{full_time / region_time:>7.2f}x {page_recall * 100:>6.1f}% {n_full:>5} {n_regions:>6}")
+
+    total_full = sum(row[2] for row in rows)
+    total_regions = sum(row[3] for row in rows)
+    total_reference = sum(row[5] for row in rows)
+    weighted_recall = (sum(row[4] * row[5] for row in rows) / total_reference) if total_reference else 1.0
+    print(f"\nTotale: {len(rows)} pagine, speedup {total_full / total_regions:.2f}x, "
+          f"recall {weighted_recall * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark memoria dell'estrazione del testo completo su PDF di grandi dimensioni
+
+Confronta il picco di RSS (in processi separati) tra:
+- list: implementazione precedente, testo di tutte le pagine in una lista dentro un
+  unico `with pdfplumber.open(...)` (gli oggetti di layout restano in cache);
+- stream: PDFProcessor.iter_full_text(), una pagina alla volta con rilascio del layout
+  e salvataggio nello store del testo (cache in una cartella temporanea);
+- store: seconda lettura dello stesso documento, servita dallo store.
+Verifica anche che il testo prodotto sia identico.
+
+Uso: python benchmark_text_streaming.py file.pdf [backend]
+"""
+
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+MODES = ('list', 'stream', 'store')
+
+
+def peak_rss_mb():
+    # ru_maxrss è in KB su Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def full_text_list(path):
+    import pdfplumber
+
+    full_text = []
+    with pdfplumber.open(path) as pdf:
+        for page_num, page in enumerate(pdf.pages):
+            text = page.extract_text()
+            if text:
+                full_text.append(f"--- Page {page_num + 1} ---\n{text}\n")
+    return "\n".join(full_text)
+
+
+def run_mode(mode, path, backend):
+    """Eseguito nel processo figlio (cwd temporanea, cache nuova): stampa una riga JSON con tempi e memoria"""
+    import unified_app as app_module
+
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'list':
+        text = full_text_list(path)
+    else:
+        processor = app_module.PDFProcessor(path, text_backend=backend)
+        digest = hashlib.sha256()
+        length = 0
+        for chunk in processor.iter_full_text():
+            digest.update(chunk.encode('utf-8'))
+            length += len(chunk)
+        text = None
+    elapsed = time.perf_counter() - start
+
+    if text is not None:
+        digest = hashlib.sha256(text.encode('utf-8'))
+        length = len(text)
+
+    print(json.dumps({'mode': mode, 'seconds': elapsed, 'baseline_mb': baseline, 'peak_mb': peak_rss_mb(),
+                      'chars': length, 'sha256': digest.hexdigest()}))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--mode':
+        run_mode(*sys.argv[2:5])
+        return
+
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+    path = os.path.abspath(sys.argv[1])
+    backend = sys.argv[2] if len(sys.argv) > 2 else 'pdfplumber'
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = []
+        for mode in MODES:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', mode, path, backend],
+                                    capture_output=True, text=True, check=True, cwd=tmp_dir).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'modo':8} {'tempo':>8} {'RSS base':>9} {'RSS picco':>10} {'delta':>8} {'caratteri':>10}")
+    for r in results:
+        print(f"{r['mode']:8} {r['seconds']:>7.2f}s {r['baseline_mb']:>8.0f}M {r['peak_mb']:>9.0f}M "
+              f"{r['peak_mb'] - r['baseline_mb']:>7.0f}M {r['chars']:>10}")
+    same = len({r['sha256'] for r in results}) == 1
+    print(f"Testo identico: {'si' if same else 'NO'}")
+    sys.exit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Box Overlap Kernels
+Batched NumPy overlap computations for OCR post-processing: bboxes are packed
+once into structured arrays and compared as matrices, so duplicate and
+0°/90° overlap removal make the same keep/drop decisions as the original
+pairwise loops without quadratic Python overhead
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+BOX_DTYPE = np.dtype([('x', 'f8'), ('y', 'f8'), ('width', 'f8'), ('height', 'f8')])
+
+# Righe per blocco nelle matrici di sovrapposizione (limita la memoria con migliaia di box)
+BLOCK_ROWS = 1024
+
+
+def boxes_array(items: List[Dict]) -> np.ndarray:
+    """Structured array of the 'bbox' dicts ({'x', 'y', 'width', 'height'}) of OCR results"""
+    boxes = np.empty(len(items), dtype=BOX_DTYPE)
+    for field in BOX_DTYPE.names:
+        boxes[field] = [item['bbox'][field] for item in items]
+    return boxes
+
+
+def intersection_areas(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Matrix (len(a), len(b)) of intersection areas between two box arrays"""
+    x_overlap = np.maximum(0, np.minimum((a['x'] + a['width'])[:, None], (b['x'] + b['width'])[None, :]) -
+                           np.maximum(a['x'][:, None], b['x'][None, :]))
+    y_overlap = np.maximum(0, np.minimum((a['y'] + a['height'])[:, None], (b['y'] + b['height'])[None, :]) -
+                           np.maximum(a['y'][:, None], b['y'][None, :]))
+    return x_overlap * y_overlap
+
+
+def _ratio_above(overlap: np.ndarray, area: np.ndarray, threshold: float) -> np.ndarray:
+    """overlap / area > threshold, False where area is not positive"""
+    ratio = np.divide(overlap, area, out=np.zeros_like(overlap), where=area > 0)
+    return (area > 0) & (ratio > threshold)
+
+
+def remove_text_duplicates(results: List[Dict], threshold: float = 0.5) -> List[Dict]:
+    """
+    Keep the first result of each group with the same text (case-insensitive) whose
+    overlap covers more than threshold of the later box's area; a duplicate with higher
+    confidence moves its confidence and bbox onto the kept result (kept dicts are updated in place).
+    """
+    if not results:
+        return []
+
+    groups = {}
+    for idx, result in enumerate(results):
+        groups.setdefault(result['text'].lower(), []).append(idx)
+
+    keep = np.zeros(len(results), dtype=bool)
+    boxes = boxes_array(results)
+
+    for indices in groups.values():
+        if len(indices) == 1:
+            keep[indices[0]] = True
+            continue
+
+        group_boxes = boxes[indices]
+        areas = group_boxes['width'] * group_boxes['height']
+
+        unique = []  # posizioni nel gruppo dei risultati tenuti, in ordine
+        current_box = []  # posizione nel gruppo della bbox attuale di ciascun risultato tenuto
+        for i in range(len(indices)):
+            if i % BLOCK_ROWS == 0:
+                # duplicate[r, j]: la box i + r è coperta per più della soglia dalla box j
+                block = slice(i, i + BLOCK_ROWS)
+                duplicate = _ratio_above(intersection_areas(group_boxes[block], group_boxes),
+                                         areas[block][:, None], threshold)
+            if unique:
+                matches = np.flatnonzero(duplicate[i % BLOCK_ROWS, current_box])
+                if len(matches):
+                    slot = matches[0]
+                    result = results[indices[i]]
+                    kept = results[indices[unique[slot]]]
+                    if result['confidence'] > kept['confidence']:
+                        kept['confidence'] = result['confidence']
+                        kept['bbox'] = result['bbox']
+                        current_box[slot] = i
+                    continue
+
+            unique.append(i)
+            current_box.append(i)
+            keep[indices[i]] = True
+
+    return [result for idx, result in enumerate(results) if keep[idx]]
+
+
+def _any_overlap(a: np.ndarray, b: np.ndarray, length_a: np.ndarray, length_b: np.ndarray,
+                 b_wins, threshold: float) -> np.ndarray:
+    """
+    For each box of a, whether some box of b overlaps it by more than threshold of the
+    smaller area and b_wins(length_a[:, None], length_b[None, :]) holds for the pair
+    """
+    found = np.zeros(len(a), dtype=bool)
+    if len(a) == 0 or len(b) == 0:
+        return found
+
+    area_b = b['width'] * b['height']
+    for start in range(0, len(a), BLOCK_ROWS):
+        block = slice(start, start + BLOCK_ROWS)
+        area_a = a[block]['width'] * a[block]['height']
+        min_area = np.minimum(area_a[:, None], area_b[None, :])
+        overlapping = _ratio_above(intersection_areas(a[block], b), min_area, threshold)
+        found[block] = (overlapping & b_wins(length_a[block][:, None], length_b[None, :])).any(axis=1)
+    return found
+
+
+def resolve_rotation_overlaps(numbers_0deg: List[Dict], numbers_90deg: List[Dict],
+                              threshold: float = 0.5) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Drop overlapping 0° / 90° boxes keeping the longer reading: a 0° box loses to a
+    90° box whose height exceeds its width; the surviving 0° boxes then remove
+    90° boxes whose height is not larger than their width.
+    """
+    boxes_0 = boxes_array(numbers_0deg)
+    boxes_90 = boxes_array(numbers_90deg)
+
+    # Lunghezza del testo: larghezza a 0°, altezza a 90°
+    length_0 = boxes_0['width']
+    length_90 = boxes_90['height']
+
+    loses_0 = _any_overlap(boxes_0, boxes_90, length_0, length_90, lambda l0, l90: l90 > l0, threshold)
+    kept_0 = ~loses_0
+
+    filtered_0deg = [num for num, keep in zip(numbers_0deg, kept_0) if keep]
+    boxes_0 = boxes_0[kept_0]
+    length_0 = length_0[kept_0]
+
+    loses_90 = _any_overlap(boxes_90, boxes_0, length_90, length_0, lambda l90, l0: l0 >= l90, threshold)
+    filtered_90deg = [num for num, lose in zip(numbers_90deg, loses_90) if not lose]
+
+    return filtered_0deg, filtered_90deg
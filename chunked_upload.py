@@ -0,0 +1,266 @@
+"""
+Chunked Upload
+Resumable uploads of large PDFs in fixed-size chunks: init, PUT chunk N, finalize.
+Chunks are appended in order to a part file and hashed (sha256) as they arrive, so the
+content hash is ready at finalize without reading the file again. Sessions are kept on disk
+(state.json + data.part, the received size is the part file size) and survive a restart.
+For linearized PDFs the end of the first page section is known from the first chunk,
+so the first page can be processed before the last chunk arrives
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from typing import BinaryIO, Dict, Optional
+
+
+# Il dizionario di linearizzazione deve stare nei primi 1024 byte del file (PDF 1.7, F.3.3)
+LINEARIZATION_HEADER_BYTES = 1024
+
+# Bytes read per step while a chunk is hashed and written to disk
+CHUNK_READ_SIZE = 1024 * 1024
+
+_LINEARIZATION_DICT = re.compile(rb'<<\s*/Linearized\s(.*?)>>', re.DOTALL)
+
+
+def parse_linearization(head: bytes) -> Optional[Dict]:
+    """
+    Linearization parameters from the first bytes of a PDF: file length (/L), end of the
+    first page section (/E), page count (/N) and first page object (/O). None if not linearized
+    """
+    match = _LINEARIZATION_DICT.search(head[:LINEARIZATION_HEADER_BYTES])
+    if not match:
+        return None
+
+    params = {}
+    for key in (b'L', b'E', b'N', b'O'):
+        value = re.search(rb'/' + key + rb'\s+(\d+)', match.group(1))
+        if not value:
+            return None
+        params[key.decode()] = int(value.group(1))
+    return {'length': params['L'], 'first_page_end': params['E'], 'page_count': params['N'],
+            'first_page_object': params['O']}
+
+
+class ChunkedUpload:
+    """One upload session: its part file, the running hash and the linearization parameters"""
+
+    def __init__(self, upload_id: str, folder: str, filename: str, total_size: int, chunk_size: int,
+                 created_at: float):
+        self.id = upload_id
+        self.folder = folder
+        self.filename = filename
+        self.total_size = total_size
+        self.chunk_size = chunk_size
+        self.created_at = created_at
+        self.data_path = os.path.join(folder, 'data.part')
+        self.received = 0
+        self.linearization = None
+        self._digest = hashlib.sha256()
+        self.lock = threading.RLock()
+
+    @property
+    def chunk_count(self) -> int:
+        return max((self.total_size + self.chunk_size - 1) // self.chunk_size, 1)
+
+    @property
+    def next_chunk(self) -> int:
+        return self.chunk_count if self.complete else self.received // self.chunk_size
+
+    @property
+    def complete(self) -> bool:
+        return self.received == self.total_size
+
+    @property
+    def file_hash(self) -> Optional[str]:
+        return self._digest.hexdigest() if self.complete else None
+
+    @property
+    def first_page_ready(self) -> bool:
+        """The whole first page section of a linearized PDF has been received"""
+        return self.linearization is not None and self.received >= self.linearization['first_page_end']
+
+    def chunk_length(self, index: int) -> int:
+        """Expected size of chunk index (the last one holds the remainder)"""
+        return min(self.chunk_size, self.total_size - index * self.chunk_size)
+
+    def write_chunk(self, index: int, stream: BinaryIO, length: int) -> str:
+        """
+        Append chunk index read from stream, hashing it on the way.
+        Returns 'stored', 'duplicate' (already received: retried request) or 'out_of_order'
+        """
+        if index < 0 or index >= self.chunk_count:
+            raise ValueError(f"Chunk index out of range: {index} (chunks: {self.chunk_count})")
+        if length != self.chunk_length(index):
+            raise ValueError(f"Chunk {index} must be {self.chunk_length(index)} bytes, got {length}")
+
+        with self.lock:
+            if index < self.next_chunk:
+                return 'duplicate'
+            if index > self.next_chunk:
+                return 'out_of_order'
+
+            # Hash su una copia: confermato solo se il chunk arriva intero
+            digest = self._digest.copy()
+            head = b''
+            written = 0
+            with open(self.data_path, 'r+b') as f:
+                f.seek(self.received)
+                while written < length:
+                    data = stream.read(min(CHUNK_READ_SIZE, length - written))
+                    if not data:
+                        break
+                    digest.update(data)
+                    f.write(data)
+                    if self.received == 0 and len(head) < LINEARIZATION_HEADER_BYTES:
+                        head += data[:LINEARIZATION_HEADER_BYTES - len(head)]
+                    written += len(data)
+                if written < length:
+                    f.truncate(self.received)
+                    raise ValueError(f"Incomplete chunk {index}: {written} of {length} bytes")
+
+            self._digest = digest
+            self.received += length
+            if head:
+                self._detect_linearization(head)
+            return 'stored'
+
+    def _detect_linearization(self, head: bytes):
+        linearization = parse_linearization(head)
+        # /L diverso dalla dimensione: file modificato dopo la linearizzazione, offset non affidabili
+        if linearization and linearization['length'] == self.total_size:
+            self.linearization = linearization
+
+    def first_page_data(self) -> Optional[bytes]:
+        """Bytes of the first page section of a linearized PDF, once received"""
+        if not self.first_page_ready:
+            return None
+        with open(self.data_path, 'rb') as f:
+            return f.read(self.linearization['first_page_end'])
+
+    def _restore(self):
+        """Resume from disk: keep only whole chunks and rebuild the hash from the part file"""
+        size = os.path.getsize(self.data_path)
+        received = size if size == self.total_size else size - size % self.chunk_size
+        digest = hashlib.sha256()
+        with open(self.data_path, 'r+b') as f:
+            f.truncate(received)
+            for data in iter(lambda: f.read(CHUNK_READ_SIZE), b''):
+                digest.update(data)
+            f.seek(0)
+            head = f.read(LINEARIZATION_HEADER_BYTES)
+        self._digest = digest
+        self.received = received
+        if head:
+            self._detect_linearization(head)
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            data = {
+                'upload_id': self.id,
+                'filename': self.filename,
+                'total_size': self.total_size,
+                'chunk_size': self.chunk_size,
+                'chunk_count': self.chunk_count,
+                'received': self.received,
+                'next_chunk': self.next_chunk,
+                'complete': self.complete,
+                'linearized': self.linearization is not None,
+                'first_page_ready': self.first_page_ready
+            }
+            if self.linearization:
+                data['page_count'] = self.linearization['page_count']
+        return data
+
+
+class ChunkedUploadStore:
+    def __init__(self, folder: str, chunk_size: int = 8 * 1024 * 1024, max_size: int = 4 * 1024 ** 3,
+                 max_age: int = 24 * 3600):
+        """Initialize store in folder with chunk size, max upload size (bytes) and max idle age (seconds)"""
+        self.folder = folder
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._uploads = {}  # upload_id -> ChunkedUpload
+        os.makedirs(folder, exist_ok=True)
+
+    def create(self, filename: str, total_size: int) -> ChunkedUpload:
+        """Start a session for a file of total_size bytes"""
+        if total_size <= 0:
+            raise ValueError("total_size must be positive")
+        if total_size > self.max_size:
+            raise ValueError(f"File too large: {total_size} bytes (max {self.max_size})")
+
+        self._expire()
+        upload_id = uuid.uuid4().hex
+        upload_folder = os.path.join(self.folder, upload_id)
+        os.makedirs(upload_folder)
+        upload = ChunkedUpload(upload_id, upload_folder, filename, total_size, self.chunk_size, time.time())
+        open(upload.data_path, 'wb').close()
+        with open(os.path.join(upload_folder, 'state.json'), 'w', encoding='utf-8') as f:
+            json.dump({'filename': filename, 'total_size': total_size, 'chunk_size': self.chunk_size,
+                       'created_at': upload.created_at}, f)
+        with self._lock:
+            self._uploads[upload_id] = upload
+        print(f"[Upload] Chunked upload {upload_id}: {filename}, {total_size} bytes in {upload.chunk_count} chunks")
+        return upload
+
+    def get(self, upload_id: str) -> Optional[ChunkedUpload]:
+        """Session by id, reloaded from disk if the server restarted since it was created"""
+        if not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+            return None
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is not None:
+                return upload
+
+            upload_folder = os.path.join(self.folder, upload_id)
+            if not os.path.isdir(upload_folder):
+                return None
+            try:
+                with open(os.path.join(upload_folder, 'state.json'), encoding='utf-8') as f:
+                    state = json.load(f)
+                upload = ChunkedUpload(upload_id, upload_folder, state['filename'], state['total_size'],
+                                       state['chunk_size'], state['created_at'])
+                upload._restore()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[Upload] Cannot resume chunked upload {upload_id}: {e}")
+                return None
+            self._uploads[upload_id] = upload
+            print(f"[Upload] Resumed chunked upload {upload_id} at {upload.received} bytes")
+            return upload
+
+    def remove(self, upload: ChunkedUpload):
+        """Forget a session and delete its folder (the part file may already have been moved away)"""
+        import shutil
+        with self._lock:
+            self._uploads.pop(upload.id, None)
+        shutil.rmtree(upload.folder, ignore_errors=True)
+
+    def _expire(self):
+        """Delete sessions not written to for more than max_age"""
+        now = time.time()
+        for upload_id in os.listdir(self.folder):
+            data_path = os.path.join(self.folder, upload_id, 'data.part')
+            try:
+                idle = now - os.path.getmtime(data_path)
+            except OSError:
+                continue
+            if idle > self.max_age:
+                upload = self.get(upload_id)
+                if upload is not None:
+                    print(f"[Upload] Expired chunked upload {upload_id}")
+                    self.remove(upload)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            uploads = list(self._uploads.values())
+        return {
+            'active': len(uploads),
+            'received_bytes': sum(upload.received for upload in uploads)
+        }
@@ -5,17 +5,47 @@ Stores PDF analysis results to avoid re-processing
 
 import sqlite3
 import hashlib
+import threading
 import json
+import zlib
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, Iterator, List, Tuple
 import os
 
 
+# Columns of the per-page metadata table, in order
+PAGE_METADATA_COLUMNS = ('page_num', 'width', 'height', 'rotation', 'text_length',
+                         'image_count', 'drawing_count', 'page_type')
+
+# Minimum term length the FTS5 trigram index can match (shorter terms are scanned with LIKE)
+FTS_MIN_TERM_LENGTH = 3
+
+# Pages of text read/written per database round trip when streaming a document
+PAGE_TEXT_BATCH = 32
+
+# Characters of page text shown around the first match in search results
+SEARCH_EXCERPT_CHARS = 80
+
+# Columns of pytesseract image_to_data output used by the app
+OCR_COLUMNS = ('text', 'conf', 'left', 'top', 'width', 'height')
+
+
+def compact_ocr_data(ocr_data: Dict) -> Dict:
+    """Keep only recognized words (non-empty text) and the columns the app reads"""
+    rows = [i for i, text in enumerate(ocr_data['text']) if str(text).strip()]
+    return {column: [ocr_data[column][i] for i in rows] for column in OCR_COLUMNS}
+
+
 class DocumentCache:
-    def __init__(self, db_path='document_cache.db'):
-        """Initialize document cache with SQLite database"""
+    def __init__(self, db_path='document_cache.db', max_ocr_bytes=256 * 1024 * 1024):
+        """Initialize document cache with SQLite database and the size limit of cached OCR output"""
         self.db_path = db_path
+        self.max_ocr_bytes = max_ocr_bytes
+        self.ocr_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._ocr_lock = threading.Lock()  # size accounting and eviction of ocr_results
+        self._stats_lock = threading.Lock()  # ocr_stats (updated by OCR workers, job workers and requests)
         self.init_database()
+        self._ocr_bytes = self._ocr_usage()
 
     def init_database(self):
         """Create database tables if they don't exist"""
@@ -86,6 +116,100 @@ class DocumentCache:
             )
         ''')
 
+        # OCR results table - content-addressed Tesseract output (independent of documents:
+        # the same page image gives the same result whatever file it comes from)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ocr_results (
+                cache_key TEXT PRIMARY KEY,
+                psm INTEGER,
+                rotation INTEGER,
+                data BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Page metadata table - geometry and classification of every page, computed once
+        # per file content at ingest (keyed by hash: available before the document row exists)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS page_metadata (
+                file_hash TEXT NOT NULL,
+                page_num INTEGER NOT NULL,
+                width REAL NOT NULL,
+                height REAL NOT NULL,
+                rotation INTEGER DEFAULT 0,
+                text_length INTEGER DEFAULT 0,
+                image_count INTEGER DEFAULT 0,
+                drawing_count INTEGER DEFAULT 0,
+                page_type TEXT NOT NULL,
+                PRIMARY KEY (file_hash, page_num)
+            )
+        ''')
+
+        # Page text table - extracted text of every page (keyed by hash like page_metadata),
+        # so full-text requests and searches never reopen the PDF
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS page_text (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_hash TEXT NOT NULL,
+                page_num INTEGER NOT NULL,
+                backend TEXT NOT NULL,
+                text TEXT NOT NULL,
+                UNIQUE(file_hash, page_num)
+            )
+        ''')
+
+        # Page extraction table - extraction results of a page made at ingest (numbers/dates
+        # with boxes, digest of the drawn overlay), served as they are when a document is reopened.
+        # settings: extraction method and configuration they were made with
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS page_extraction (
+                file_hash TEXT NOT NULL,
+                page_num INTEGER NOT NULL,
+                extraction_method TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                overlay_digest TEXT,
+                data BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (file_hash, page_num)
+            )
+        ''')
+
+        # Overlays table - data the overlay images were drawn from (keyed by hash and digest),
+        # so an overlay evicted from the raster cache can be drawn again from the page
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS overlays (
+                file_hash TEXT NOT NULL,
+                page_num INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                data BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (file_hash, page_num, digest)
+            )
+        ''')
+
+        # FTS5 index over page_text (trigram: substring search of part numbers / dimension strings),
+        # kept in sync by triggers
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS page_text_fts
+                USING fts5(text, content='page_text', content_rowid='id', tokenize='trigram')
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS page_text_ai AFTER INSERT ON page_text BEGIN
+                    INSERT INTO page_text_fts(rowid, text) VALUES (new.id, new.text);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS page_text_ad AFTER DELETE ON page_text BEGIN
+                    INSERT INTO page_text_fts(page_text_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END
+            ''')
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            # SQLite senza FTS5/trigram: la ricerca usa LIKE su page_text
+            print(f"[Cache] FTS5 trigram index not available ({e}), text search will scan page_text")
+            self.fts_enabled = False
+
         # Create indexes for faster queries
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_hash ON documents(file_hash)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_page ON page_dimensions(document_id, page_number)')
@@ -102,15 +226,87 @@ class DocumentCache:
                 sha256_hash.update(byte_block)
         return sha256_hash.hexdigest()
 
-    def get_document(self, file_hash: str) -> Optional[Dict]:
-        """Get document by file hash"""
+    @staticmethod
+    def compute_ocr_key(image_digest: str, preprocess: str, psm: int, oem: int,
+                        lang: str, rotation: int, output: str = 'data') -> str:
+        """Hash of everything that determines a Tesseract result"""
+        key = f"{image_digest}|{preprocess}|psm{psm}|oem{oem}|{lang}|rot{rotation}|{output}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get_ocr_result(self, cache_key: str) -> Optional[Dict]:
+        """Get cached OCR output (compact image_to_data dict, or {'string': ...})"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT data FROM ocr_results WHERE cache_key = ?', (cache_key,))
+        row = cursor.fetchone()
+        conn.close()
+
+        with self._stats_lock:
+            self.ocr_stats['hits' if row else 'misses'] += 1
+        if not row:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def _ocr_usage(self) -> int:
+        """Total size of the stored OCR blobs"""
+        conn = sqlite3.connect(self.db_path)
+        total = conn.execute('SELECT COALESCE(SUM(LENGTH(data)), 0) FROM ocr_results').fetchone()[0]
+        conn.close()
+        return total
+
+    def save_ocr_result(self, cache_key: str, ocr_data: Dict, psm: Optional[int] = None,
+                        rotation: Optional[int] = None):
+        """Save OCR output as compressed compact JSON, evicting the oldest results over the size limit"""
+        data = zlib.compress(json.dumps(ocr_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+        with self._ocr_lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute('SELECT LENGTH(data) FROM ocr_results WHERE cache_key = ?', (cache_key,))
+            row = cursor.fetchone()
+            cursor.execute('''
+                INSERT OR REPLACE INTO ocr_results (cache_key, psm, rotation, data)
+                VALUES (?, ?, ?, ?)
+            ''', (cache_key, psm, rotation, data))
+            self._ocr_bytes += len(data) - (row[0] if row else 0)
+
+            if self._ocr_bytes > self.max_ocr_bytes:
+                self._evict_ocr_results(cursor)
+
+            conn.commit()
+            conn.close()
+
+    def _evict_ocr_results(self, cursor):
+        """Delete the oldest OCR results until their size is under 90% of the limit (lock held)"""
+        target = int(self.max_ocr_bytes * 0.9)
+        cursor.execute('SELECT cache_key, LENGTH(data) FROM ocr_results ORDER BY created_at, rowid')
+
+        evicted = []
+        for cache_key, size in cursor.fetchall():
+            if self._ocr_bytes <= target:
+                break
+            evicted.append((cache_key,))
+            self._ocr_bytes -= size
+
+        cursor.executemany('DELETE FROM ocr_results WHERE cache_key = ?', evicted)
+        with self._stats_lock:
+            self.ocr_stats['evictions'] += len(evicted)
+        print(f"[Cache] OCR cache over {self.max_ocr_bytes // (1024 * 1024)} MB: evicted {len(evicted)} results")
+
+    def get_document(self, file_hash: str, complete_only: bool = False) -> Optional[Dict]:
+        """
+        Get document by file hash. A document still being ingested has no
+        actual_processing_time yet: complete_only skips it
+        """
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
 
         cursor.execute('''
             SELECT * FROM documents WHERE file_hash = ?
-        ''', (file_hash,))
+        ''' + (' AND actual_processing_time IS NOT NULL' if complete_only else ''), (file_hash,))
 
         row = cursor.fetchone()
         conn.close()
@@ -199,6 +395,210 @@ class DocumentCache:
 
         return [dict(row) for row in rows]
 
+    def save_page_metadata(self, file_hash: str, pages: List[Dict]):
+        """Save the metadata table of a document (one dict per page, PAGE_METADATA_COLUMNS)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('DELETE FROM page_metadata WHERE file_hash = ?', (file_hash,))
+        cursor.executemany(f'''
+            INSERT INTO page_metadata (file_hash, {', '.join(PAGE_METADATA_COLUMNS)})
+            VALUES (?, {', '.join('?' for _ in PAGE_METADATA_COLUMNS)})
+        ''', [(file_hash, *(page[column] for column in PAGE_METADATA_COLUMNS)) for page in pages])
+
+        conn.commit()
+        conn.close()
+
+    def get_page_metadata(self, file_hash: str) -> Optional[List[Dict]]:
+        """Get the metadata table of a document ordered by page (None if not computed yet)"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+
+        cursor.execute(f'''
+            SELECT {', '.join(PAGE_METADATA_COLUMNS)} FROM page_metadata
+            WHERE file_hash = ?
+            ORDER BY page_num
+        ''', (file_hash,))
+
+        rows = cursor.fetchall()
+        conn.close()
+
+        if not rows:
+            return None
+        return [dict(row) for row in rows]
+
+    def save_page_extraction(self, file_hash: str, page_num: int, extraction_method: str, settings: str,
+                             data: Dict, overlay_digest: Optional[str] = None):
+        """Save the extraction results of a page as compressed JSON"""
+        blob = zlib.compress(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT OR REPLACE INTO page_extraction
+                (file_hash, page_num, extraction_method, settings, overlay_digest, data)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (file_hash, page_num, extraction_method, settings, overlay_digest, blob))
+
+        conn.commit()
+        conn.close()
+
+    def get_page_extraction(self, file_hash: str, page_num: int) -> Optional[Dict]:
+        """Get the stored extraction of a page: extraction_method, settings, overlay_digest and its data"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT extraction_method, settings, overlay_digest, data FROM page_extraction
+            WHERE file_hash = ? AND page_num = ?
+        ''', (file_hash, page_num))
+
+        row = cursor.fetchone()
+        conn.close()
+
+        if not row:
+            return None
+        return {
+            'extraction_method': row[0],
+            'settings': row[1],
+            'overlay_digest': row[2],
+            'data': json.loads(zlib.decompress(row[3]).decode('utf-8'))
+        }
+
+    def save_overlay(self, file_hash: str, page_num: int, digest: str, overlay_data: Dict):
+        """Save the data an overlay image was drawn from (kept if already stored)"""
+        blob = zlib.compress(json.dumps(overlay_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT OR IGNORE INTO overlays (file_hash, page_num, digest, data)
+            VALUES (?, ?, ?, ?)
+        ''', (file_hash, page_num, digest, blob))
+
+        conn.commit()
+        conn.close()
+
+    def get_overlay(self, file_hash: str, page_num: int, digest: str) -> Optional[Dict]:
+        """Get the data an overlay image was drawn from"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT data FROM overlays WHERE file_hash = ? AND page_num = ? AND digest = ?
+        ''', (file_hash, page_num, digest))
+
+        row = cursor.fetchone()
+        conn.close()
+
+        if not row:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def delete_page_texts(self, file_hash: str, other_than: Optional[str] = None):
+        """Delete the stored page texts of a document (only those of backends other than other_than, if given)"""
+        conn = sqlite3.connect(self.db_path)
+        if other_than is None:
+            conn.execute('DELETE FROM page_text WHERE file_hash = ?', (file_hash,))
+        else:
+            conn.execute('DELETE FROM page_text WHERE file_hash = ? AND backend != ?', (file_hash, other_than))
+        conn.commit()
+        conn.close()
+
+    def save_page_texts(self, file_hash: str, pages: List[Tuple[int, str]], backend: str):
+        """Save a batch of (page_num, text) of a document (pages already stored are kept)"""
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany('''
+            INSERT OR IGNORE INTO page_text (file_hash, page_num, backend, text)
+            VALUES (?, ?, ?, ?)
+        ''', [(file_hash, page_num, backend, text) for page_num, text in pages])
+        conn.commit()
+        conn.close()
+
+    def iter_page_texts(self, file_hash: str, backend: str) -> Iterator[Tuple[int, str]]:
+        """
+        (page_num, text) of a document in page order, read PAGE_TEXT_BATCH pages per query
+        (no connection is held open while the consumer processes a batch)
+        """
+        next_page = 0
+        while True:
+            conn = sqlite3.connect(self.db_path)
+            rows = conn.execute('''
+                SELECT page_num, text FROM page_text
+                WHERE file_hash = ? AND backend = ? AND page_num >= ?
+                ORDER BY page_num
+                LIMIT ?
+            ''', (file_hash, backend, next_page, PAGE_TEXT_BATCH)).fetchall()
+            conn.close()
+
+            yield from rows
+            if len(rows) < PAGE_TEXT_BATCH:
+                return
+            next_page = rows[-1][0] + 1
+
+    def search_page_text(self, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Pages of all cached documents containing every whitespace-separated term of query
+        (case-insensitive substrings), best FTS5 rank first, with an excerpt around the first match
+        """
+        terms = query.split()
+        if not terms:
+            return []
+
+        indexed = [t for t in terms if self.fts_enabled and len(t) >= FTS_MIN_TERM_LENGTH]
+        scanned = [t for t in terms if t not in indexed]
+
+        conditions = []
+        params = []
+        if indexed:
+            # Ogni termine è una frase FTS5 (virgolette raddoppiate), tutti richiesti
+            conditions.append('page_text_fts MATCH ?')
+            params.append(' '.join('"' + t.replace('"', '""') + '"' for t in indexed))
+        for term in scanned:
+            conditions.append("p.text LIKE ? ESCAPE '\\'")
+            params.append('%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+
+        if indexed:
+            source = 'page_text_fts JOIN page_text p ON p.id = page_text_fts.rowid'
+            order = 'page_text_fts.rank'
+        else:
+            source = 'page_text p'
+            order = 'p.file_hash, p.page_num'
+
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+
+        cursor.execute(f'''
+            SELECT p.file_hash, p.page_num, p.text, d.filename
+            FROM {source}
+            LEFT JOIN documents d ON d.file_hash = p.file_hash
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {order}
+            LIMIT ?
+        ''', (*params, limit))
+
+        rows = cursor.fetchall()
+        conn.close()
+
+        return [{
+            'file_hash': row['file_hash'],
+            'filename': row['filename'],
+            'page_num': row['page_num'],
+            'excerpt': self._excerpt(row['text'], terms[0])
+        } for row in rows]
+
+    @staticmethod
+    def _excerpt(text: str, term: str) -> str:
+        """Single-line slice of text centered on the first case-insensitive occurrence of term"""
+        position = max(text.lower().find(term.lower()), 0)
+        start = max(position - SEARCH_EXCERPT_CHARS // 2, 0)
+        excerpt = ' '.join(text[start:start + SEARCH_EXCERPT_CHARS + len(term)].split())
+        return ('…' if start > 0 else '') + excerpt
+
     def get_failed_pages(self, document_id: int) -> List[int]:
         """Get list of page numbers that failed extraction (SAFETY errors)"""
         conn = sqlite3.connect(self.db_path)
@@ -282,6 +682,12 @@ class DocumentCache:
             conn.commit()
             print(f"Deleted document cache for hash: {file_hash}")
 
+        cursor.execute('DELETE FROM page_metadata WHERE file_hash = ?', (file_hash,))
+        cursor.execute('DELETE FROM page_text WHERE file_hash = ?', (file_hash,))
+        cursor.execute('DELETE FROM page_extraction WHERE file_hash = ?', (file_hash,))
+        cursor.execute('DELETE FROM overlays WHERE file_hash = ?', (file_hash,))
+        conn.commit()
+
         conn.close()
 
     def get_cache_stats(self) -> Dict:
@@ -301,13 +707,40 @@ class DocumentCache:
         cursor.execute('SELECT COUNT(*) FROM page_dimensions WHERE success = 0')
         failed_extractions = cursor.fetchone()[0]
 
+        cursor.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM ocr_results')
+        ocr_cached_passes, ocr_cache_bytes = cursor.fetchone()
+
+        cursor.execute('SELECT COUNT(*) FROM page_metadata')
+        metadata_pages = cursor.fetchone()[0]
+
+        cursor.execute('SELECT COUNT(*) FROM page_text')
+        text_pages = cursor.fetchone()[0]
+
+        cursor.execute('SELECT COUNT(*) FROM page_extraction')
+        extraction_pages = cursor.fetchone()[0]
+
+        cursor.execute('SELECT COUNT(*) FROM overlays')
+        overlays = cursor.fetchone()[0]
+
         conn.close()
 
+        with self._stats_lock:
+            ocr_stats = dict(self.ocr_stats)
+
         return {
             'total_documents': total_docs,
             'total_pages': total_pages,
             'successful_extractions': successful_extractions,
-            'failed_extractions': failed_extractions
+            'failed_extractions': failed_extractions,
+            'ocr_cached_passes': ocr_cached_passes,
+            'ocr_cache_bytes': ocr_cache_bytes,
+            'ocr_cache_hits': ocr_stats['hits'],
+            'ocr_cache_misses': ocr_stats['misses'],
+            'ocr_cache_evictions': ocr_stats['evictions'],
+            'metadata_pages': metadata_pages,
+            'text_pages': text_pages,
+            'extraction_pages': extraction_pages,
+            'overlays': overlays
         }
 
     def get_all_documents(self) -> List[Dict]:
@@ -424,7 +857,14 @@ class DocumentCache:
         cursor.execute('DELETE FROM page_dimensions')
         cursor.execute('DELETE FROM layout_analysis')
         cursor.execute('DELETE FROM documents')
+        cursor.execute('DELETE FROM ocr_results')
+        cursor.execute('DELETE FROM page_metadata')
+        cursor.execute('DELETE FROM page_text')
+        cursor.execute('DELETE FROM page_extraction')
+        cursor.execute('DELETE FROM overlays')
 
         conn.commit()
         conn.close()
+        with self._ocr_lock:
+            self._ocr_bytes = 0
         print("All cache cleared")
@@ -0,0 +1,177 @@
+"""
+Document Handle Pool
+Keeps PyMuPDF and pdfplumber documents open across requests, keyed by file hash,
+so the xref/page tree of a PDF is parsed once instead of on every call
+"""
+
+import io
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+import fitz  # PyMuPDF
+import pdfplumber
+
+
+class _PooledHandle:
+    """An open document plus its reference count and usage lock"""
+
+    def __init__(self, kind):
+        self.handle = None  # set by the thread opening it, outside the pool lock
+        self.kind = kind
+        self.refcount = 0
+        self.last_used = time.time()
+        self.ready = threading.Event()  # set once opened (or failed: error)
+        self.error = None
+        # Neither PyMuPDF nor pdfplumber documents are thread-safe:
+        # a handle is used by one thread at a time (re-entrant for nested calls)
+        self.lock = threading.RLock()
+
+    def close(self):
+        if self.handle is None:
+            return
+        try:
+            self.handle.close()
+        except Exception as e:
+            print(f"[DocPool] Error closing {self.kind} handle: {e}")
+
+
+class DocumentHandlePool:
+    def __init__(self, max_open=8, idle_timeout=300):
+        """Initialize pool with max number of open handles and idle timeout (seconds)"""
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+
+        self._lock = threading.Lock()
+        self._handles = {}  # (kind, file_hash) -> _PooledHandle
+        self._data = {}  # file_hash -> PDF bytes shared by both libraries
+
+        self.stats = {
+            'opens': 0,
+            'reuses': 0,
+            'evictions': 0
+        }
+
+    def _read_pdf(self, file_hash: str, path: str) -> bytes:
+        """Read the PDF into memory once, so no file handle stays open on disk (file read outside the lock)"""
+        with self._lock:
+            data = self._data.get(file_hash)
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+            with self._lock:
+                data = self._data.setdefault(file_hash, data)
+        return data
+
+    def _open(self, kind: str, file_hash: str, path: str):
+        data = self._read_pdf(file_hash, path)
+        if kind == 'fitz':
+            return fitz.open(stream=data, filetype='pdf')
+        return pdfplumber.open(io.BytesIO(data))
+
+    def _close_entry(self, key):
+        """Close and forget a handle (lock held)"""
+        entry = self._handles.pop(key)
+        entry.close()
+
+        file_hash = key[1]
+        if not any(h == file_hash for _, h in self._handles):
+            self._data.pop(file_hash, None)
+
+    def _evict(self):
+        """Close idle handles past the timeout, then least recently used ones over max_open (lock held)"""
+        now = time.time()
+        idle = [key for key, entry in self._handles.items()
+                if entry.refcount == 0 and now - entry.last_used > self.idle_timeout]
+        for key in idle:
+            self._close_entry(key)
+            self.stats['evictions'] += 1
+
+        if len(self._handles) > self.max_open:
+            unused = sorted((entry.last_used, key) for key, entry in self._handles.items()
+                            if entry.refcount == 0)
+            for _, key in unused[:len(self._handles) - self.max_open]:
+                self._close_entry(key)
+                self.stats['evictions'] += 1
+
+    @contextmanager
+    def _acquire(self, kind: str, file_hash: str, path: str):
+        key = (kind, file_hash)
+
+        with self._lock:
+            entry = self._handles.get(key)
+            opening = entry is None
+            if opening:
+                # Chiave riservata: il documento si apre fuori dal lock del pool
+                entry = _PooledHandle(kind)
+                self._handles[key] = entry
+                self.stats['opens'] += 1
+            else:
+                self.stats['reuses'] += 1
+            entry.refcount += 1
+
+        # Parsing del documento senza il lock del pool: aspetta solo chi usa lo stesso documento
+        if opening:
+            try:
+                entry.handle = self._open(kind, file_hash, path)
+            except BaseException as e:
+                entry.error = e
+            entry.ready.set()
+        else:
+            entry.ready.wait()
+
+        if entry.error is not None:
+            with self._lock:
+                entry.refcount -= 1
+                if self._handles.get(key) is entry:
+                    self._close_entry(key)
+            raise entry.error
+
+        entry.lock.acquire()
+        try:
+            yield entry.handle
+        finally:
+            if kind == 'pdfplumber':
+                self._release_page_caches(entry.handle)
+            entry.lock.release()
+
+            with self._lock:
+                entry.refcount -= 1
+                entry.last_used = time.time()
+                self._evict()
+
+    def _release_page_caches(self, pdf):
+        """Drop parsed layout objects of pdfplumber pages, keeping the page tree"""
+        for page in getattr(pdf, '_pages', []):
+            page.close()
+
+    def fitz_document(self, file_hash: str, path: str):
+        """Context manager yielding a shared PyMuPDF document"""
+        return self._acquire('fitz', file_hash, path)
+
+    def pdfplumber_document(self, file_hash: str, path: str):
+        """Context manager yielding a shared pdfplumber PDF"""
+        return self._acquire('pdfplumber', file_hash, path)
+
+    def close_document(self, file_hash: str):
+        """Close all unused handles of a document (e.g. when it is deleted from cache)"""
+        with self._lock:
+            for key in [k for k, entry in self._handles.items()
+                        if k[1] == file_hash and entry.refcount == 0]:
+                self._close_entry(key)
+
+    def close_all(self):
+        """Close all unused handles"""
+        with self._lock:
+            for key in [k for k, entry in self._handles.items() if entry.refcount == 0]:
+                self._close_entry(key)
+
+    def get_stats(self) -> Dict:
+        """Get pool counters and currently open handles"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['open_handles'] = len(self._handles)
+            stats['in_use'] = sum(1 for entry in self._handles.values() if entry.refcount > 0)
+            stats['documents'] = len(self._data)
+        return stats
@@ -0,0 +1,183 @@
+"""
+Job Queue
+Background jobs for document ingestion: each submitted job gets an id and a status
+record (stage, page, retries, per-stage timings) that the worker updates as it goes,
+so uploads don't hold an HTTP request open and concurrent users don't share one status.
+Every update is also recorded as a numbered event that listeners can wait for
+(Server-Sent Events, resumable from the last event id)
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Eventi tenuti per job (gli eventi di avanzamento sono istantanee: basta il più recente)
+MAX_JOB_EVENTS = 200
+
+
+class Job:
+    """Status record of one job, updated by its worker and read by status requests"""
+
+    # Campi esposti (stato del lavoro + avanzamento dell'elaborazione)
+    FIELDS = ('status', 'stage', 'message', 'page', 'total_pages', 'retry_attempt', 'retries',
+              'temperature', 'from_cache')
+
+    def __init__(self, filename: str, file_hash: str):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.file_hash = file_hash
+        self.status = 'queued'  # queued, running, complete, error
+        self.stage = 'queued'   # analyzing, extracting, layout, dimensions, retry, saving, complete
+        self.message = 'In coda...'
+        self.page = 0
+        self.total_pages = 0
+        self.retry_attempt = 0
+        self.retries = 0
+        self.temperature = 0.0
+        self.from_cache = False
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.timings = {}  # stage -> seconds
+        self._stage_started = self.created_at
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._events = []  # (event_id, event_type, data)
+        self._next_event_id = 1
+        self._final_event_id = None
+        self.done = threading.Event()
+
+    def update(self, **fields):
+        """Set progress fields; a new stage closes the timing of the previous one"""
+        with self._lock:
+            self._set(fields)
+
+    def _set(self, fields: Dict):
+        """Apply fields and record a progress event (caller holds the lock)"""
+        stage = fields.get('stage')
+        if stage is not None and stage != self.stage:
+            now = time.time()
+            self.timings[self.stage] = round(self.timings.get(self.stage, 0.0) + now - self._stage_started, 3)
+            self._stage_started = now
+        for name, value in fields.items():
+            if name not in self.FIELDS:
+                raise AttributeError(f"Unknown job field: {name}")
+            setattr(self, name, value)
+        self._add_event('progress', {name: getattr(self, name) for name in self.FIELDS})
+
+    def _add_event(self, event_type: str, data: Dict) -> int:
+        """Record an event and wake up listeners (caller holds the lock)"""
+        event_id = self._next_event_id
+        self._events.append((event_id, event_type, data))
+        self._next_event_id += 1
+        del self._events[:-MAX_JOB_EVENTS]
+        self._changed.notify_all()
+        return event_id
+
+    def finish(self, result: Dict):
+        with self._lock:
+            self.result = result
+            self.finished_at = time.time()
+            self._set({'status': 'complete', 'stage': 'complete'})
+            self._final_event_id = self._add_event('complete', {'job_id': self.id, 'timings': dict(self.timings),
+                                                                'result': result})
+        self.done.set()
+
+    def fail(self, error: str):
+        with self._lock:
+            self.error = error
+            self.finished_at = time.time()
+            self._set({'status': 'error', 'message': f"Errore: {error}"})
+            self._final_event_id = self._add_event('failed', {'job_id': self.id, 'error': error})
+        self.done.set()
+
+    def wait_events(self, last_event_id: int = 0, timeout: float = 15.0) -> Tuple[List[Tuple[int, str, Dict]], bool]:
+        """
+        Events newer than last_event_id (oldest first), waiting up to timeout for one to arrive.
+        Returns (events, finished): finished once the final complete/failed event has been returned
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._next_event_id - 1 > last_event_id, timeout=timeout)
+            events = [event for event in self._events if event[0] > last_event_id]
+            last_sent = events[-1][0] if events else last_event_id
+            finished = self._final_event_id is not None and last_sent >= self._final_event_id
+        return events, finished
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        with self._lock:
+            data = {name: getattr(self, name) for name in self.FIELDS}
+            data.update({
+                'job_id': self.id,
+                'filename': self.filename,
+                'file_hash': self.file_hash,
+                'error': self.error,
+                'timings': dict(self.timings),
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at
+            })
+        if include_result and self.status == 'complete':
+            data['result'] = self.result
+        return data
+
+
+class JobQueue:
+    def __init__(self, max_workers: int = 2, max_finished: int = 100):
+        """Initialize queue with a max number of jobs running at once and of finished jobs kept"""
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}  # job_id -> Job, in submission order
+        self._lock = threading.Lock()
+        self.latest = None  # last submitted job (legacy global status)
+
+    def submit(self, job: Job, work: Callable[[Job], Dict], reuse_active: bool = False) -> Job:
+        """
+        Queue work(job) on the executor; its return value becomes the job result.
+        With reuse_active, an unfinished job for the same file_hash is returned instead
+        """
+        with self._lock:
+            if reuse_active:
+                for active in self._jobs.values():
+                    if active.file_hash == job.file_hash and not active.done.is_set():
+                        self.latest = active
+                        return active
+            self._jobs[job.id] = job
+            self.latest = job
+            self._prune()
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def _run(self, job: Job, work: Callable[[Job], Dict]):
+        job.started_at = time.time()
+        job.update(status='running')
+        try:
+            job.finish(work(job))
+        except Exception as e:
+            import traceback
+            print(f"[Jobs] Job {job.id} failed: {traceback.format_exc()}")
+            job.fail(str(e))
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond max_finished (caller holds the lock)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_stats(self) -> Dict:
+        """Get job counts by status"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        stats = {'max_workers': self.max_workers, 'jobs': len(jobs)}
+        for status in ('queued', 'running', 'complete', 'error'):
+            stats[status] = sum(1 for job in jobs if job.status == status)
+        return stats
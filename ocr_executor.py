@@ -0,0 +1,72 @@
+"""
+OCR Executor
+Bounded worker pool for Tesseract passes. pytesseract runs each pass in its own
+tesseract process, so independent passes (PSM modes, rotations) run in parallel
+across cores while the number of concurrent processes stays capped
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import pytesseract
+
+
+class OCRExecutor:
+    def __init__(self, max_workers=None):
+        """Initialize executor with a max number of concurrent Tesseract passes (default: CPU count)"""
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ocr')
+
+        if self.max_workers > 1:
+            # Passes already run in parallel: keep each tesseract process single-threaded
+            # so OpenMP threads don't oversubscribe the cores
+            os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+        self._lock = threading.Lock()
+        self.stats = {
+            'passes': 0,
+            'total_seconds': 0.0,
+            'max_seconds': 0.0
+        }
+        self.last_timings = []  # most recent (label, seconds) passes
+
+    def _run_pass(self, image, config: str, lang: str, label: str) -> Dict:
+        start = time.perf_counter()
+        ocr_data = pytesseract.image_to_data(image, lang=lang, config=config,
+                                             output_type=pytesseract.Output.DICT)
+        elapsed = time.perf_counter() - start
+
+        print(f"[OCR] {label} completato in {elapsed:.2f}s")
+        with self._lock:
+            self.stats['passes'] += 1
+            self.stats['total_seconds'] += elapsed
+            self.stats['max_seconds'] = max(self.stats['max_seconds'], elapsed)
+            self.last_timings.append((label, round(elapsed, 3)))
+            del self.last_timings[:-20]
+
+        return ocr_data
+
+    def submit(self, image, config: str, lang: str = 'ita+eng', label: str = ''):
+        """Queue one image_to_data pass, returning a Future with the OCR dict"""
+        return self._executor.submit(self._run_pass, image, config, lang, label or config)
+
+    def run_passes(self, image, passes: List[Tuple[str, str]], lang: str = 'ita+eng') -> List[Dict]:
+        """
+        Run several passes on the same image concurrently.
+        passes: list of (label, config); results are returned in the same order.
+        Must not be called from a worker of this executor (it would wait on itself).
+        """
+        futures = [self.submit(image, config, lang=lang, label=label) for label, config in passes]
+        return [future.result() for future in futures]
+
+    def get_stats(self) -> Dict:
+        """Get pass counters and recent per-pass timings"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['avg_seconds'] = stats['total_seconds'] / stats['passes'] if stats['passes'] else 0.0
+            stats['max_workers'] = self.max_workers
+            stats['last_timings'] = list(self.last_timings)
+        return stats
@@ -0,0 +1,216 @@
+"""
+Page Raster Cache
+Stores rendered PDF pages on disk, content-addressed by (file_hash, page, dpi),
+with an in-memory LRU tier in front to avoid re-rendering pages
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Dict
+
+
+class PageRasterCache:
+    def __init__(self, cache_dir='page_cache', max_disk_bytes=2 * 1024 * 1024 * 1024,
+                 max_memory_bytes=256 * 1024 * 1024):
+        """Initialize raster cache with a disk folder and memory/disk size limits"""
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> bytes, ordered from least to most recently used
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0
+        }
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._disk_bytes = self._scan_disk_usage()
+
+    def _key(self, file_hash: str, page_num: int, dpi: int, variant: str) -> str:
+        return f"{file_hash}/p{page_num}_{dpi}dpi.{variant}"
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, *key.split('/'))
+
+    def _scan_disk_usage(self) -> int:
+        """Sum the size of all cached files on disk"""
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _remember(self, key: str, data: bytes):
+        """Insert into memory tier, evicting least recently used entries (lock held)"""
+        if len(data) > self.max_memory_bytes:
+            return
+
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.stats['memory_evictions'] += 1
+
+    def _evict_disk(self):
+        """Delete least recently used files until disk usage is under 90% of the limit"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+        entries.sort()
+        target = int(self.max_disk_bytes * 0.9)
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.stats['disk_evictions'] += 1
+            except OSError:
+                pass
+
+        self._disk_bytes = total
+
+    def get(self, file_hash: str, page_num: int, dpi: int, variant: str = 'png') -> Optional[bytes]:
+        """Get cached raster bytes, checking memory first and then disk"""
+        key = self._key(file_hash, page_num, dpi, variant)
+
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return data
+
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Touch the file so disk eviction follows access order
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self.stats['disk_hits'] += 1
+            self._remember(key, data)
+        return data
+
+    def contains(self, file_hash: str, page_num: int, dpi: int, variant: str = 'png') -> bool:
+        """Whether raster bytes are cached (memory or disk), without reading them"""
+        key = self._key(file_hash, page_num, dpi, variant)
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self._disk_path(key))
+
+    def put(self, file_hash: str, page_num: int, dpi: int, data: bytes, variant: str = 'png'):
+        """Store raster bytes in memory and on disk"""
+        key = self._key(file_hash, page_num, dpi, variant)
+        path = self._disk_path(key)
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            existing_size = os.path.getsize(path) if os.path.exists(path) else 0
+
+            # Write to a temporary file first so readers never see partial images
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[RasterCache] Error writing {key}: {e}")
+            existing_size = len(data)
+
+        with self._lock:
+            self._remember(key, data)
+            self._disk_bytes += len(data) - existing_size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def get_or_render(self, file_hash: str, page_num: int, dpi: int,
+                      render: Callable[[], Optional[bytes]], variant: str = 'png') -> Optional[bytes]:
+        """Return cached raster bytes, calling render() and storing its result on a miss"""
+        data = self.get(file_hash, page_num, dpi, variant)
+        if data is not None:
+            return data
+
+        data = render()
+        if data is not None:
+            self.put(file_hash, page_num, dpi, data, variant)
+        return data
+
+    def delete_document(self, file_hash: str):
+        """Remove all cached rasters for a document"""
+        prefix = f"{file_hash}/"
+        with self._lock:
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                self._memory_bytes -= len(self._memory.pop(key))
+
+        doc_dir = os.path.join(self.cache_dir, file_hash)
+        if os.path.isdir(doc_dir):
+            for name in os.listdir(doc_dir):
+                try:
+                    os.remove(os.path.join(doc_dir, name))
+                except OSError:
+                    pass
+            try:
+                os.rmdir(doc_dir)
+            except OSError:
+                pass
+
+        with self._lock:
+            self._disk_bytes = self._scan_disk_usage()
+
+    def clear(self):
+        """Clear all cached rasters (memory and disk)"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.isdir(path):
+                self.delete_document(name)
+
+        with self._lock:
+            self._disk_bytes = self._scan_disk_usage()
+
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters and current memory/disk usage"""
+        with self._lock:
+            stats = dict(self.stats)
+            lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+            stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_bytes
+            stats['disk_bytes'] = self._disk_bytes
+            stats['max_memory_bytes'] = self.max_memory_bytes
+            stats['max_disk_bytes'] = self.max_disk_bytes
+        return stats
@@ -0,0 +1,515 @@
+"""
+Page Extraction
+Numbers, dates, references and units with their bounding boxes from the chars of a
+textual PDF page (words rebuilt from chars, horizontal/vertical digit merges, rotated
+text, nearby words as context). Pure functions of the chars, plus the worker side of
+the parallel all-pages extraction: ExtractionPool keeps a long-lived pool of processes
+started from a clean forkserver (spawn where unavailable), never forked from the
+multithreaded web server. Workers import this module only and open their own documents
+"""
+
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Sequence, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+import pdfplumber
+
+from spatial_index import GridIndex
+from text_backend import pymupdf_page_chars, extract_words as extract_words_from_chars
+from word_table import WordTable, WordTableBuilder
+
+
+# Documenti tenuti aperti da ogni processo worker tra un intervallo di pagine e l'altro
+WORKER_MAX_OPEN_DOCUMENTS = 2
+
+
+def contains_numbers(text):
+    """Check if text contains at least one number"""
+    if not text:
+        return False
+    return any(c.isdigit() for c in text)
+
+def is_date(text):
+    """Verifica se il testo sembra una data"""
+    import re
+    # Patterns per date comuni: DD/MM/YYYY, DD-MM-YYYY, DD.MM.YYYY, YYYY-MM-DD, etc.
+    date_patterns = [
+        r'\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4}',  # DD/MM/YYYY o simili
+        r'\d{4}[/\-\.]\d{1,2}[/\-\.]\d{1,2}',      # YYYY-MM-DD o simili
+        r'\d{1,2}\s+(?:gen|feb|mar|apr|mag|giu|lug|ago|set|ott|nov|dic)[a-z]*\s+\d{2,4}',  # DD mese YYYY
+    ]
+    for pattern in date_patterns:
+        if re.search(pattern, text.lower()):
+            return True
+    return False
+
+def is_reference(text):
+    """Verifica se il testo sembra un riferimento progetto/documento"""
+    import re
+    # Patterns per riferimenti: numero progetto, codice documento, etc.
+    # Es: "P-12345", "DOC-001", "REV.2", "N°123", ecc.
+    ref_patterns = [
+        r'(?:prog|project|doc|ref|cod|rif|rev|n)[°\.]?\s*[:\-]?\s*\d+',
+        r'[A-Z]{2,}-\d+',  # Codici tipo "AB-123"
+        r'(?:rev|version|ver)[\.:]?\s*\d+',
+    ]
+    for pattern in ref_patterns:
+        if re.search(pattern, text.lower()):
+            return True
+    return False
+
+def is_measurement_unit(text):
+    """Verifica se il testo contiene unità di misura"""
+    units = ['mm', 'cm', 'm', 'km', 'kg', 'g', 'l', 'ml', '°', 'kw', 'kva', 'v', 'a', 'hz', 'bar', 'mpa']
+    text_lower = text.lower()
+    return any(unit in text_lower for unit in units)
+
+def build_word_center_index(words):
+    """Indice spaziale dei centri delle parole di una WordTable"""
+    return GridIndex(zip(words.center_x.tolist(), words.center_y.tolist()))
+
+
+def extract_context_around(words, idx, max_distance=50, index=None):
+    """
+    Estrae parole di contesto vicine alla parola idx di una WordTable.
+    index: indice dei centri delle parole (build_word_center_index), per non scorrere tutta la tabella
+    """
+    context = []
+    word_text = words.text[idx]
+    word_x0 = float(words.x0[idx])
+    word_center_x = word_x0 + (float(words.x1[idx]) - word_x0) / 2
+    word_center_y = float(words.top[idx]) + (float(words.bottom[idx]) - float(words.top[idx])) / 2
+
+    if index is not None:
+        candidates = index.query_radius(word_center_x, word_center_y, max_distance)
+    else:
+        candidates = range(len(words))
+
+    for j in candidates:
+        other_text = words.text[j]
+        other_x0 = float(words.x0[j])
+        if other_text == word_text and abs(other_x0 - word_x0) < 1:
+            continue  # Stessa parola
+
+        other_center_x = other_x0 + (float(words.x1[j]) - other_x0) / 2
+        other_center_y = float(words.top[j]) + (float(words.bottom[j]) - float(words.top[j])) / 2
+
+        distance = ((word_center_x - other_center_x)**2 + (word_center_y - other_center_y)**2)**0.5
+
+        if distance < max_distance:
+            context.append({
+                'text': other_text,
+                'distance': distance,
+                'direction': 'left' if other_center_x < word_center_x else 'right'
+            })
+
+    # Ordina per distanza
+    context.sort(key=lambda x: x['distance'])
+    return context[:5]  # Ritorna al massimo 5 parole di contesto
+
+
+def stable_sort_order(primary, secondary):
+    """Indici che ordinano per (primary, secondary) come sorted() con chiave a tupla (stabile)"""
+    order = np.argsort(secondary, kind='stable')
+    return order[np.argsort(primary[order], kind='stable')]
+
+
+def reconstruct_rotated_words(chars):
+    """
+    Ricostruisce parole da caratteri ruotati a 90°/270°.
+    I caratteri ruotati sono già orientati, quindi dobbiamo solo raggrupparli.
+    chars: caratteri pdfplumber; restituisce una WordTable
+    """
+    if len(chars) == 0:
+        return WordTable([], [], [], [], [])
+
+    # Ordina caratteri per posizione (prima per x poi per y, dato che sono ruotati)
+    table = WordTable.from_records(chars)
+    y0 = np.array([c['y0'] for c in chars], dtype=np.float64)
+    order = stable_sort_order(table.x0, y0)
+    table = table.take(order)
+    y0 = y0[order]
+
+    # I caratteri ruotati sono adiacenti al precedente se hanno x simile e y vicino
+    # (o viceversa a seconda della direzione di rotazione)
+    is_adjacent = (np.abs(np.diff(table.x0)) < 15) & (np.abs(np.diff(y0)) < 20)
+
+    # Una parola per ogni sequenza di caratteri adiacenti
+    starts = np.concatenate(([0], np.flatnonzero(~is_adjacent) + 1))
+    ends = np.append(starts[1:], len(table))
+    text = [''.join(table.text[start:end]) for start, end in zip(starts.tolist(), ends.tolist())]
+
+    return WordTable(text,
+                     np.minimum.reduceat(table.x0, starts),
+                     np.maximum.reduceat(table.x1, starts),
+                     np.minimum.reduceat(table.top, starts),
+                     np.maximum.reduceat(table.bottom, starts))
+
+
+def merge_horizontal_digits(words):
+    """
+    Unisce cifre consecutive sulla stessa riga orizzontale.
+    Questo cattura numeri come "1 2 3 4" che sono scritti con spazi larghi.
+    words: WordTable; il risultato è ordinato per riga (y) poi per colonna (x)
+    """
+    if len(words) == 0:
+        return words
+
+    stripped = [text.strip() for text in words.text]
+    is_digit = [len(text) == 1 and text.isdigit() for text in stripped]
+    top = words.top.tolist()
+    x0 = words.x0.tolist()
+    x1 = words.x1.tolist()
+
+    merged = WordTableBuilder()
+    used = set()
+
+    # Ordina per riga (y) poi per colonna (x)
+    order = stable_sort_order(words.top, words.x0).tolist()
+
+    # Solo le cifre singole possono essere unite: le altre parole non si scorrono nella ricerca
+    digit_order = [i for i in order if is_digit[i]]
+    digit_rank = {i: rank for rank, i in enumerate(digit_order)}
+
+    for i in order:
+        if i in used:
+            continue
+
+        # Solo per caratteri singoli numerici
+        if not is_digit[i]:
+            merged.add_row(words, i)
+            used.add(i)
+            continue
+
+        # Trova altri numeri sulla stessa riga
+        candidates = [i]
+        base_y = top[i]
+        base_x_end = x1[i]
+
+        # Cerca numeri successivi sulla stessa riga
+        for j in digit_order[digit_rank[i] + 1:]:
+            if j in used:
+                continue
+
+            # Controlla se è sulla stessa riga
+            y_diff = abs(top[j] - base_y)
+            if y_diff > 5:  # Tolleranza 5px per la stessa riga
+                break  # Siamo passati ad un'altra riga
+
+            # Controlla distanza orizzontale (max 200px tra cifre)
+            x_dist = x0[j] - base_x_end
+            if x_dist < 0 or x_dist > 200:
+                continue
+
+            candidates.append(j)
+            base_x_end = x1[j]
+
+        if len(candidates) >= 2:  # Almeno 2 cifre consecutive
+            # Ordina per posizione x
+            candidates.sort(key=lambda idx: x0[idx])
+
+            # Unisci le cifre, con bounding box unificata
+            merged_text = ''.join([stripped[idx] for idx in candidates])
+            merged.add_merged(words, candidates, merged_text)
+
+            print(f"Merged horizontal digits: '{merged_text}' from {len(candidates)} digits")
+            used.update(candidates)
+        else:
+            merged.add_row(words, i)
+            used.add(i)
+
+    return merged.build()
+
+
+def merge_vertical_chars(words):
+    """
+    Unisce caratteri verticali in parole/numeri completi.
+    Gestisce due casi:
+    1. Caratteri singoli con bbox verticale (altezza >> larghezza)
+    2. Caratteri normali disposti verticalmente uno sotto l'altro
+    words: WordTable; restituisce una nuova WordTable
+    """
+    if len(words) == 0:
+        return words
+
+    stripped = [text.strip() for text in words.text]
+    x0 = words.x0.tolist()
+    x1 = words.x1.tolist()
+    top = words.top.tolist()
+    bottom = words.bottom.tolist()
+
+    # Caso 1: bounding box verticale; Caso 2: carattere singolo (possibile testo verticale)
+    widths = words.width
+    is_mergeable = (words.height > widths * 2) | np.array([len(text) == 1 for text in stripped], dtype=bool)
+
+    # Indice spaziale dei soli caratteri unibili, sul punto (centro x, top) usato nei confronti
+    mergeable = np.flatnonzero(is_mergeable).tolist()
+    index = GridIndex(zip(((words.x0 + words.x1) / 2)[is_mergeable].tolist(), words.top[is_mergeable].tolist()))
+    max_mergeable_width = float(widths[is_mergeable].max()) if mergeable else 0
+    is_mergeable = is_mergeable.tolist()
+
+    merged = WordTableBuilder()
+    used = set()
+
+    for i in range(len(words)):
+        if i in used:
+            continue
+
+        if not is_mergeable[i]:
+            # Parola già completa, mantieni così
+            merged.add_row(words, i)
+            used.add(i)
+            continue
+
+        width = x1[i] - x0[i]
+        height = bottom[i] - top[i]
+
+        # Cerca altri caratteri nella stessa "colonna verticale"
+        candidates = [i]
+        base_x = (x0[i] + x1[i]) / 2
+        base_y = top[i]
+        base_height = height
+
+        # Solo i caratteri entro la tolleranza massima possibile (x) e sotto la parola (y),
+        # con un margine minimo per gli arrotondamenti: i controlli esatti restano sotto
+        max_x_tolerance = max(20, max(width, max_mergeable_width) * 1.5) + 1e-6
+        max_y = max(bottom[i], top[i]) + max(50, base_height * 2) + 1e-6
+        nearby = index.query(base_x - max_x_tolerance, base_y, base_x + max_x_tolerance, max_y)
+
+        # Considera solo caratteri singoli o con bbox verticale (gli unici nell'indice)
+        for j in (mergeable[k] for k in nearby):
+            if j == i or j in used:
+                continue
+
+            other_width = x1[j] - x0[j]
+            other_x = (x0[j] + x1[j]) / 2
+            other_y = top[j]
+
+            # Stessa colonna verticale (x simile)
+            x_diff = abs(base_x - other_x)
+
+            # Distanza verticale
+            if other_y > base_y:
+                y_gap = other_y - (bottom[i] if j > i else top[i])
+            else:
+                continue  # Salta caratteri sopra (li prenderemo quando sarà il loro turno)
+
+            # Tolleranze più ampie per catturare testo ruotato
+            x_tolerance = max(20, max(width, other_width) * 1.5)
+            y_tolerance = max(50, base_height * 2)
+
+            if x_diff < x_tolerance and y_gap < y_tolerance:
+                candidates.append(j)
+
+        if len(candidates) > 1:
+            # Ordina per posizione verticale (top to bottom)
+            candidates.sort(key=lambda idx: top[idx])
+
+            # Unisci i caratteri, con bounding box unificata
+            merged_text = ''.join([stripped[idx] for idx in candidates])
+            merged.add_merged(words, candidates, merged_text)
+
+            print(f"Merged vertical text: '{merged_text}' from {len(candidates)} characters")
+            used.update(candidates)
+        else:
+            merged.add_row(words, i)
+            used.add(i)
+
+    return merged.build()
+
+
+def extract_page_data(chars: List[Dict], text_backend: str) -> List[Dict]:
+    """
+    Estrae numeri, date e riferimenti dai caratteri di una pagina (backend di testo text_backend)
+    Restituisce una lista di elementi tipizzati con bbox in punti PDF (72 DPI)
+    """
+    results = []
+
+    # FASE 1: Estrai caratteri con informazioni di rotazione
+    print(f"\n=== {text_backend.upper()} CHAR-LEVEL EXTRACTION ===")
+    print(f"Total chars extracted: {len(chars)}")
+
+    # Raggruppa caratteri ruotati (90° o 270°)
+    # pdfplumber usa "matrix" per la trasformazione
+    # matrix[0] e matrix[3] indicano la rotazione
+    # Rotazione 90°: matrix = (0, 1, -1, 0, x, y)
+    # Rotazione 0°: matrix = (1, 0, 0, 1, x, y)
+    matrices = np.array([char.get('matrix', (1, 0, 0, 1, 0, 0)) for char in chars],
+                        dtype=np.float64).reshape(-1, 6)
+
+    # Rileva rotazione
+    is_rotated_90 = (np.abs(matrices[:, 0]) < 0.1) & (np.abs(matrices[:, 1]) > 0.9)  # 90° clockwise
+    is_rotated_270 = (np.abs(matrices[:, 0]) < 0.1) & (np.abs(matrices[:, 3]) < -0.9)  # 270° clockwise (90° counter)
+
+    rotated_chars = [chars[i] for i in np.flatnonzero(is_rotated_90 | is_rotated_270).tolist()]
+
+    print(f"Rotated chars: {len(rotated_chars)}, Normal chars: {len(chars) - len(rotated_chars)}")
+
+    # FASE 2: Estrai words normalmente (tabella colonnare, i dict si creano solo per i risultati)
+    words = WordTable.from_records(extract_words_from_chars(chars))
+
+    print(f"\n=== WORD-LEVEL EXTRACTION ===")
+    print(f"Total words extracted: {len(words)}")
+
+    # Stampa alcuni esempi di caratteri singoli per debug
+    single_chars = sum(1 for text in words.text if len(text.strip()) == 1)
+    print(f"Single characters found: {single_chars}")
+
+    # FASE 3A: Unisci caratteri orizzontali (numeri sulla stessa riga)
+    print(f"\nAttempting to merge horizontal digit sequences...")
+    words_before_h = len(words)
+    words = merge_horizontal_digits(words)
+    words_after_h = len(words)
+    print(f"Words before horizontal merge: {words_before_h}, after merge: {words_after_h}, reduced by: {words_before_h - words_after_h}")
+
+    # FASE 3B: Unisci caratteri verticali (da words)
+    print(f"\nAttempting to merge vertical characters...")
+    words_before = len(words)
+    words = merge_vertical_chars(words)
+    words_after = len(words)
+    print(f"Words before merge: {words_before}, after merge: {words_after}, reduced by: {words_before - words_after}")
+
+    # FASE 4: Ricostruisci parole da caratteri ruotati
+    if len(rotated_chars) > 0:
+        print(f"\nReconstructing words from {len(rotated_chars)} rotated characters...")
+        rotated_words = reconstruct_rotated_words(rotated_chars)
+        print(f"Created {len(rotated_words)} words from rotated chars")
+        words = WordTable.concat([words, rotated_words])
+
+    # Indice spaziale per la ricerca del contesto (evita la scansione di tutte le parole)
+    word_index = build_word_center_index(words)
+
+    x0 = words.x0.tolist()
+    top = words.top.tolist()
+    widths = words.width.tolist()
+    heights = words.height.tolist()
+
+    for idx, raw_text in enumerate(words.text):
+        text = raw_text.strip()
+        if not text:
+            continue
+
+        # Determina il tipo di dato
+        data_type = 'text'
+        if contains_numbers(text):
+            data_type = 'number'
+        if is_date(text):
+            data_type = 'date'
+        if is_reference(text):
+            data_type = 'reference'
+        if is_measurement_unit(text):
+            data_type = 'unit'
+
+        # Estrai solo dati rilevanti (numeri, date, riferimenti, unità)
+        if data_type in ['number', 'date', 'reference', 'unit']:
+            # Estrai contesto (parole vicine)
+            context = extract_context_around(words, idx, max_distance=50, index=word_index)
+            context_text = ' '.join([c['text'] for c in context[:3]])
+
+            results.append({
+                'id': idx,
+                'text': text,
+                'type': data_type,
+                'bbox': {
+                    'x': x0[idx],
+                    'y': top[idx],
+                    'width': widths[idx],
+                    'height': heights[idx]
+                },
+                'context': context_text,
+                'source': 'pdfplumber',
+                'confidence': 100  # pdfplumber è preciso al 100%
+            })
+
+    return results
+
+
+_worker_documents = OrderedDict()  # (file_hash, text_backend) -> documento aperto (nel processo worker)
+
+
+def _worker_document(pdf_path: str, file_hash: str, text_backend: str):
+    """Document handle of this worker process, reused across ranges (least recently used closed first)"""
+    key = (file_hash, text_backend)
+    doc = _worker_documents.pop(key, None)
+    if doc is None:
+        doc = fitz.open(pdf_path) if text_backend == 'pymupdf' else pdfplumber.open(pdf_path)
+    _worker_documents[key] = doc
+    while len(_worker_documents) > WORKER_MAX_OPEN_DOCUMENTS:
+        _, oldest = _worker_documents.popitem(last=False)
+        oldest.close()
+    return doc
+
+
+def _page_chars(doc, page_num: int, text_backend: str) -> List[Dict]:
+    if text_backend == 'pymupdf':
+        return pymupdf_page_chars(doc[page_num])
+    page = doc.pages[page_num]
+    try:
+        return page.chars
+    finally:
+        # Rilascia il layout della pagina (il documento resta aperto)
+        page.close()
+
+
+def extract_page_range(pdf_path: str, file_hash: str, text_backend: str,
+                       first_page: int, last_page: int) -> List[List[Dict]]:
+    """Worker task: extract_page_data on pages [first_page, last_page), one list per page"""
+    doc = _worker_document(pdf_path, file_hash, text_backend)
+    return [extract_page_data(_page_chars(doc, page_num, text_backend), text_backend)
+            for page_num in range(first_page, last_page)]
+
+
+class ExtractionPool:
+    def __init__(self, max_workers: int):
+        """Initialize pool with the total number of worker processes (shared by all requests)"""
+        self.max_workers = max(max_workers, 1)
+        self._lock = threading.Lock()
+        self._executor = None  # created on first use
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    # Forkserver: processo nuovo a un solo thread che precarica solo questo modulo.
+                    # Come con spawn, ogni worker esegue anche lo script principale come __mp_main__
+                    # (unified_app non crea lì i suoi servizi, vedi init_services)
+                    context.set_forkserver_preload(['page_extraction'])
+                else:
+                    context = multiprocessing.get_context('spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._executor
+
+    def extract_ranges(self, pdf_path: str, file_hash: str, text_backend: str,
+                       ranges: Sequence[Tuple[int, int]]) -> List[List[Dict]]:
+        """
+        extract_page_range over the (first_page, last_page) ranges on the worker processes,
+        one list per page in range order. A pool broken by a dead worker is replaced on the
+        next call (BrokenProcessPool is raised to the caller)
+        """
+        executor = self._get_executor()
+        firsts, lasts = zip(*ranges)
+        count = len(ranges)
+        pages = []
+        try:
+            for range_pages in executor.map(extract_page_range, [pdf_path] * count, [file_hash] * count,
+                                            [text_backend] * count, firsts, lasts):
+                pages.extend(range_pages)
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise
+        return pages
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
@@ -0,0 +1,69 @@
+"""
+Spatial Index
+Uniform grid over 2D points (box centers, corners...) built once per page, so
+neighbor searches in the extraction geometry code look at nearby cells only
+instead of scanning every word
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class GridIndex:
+    def __init__(self, points: Iterable[Tuple[float, float]], cell_size: Optional[float] = None):
+        """Index points (position in the iterable is the returned index); cell_size defaults to ~2 points per cell"""
+        self.points = [(float(x), float(y)) for x, y in points]
+
+        if cell_size is None:
+            cell_size = self._default_cell_size()
+        self.cell_size = cell_size
+
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        for idx, (x, y) in enumerate(self.points):
+            self._cells.setdefault(self._cell(x, y), []).append(idx)
+
+    def _default_cell_size(self) -> float:
+        if len(self.points) < 2:
+            return 1.0
+        xs = [x for x, _ in self.points]
+        ys = [y for _, y in self.points]
+        area = max(max(xs) - min(xs), 1.0) * max(max(ys) - min(ys), 1.0)
+        return max(math.sqrt(area * 2 / len(self.points)), 1.0)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def __len__(self):
+        return len(self.points)
+
+    def query(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        """Indices of points inside the closed rectangle, in ascending (insertion) order"""
+        if x1 < x0 or y1 < y0:
+            return []
+
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):
+            # Rectangle larger than the populated area: walk the occupied cells instead
+            cells = [points for (cx, cy), points in self._cells.items()
+                     if cx0 <= cx <= cx1 and cy0 <= cy <= cy1]
+        else:
+            cells = [self._cells[(cx, cy)] for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)
+                     if (cx, cy) in self._cells]
+
+        found = []
+        for points in cells:
+            for idx in points:
+                x, y = self.points[idx]
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    found.append(idx)
+
+        found.sort()
+        return found
+
+    def query_radius(self, x: float, y: float, radius: float) -> List[int]:
+        """Candidate indices within the square of half-side radius (callers apply their exact distance test)"""
+        # Slightly enlarged so float rounding never drops a point right at the boundary
+        radius = radius * (1 + 1e-9) + 1e-9
+        return self.query(x - radius, y - radius, x + radius, y + radius)
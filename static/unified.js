@@ -197,6 +197,10 @@ function setupDragAndDrop() {
     // Handle dropped files
     imageContainer.addEventListener('drop', handleDrop, false);
 
+    // Deep-zoom viewer: load the tiles that scroll into view
+    imageContainer.addEventListener('scroll', scheduleTileUpdate, {passive: true});
+    window.addEventListener('resize', scheduleTileUpdate);
+
     function handleDrop(e) {
         const dt = e.dataTransfer;
         const files = dt.files;
@@ -353,32 +357,21 @@ async function uploadFile() {
 
     progressMessage.textContent = 'Preparazione...';
 
-    // Crea loader con progressione animata
-    const progressMessages = [
-        '📤 Caricamento PDF...',
-        '🔍 Analisi documento...',
-        '🗂️ Estrazione layout...',
-        '📐 Estrazione dimensioni...'
-    ];
-    let messageIndex = 0;
-
-    // Aggiorna status con animazione
-    const updateStatusMessage = () => {
-        status.textContent = progressMessages[messageIndex];
-        progressMessage.textContent = progressMessages[messageIndex];
-        messageIndex = (messageIndex + 1) % progressMessages.length;
-    };
+    status.textContent = '📤 Caricamento PDF...';
+    progressMessage.textContent = '📤 Caricamento PDF...';
 
-    updateStatusMessage();
-    const progressInterval = setInterval(updateStatusMessage, 1500);
+    // Avanzamento reale per pagina (fase dimensioni), dagli eventi del job
+    let jobProgress = null;
 
     // Start real-time timer update
     progressTimerInterval = setInterval(() => {
         const elapsed = (performance.now() - uploadStartTime) / 1000;
         timeElapsed.textContent = elapsed.toFixed(1);
 
-        // Update progress bar based on elapsed vs estimated
-        if (estimatedTime && estimatedTime > 0) {
+        // Update progress bar: real page progress when known, otherwise elapsed vs estimated
+        if (jobProgress !== null) {
+            progressBar.style.width = Math.min(jobProgress, 95) + '%';
+        } else if (estimatedTime && estimatedTime > 0) {
             const progress = Math.min((elapsed / estimatedTime) * 100, 95); // Cap at 95% until complete
             progressBar.style.width = progress + '%';
         } else {
@@ -411,43 +404,47 @@ async function uploadFile() {
     `;
     textList.innerHTML = '<p class="placeholder">Attendi...</p>';
 
-    // Poll upload status to show retry attempts in real-time
-    const statusPollInterval = setInterval(async () => {
-        try {
-            const statusResponse = await fetch('/upload_status');
-            const status = await statusResponse.json();
+    // Progress events of the upload job (stage, page, retry attempts) in real time
+    const showJobProgress = (progress) => {
+        const messageEl = document.getElementById('upload-status-message');
+        const detailsEl = document.getElementById('upload-status-details');
 
-            const messageEl = document.getElementById('upload-status-message');
-            const detailsEl = document.getElementById('upload-status-details');
+        status.textContent = progress.message;
+        progressMessage.textContent = progress.message;
+        if (progress.stage === 'dimensions' && progress.total_pages > 0) {
+            jobProgress = (progress.page / progress.total_pages) * 100;
+        }
 
-            if (messageEl && status.status !== 'idle') {
-                messageEl.textContent = status.message || 'Elaborazione in corso...';
+        if (messageEl) {
+            messageEl.textContent = progress.message || 'Elaborazione in corso...';
 
-                if (status.status === 'retry') {
-                    detailsEl.textContent = `Tentativo ${status.retry_attempt}/5 con temperatura +${status.temperature.toFixed(1)}`;
-                    detailsEl.style.color = '#ff9800';
-                } else {
-                    detailsEl.textContent = '';
-                }
+            if (progress.stage === 'retry') {
+                detailsEl.textContent = `Tentativo ${progress.retry_attempt}/5 con temperatura +${progress.temperature.toFixed(1)}`;
+                detailsEl.style.color = '#ff9800';
+            } else {
+                detailsEl.textContent = '';
             }
-        } catch (error) {
-            console.log('[Status Poll] Error:', error);
         }
-    }, 500); // Poll every 500ms
-
-    try {
-        console.log('[Upload] Sending fetch request to /upload...');
-        const response = await fetch('/upload', {
-            method: 'POST',
-            body: formData
-        });
-        console.log('[Upload] Response received, status:', response.status);
+    };
 
-        // Ferma animazione progressione e polling
-        clearInterval(progressInterval);
-        clearInterval(statusPollInterval);
+    // First page of a linearized PDF, shown while the rest is still uploading
+    const showFirstPagePreview = (url) => {
+        const messageEl = document.getElementById('upload-status-message');
+        const preview = document.createElement('img');
+        preview.src = url;
+        preview.alt = 'Anteprima prima pagina';
+        preview.style.cssText = 'max-width: 100%; max-height: 400px; margin-top: 15px; border: 1px solid #ddd;';
+        if (messageEl) {
+            messageEl.parentElement.appendChild(preview);
+        }
+    };
 
-        const data = await response.json();
+    try {
+        console.log('[Upload] Submitting upload job...');
+        // File grandi: upload a chunk ripristinabile (oltre il limite della singola richiesta)
+        const data = file.size > CHUNKED_UPLOAD_THRESHOLD
+            ? await runChunkedUpload(file, showJobProgress, showFirstPagePreview)
+            : await runUploadJob(formData, showJobProgress);
         console.log('[Upload] Response data:', {success: data.success, page_count: data.page_count});
 
         if (data.success) {
@@ -544,7 +541,7 @@ async function uploadFile() {
             }
 
             // Display first page with boxes
-            displayImage(data.page_image);
+            displayImage(data.page_image_url);
 
             // Salva il metodo di estrazione usato per questa pagina
             currentExtractionMethod = data.extraction_method || 'none';
@@ -771,6 +768,136 @@ async function uploadFile() {
     }
 }
 
+/**
+ * Submit an upload job and follow its Server-Sent Events until it ends.
+ * Resolves with the upload result (same data as the synchronous /upload response)
+ * or with {success: false, error}. EventSource reconnects by itself, resuming
+ * from the last event id it received.
+ */
+async function runUploadJob(formData, onProgress) {
+    const response = await fetch('/upload/jobs', {
+        method: 'POST',
+        body: formData
+    });
+    const job = await response.json();
+    console.log('[Upload] Job submitted, status:', response.status, job.job_id);
+    if (!job.success) {
+        return {success: false, error: job.error};
+    }
+
+    return followUploadJob(job.job_id, onProgress);
+}
+
+function followUploadJob(jobId, onProgress) {
+    return new Promise((resolve) => {
+        const source = new EventSource(`/upload/jobs/${jobId}/events`);
+        source.addEventListener('progress', (event) => onProgress(JSON.parse(event.data)));
+        source.addEventListener('complete', (event) => {
+            source.close();
+            resolve(JSON.parse(event.data).result);
+        });
+        source.addEventListener('failed', (event) => {
+            source.close();
+            resolve({success: false, error: JSON.parse(event.data).error});
+        });
+        // Stream chiuso dal browser (es. 404: job rimosso o server riavviato): niente più
+        // riconnessioni, l'esito si chiede allo stato del job
+        source.onerror = () => {
+            if (source.readyState !== EventSource.CLOSED) {
+                return;
+            }
+            fetchUploadJobOutcome(jobId).then(resolve);
+        };
+    });
+}
+
+async function fetchUploadJobOutcome(jobId) {
+    try {
+        const response = await fetch(`/upload/jobs/${jobId}`);
+        const job = await response.json();
+        if (job.status === 'complete') {
+            return job.result;
+        }
+        if (job.status === 'error') {
+            return {success: false, error: job.error};
+        }
+        return {success: false, error: job.error || `Job ${job.status}: aggiornamenti non disponibili`};
+    } catch (error) {
+        return {success: false, error: error.message};
+    }
+}
+
+// Files above this size are sent with the chunked upload protocol
+const CHUNKED_UPLOAD_THRESHOLD = 32 * 1024 * 1024;
+const CHUNK_MAX_ATTEMPTS = 5;
+
+async function putUploadChunk(uploadId, index, blob) {
+    // Ritenta con attesa crescente: il server conferma anche i chunk già ricevuti
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const response = await fetch(`/upload/chunked/${uploadId}/chunks/${index}`, {
+                method: 'PUT',
+                headers: {'Content-Type': 'application/octet-stream'},
+                body: blob
+            });
+            const data = await response.json();
+            if (response.ok || response.status === 409 || response.status === 400 || attempt >= CHUNK_MAX_ATTEMPTS) {
+                return data;
+            }
+        } catch (error) {
+            if (attempt >= CHUNK_MAX_ATTEMPTS) {
+                return {success: false, error: error.message};
+            }
+        }
+        console.log(`[Upload] Chunk ${index} failed, retry ${attempt}/${CHUNK_MAX_ATTEMPTS}`);
+        await new Promise((resolve) => setTimeout(resolve, 1000 * attempt));
+    }
+}
+
+async function runChunkedUpload(file, onProgress, onFirstPage) {
+    const initResponse = await fetch('/upload/chunked', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({filename: file.name, size: file.size})
+    });
+    let upload = await initResponse.json();
+    if (!upload.success) {
+        return {success: false, error: upload.error};
+    }
+    console.log(`[Upload] Chunked upload ${upload.upload_id}: ${upload.chunk_count} chunks`);
+
+    let previewShown = false;
+    let index = upload.next_chunk;
+    while (index < upload.chunk_count) {
+        const start = index * upload.chunk_size;
+        const result = await putUploadChunk(upload.upload_id, index, file.slice(start, start + upload.chunk_size));
+        if (result.next_chunk === undefined) {
+            return {success: false, error: result.error};
+        }
+        if (!result.success && result.next_chunk === index) {
+            return {success: false, error: result.error};
+        }
+        upload = {...upload, ...result};
+        index = upload.next_chunk;
+
+        const percent = Math.round((upload.received / upload.total_size) * 100);
+        onProgress({stage: 'uploading', message: `📤 Caricamento PDF... ${percent}%`});
+        if (upload.first_page_url && !previewShown) {
+            previewShown = true;
+            onFirstPage(upload.first_page_url);
+        }
+    }
+
+    const finalizeResponse = await fetch(`/upload/chunked/${upload.upload_id}/finalize`, {method: 'POST'});
+    const job = await finalizeResponse.json();
+    console.log('[Upload] Chunked upload finalized, status:', finalizeResponse.status, job.job_id);
+    if (!job.success) {
+        return {success: false, error: job.error};
+    }
+
+    return followUploadJob(job.job_id, onProgress);
+}
+
 async function handleExtractUnified() {
     // Use current page (0-indexed)
     const pageNum = currentPage;
@@ -813,7 +940,7 @@ async function handleExtractUnified() {
             currentDisplayData = data.numbers; // Store for download
 
             // Display image con interattività bidirezionale
-            displayImageWithClickableBoxes(data.image, data.numbers);
+            displayImageWithClickableBoxes(data.image_url, data.numbers);
 
             // Display numbers list con interattività bidirezionale
             displayNumbersListInteractive(data.numbers);
@@ -848,11 +975,11 @@ async function handleExtractUnified() {
     }
 }
 
-function displayImageWithClickableBoxes(imageBase64, numbers) {
-    currentPageImage = imageBase64;
+function displayImageWithClickableBoxes(imageSrc, numbers) {
+    currentPageImage = imageSrc;
     imageContainer.innerHTML = '';
     const img = document.createElement('img');
-    img.src = imageBase64.startsWith('data:') ? imageBase64 : `data:image/png;base64,${imageBase64}`;
+    img.src = toImageSrc(imageSrc);
     img.id = 'mainImage';
 
     // Add click handler per rettangoli
@@ -955,7 +1082,7 @@ async function highlightNumberOnImage(numberId) {
         if (data.success) {
             const img = document.getElementById('mainImage');
             if (img) {
-                img.src = data.image.startsWith('data:') ? data.image : `data:image/png;base64,${data.image}`;
+                img.src = toImageSrc(data.image_url);
             }
         }
     } catch (error) {
@@ -963,11 +1090,19 @@ async function highlightNumberOnImage(numberId) {
     }
 }
 
-function displayImage(imageBase64) {
-    currentPageImage = imageBase64; // Store for AI vision
+// Images are served as URLs (cached by the browser via ETag); base64 is still accepted
+function toImageSrc(image) {
+    if (image.startsWith('data:') || image.startsWith('/')) {
+        return image;
+    }
+    return `data:image/png;base64,${image}`;
+}
+
+function displayImage(imageSrc) {
+    currentPageImage = imageSrc; // Store for AI vision (server resolves image URLs)
     imageContainer.innerHTML = '';
     const img = document.createElement('img');
-    img.src = imageBase64.startsWith('data:') ? imageBase64 : `data:image/png;base64,${imageBase64}`;
+    img.src = toImageSrc(imageSrc);
     img.id = 'mainImage';
     img.addEventListener('click', handleImageClick);
     imageContainer.appendChild(img);
@@ -1037,7 +1172,7 @@ async function navigateToPage(newPage) {
                 currentDisplayData = data.numbers;
 
                 // Display image with boxes
-                displayImage(data.image);
+                displayImage(data.image_url);
 
                 // Display numbers list
                 displayNumbersList(data.numbers);
@@ -1059,9 +1194,9 @@ async function navigateToPage(newPage) {
             const response = await fetch(`/get_page/${newPage}`);
             const data = await response.json();
 
-            if (data.success && data.page_image) {
+            if (data.success && data.page_image_url) {
                 currentPage = newPage;
-                displayImage(data.page_image);
+                displayImage(data.page_image_url);
                 textList.innerHTML = '<p class="placeholder">Nessuna estrazione automatica</p>';
             } else {
                 console.error('Failed to load page:', data.error);
@@ -1264,7 +1399,7 @@ async function highlightNumber(numberId) {
         const response = await fetch(`/highlight/${numberId}`);
         const data = await response.json();
         if (data.success) {
-            updateImageOnly(data.image);
+            updateImageOnly(data.image_url);
             setTimeout(() => {
                 addMultipleHighlightOverlays(sameValueNumbers);
             }, 100);
@@ -1274,10 +1409,10 @@ async function highlightNumber(numberId) {
     }
 }
 
-function updateImageOnly(imageBase64) {
+function updateImageOnly(imageSrc) {
     const img = document.getElementById('mainImage');
     if (img) {
-        img.src = imageBase64;
+        img.src = toImageSrc(imageSrc);
     }
 }
 
@@ -1347,6 +1482,7 @@ function applyZoom() {
     if (img) {
         img.style.width = currentZoom + '%';
         zoomLevel.textContent = currentZoom + '%';
+        scheduleTileUpdate();
         if (currentHighlightedNumbers.length > 0) {
             setTimeout(() => {
                 addMultipleHighlightOverlays(currentHighlightedNumbers);
@@ -1355,6 +1491,110 @@ function applyZoom() {
     }
 }
 
+// ============================================================================
+// DEEP-ZOOM TILE VIEWER
+// ============================================================================
+
+let tileViewer = null; // { info, img, layer, tiles, level } of the page shown as tiles
+let tileUpdateScheduled = false;
+
+async function displayTiledPage(fileHash, pageNum) {
+    const response = await fetch(`/images/tiles/${fileHash}/${pageNum}/info`);
+    const info = await response.json();
+    if (!info.success) {
+        throw new Error(info.error || 'Pagina non disponibile');
+    }
+
+    // Level 0 is a single small tile: it paints immediately (whatever the sheet size)
+    // and stays underneath as a placeholder while the sharper tiles load
+    const img = document.createElement('img');
+    img.src = tileUrl(info, 0, 0, 0);
+    img.style.width = `${currentZoom}%`;
+    img.id = 'mainImage';
+
+    const layer = document.createElement('div');
+    layer.className = 'tile-layer';
+
+    imageContainer.innerHTML = '';
+    imageContainer.appendChild(img);
+    imageContainer.appendChild(layer);
+
+    tileViewer = { info, img, layer, tiles: new Map(), level: -1 };
+    img.addEventListener('load', scheduleTileUpdate);
+}
+
+function tileUrl(info, level, x, y) {
+    return info.tile_url.replace('{z}', level).replace('{x}', x).replace('{y}', y);
+}
+
+function scheduleTileUpdate() {
+    if (!tileViewer || tileUpdateScheduled) return;
+    tileUpdateScheduled = true;
+    requestAnimationFrame(() => {
+        tileUpdateScheduled = false;
+        updateVisibleTiles();
+    });
+}
+
+function updateVisibleTiles() {
+    if (!tileViewer) return;
+    if (!tileViewer.img.isConnected) {
+        // Another view replaced the tiled page
+        tileViewer = null;
+        return;
+    }
+
+    const { info, img, layer, tiles } = tileViewer;
+    const displayWidth = img.clientWidth;
+    const displayHeight = img.clientHeight;
+    if (!displayWidth || !displayHeight) return;
+
+    // Lowest level with at least one image pixel per device pixel
+    const wantedWidth = displayWidth * (window.devicePixelRatio || 1);
+    const levelInfo = info.levels.find(l => l.size[0] >= wantedWidth) || info.levels[info.levels.length - 1];
+
+    if (levelInfo.level !== tileViewer.level) {
+        layer.innerHTML = '';
+        tiles.clear();
+        tileViewer.level = levelInfo.level;
+    }
+
+    layer.style.left = img.offsetLeft + 'px';
+    layer.style.top = img.offsetTop + 'px';
+    layer.style.width = displayWidth + 'px';
+    layer.style.height = displayHeight + 'px';
+
+    const [levelWidth, levelHeight] = levelInfo.size;
+    const [columns, rows] = levelInfo.grid;
+    const tileWidth = info.tile_size * displayWidth / levelWidth;
+    const tileHeight = info.tile_size * displayHeight / levelHeight;
+
+    // Viewport in layer coordinates
+    const viewLeft = imageContainer.scrollLeft - img.offsetLeft;
+    const viewTop = imageContainer.scrollTop - img.offsetTop;
+    const firstColumn = Math.max(0, Math.floor(viewLeft / tileWidth));
+    const lastColumn = Math.min(columns - 1, Math.floor((viewLeft + imageContainer.clientWidth) / tileWidth));
+    const firstRow = Math.max(0, Math.floor(viewTop / tileHeight));
+    const lastRow = Math.min(rows - 1, Math.floor((viewTop + imageContainer.clientHeight) / tileHeight));
+
+    for (let y = firstRow; y <= lastRow; y++) {
+        for (let x = firstColumn; x <= lastColumn; x++) {
+            const key = `${x}_${y}`;
+            if (tiles.has(key)) continue;
+
+            // Positions in percent: zooming within the same level only resizes the layer
+            const tile = document.createElement('img');
+            tile.src = tileUrl(info, levelInfo.level, x, y);
+            tile.style.left = (x * info.tile_size / levelWidth * 100) + '%';
+            tile.style.top = (y * info.tile_size / levelHeight * 100) + '%';
+            tile.style.width = (Math.min(info.tile_size, levelWidth - x * info.tile_size) / levelWidth * 100) + '%';
+            tile.style.height = (Math.min(info.tile_size, levelHeight - y * info.tile_size) / levelHeight * 100) + '%';
+            layer.appendChild(tile);
+            tiles.set(key, tile);
+        }
+    }
+}
+
 // ============================================================================
 // AI ANALYSIS FUNCTIONS (AI PROVIDER INTEGRATION)
 // ============================================================================
@@ -4349,14 +4589,8 @@ async function loadPageFromCache(fileHash, pageNumber) {
             return;
         }
 
-        // Display page image (no highlighting, just preview)
-        const img = document.createElement('img');
-        img.src = `data:image/png;base64,${data.page_image}`;
-        img.style.width = `${currentZoom}%`;
-        img.id = 'mainImage';
-
-        imageContainer.innerHTML = '';
-        imageContainer.appendChild(img);
+        // Display page as deep-zoom tiles (no highlighting, just preview)
+        await displayTiledPage(fileHash, pageNumber - 1);
 
         currentPage = pageNumber - 1; // Store 0-indexed page
         updatePageIndicator();
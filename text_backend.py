@@ -0,0 +1,155 @@
+"""
+Text Backends
+Char-level text extraction for textual PDFs from either pdfplumber (pdfminer layout
+analysis, the reference) or PyMuPDF rawdict (much faster). PyMuPDF glyphs are converted
+to pdfplumber-style char dicts (x0/x1/top/bottom, matrix, upright), then grouped into
+words and text with pdfplumber's own algorithms, so both backends feed the same pipeline
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from pdfminer.fontmetrics import FONT_METRICS
+from pdfplumber.utils import chars_to_textmap, crop_to_bbox, extract_words as pdfplumber_extract_words
+
+
+BACKENDS = ('pdfplumber', 'pymupdf')
+DEFAULT_BACKEND = 'pdfplumber'
+
+# Impostazioni di raggruppamento in parole usate in tutta l'applicazione
+WORD_SETTINGS = {
+    'x_tolerance': 3,
+    'y_tolerance': 3,
+    'keep_blank_chars': False,
+    'use_text_flow': True
+}
+
+# rawdict senza ritaglio alla MediaBox (pdfminer non scarta i glifi fuori pagina)
+RAWDICT_FLAGS = fitz.TEXTFLAGS_RAWDICT & ~fitz.TEXT_MEDIABOX_CLIP
+
+
+def _xref_value(doc: fitz.Document, xref: int, key: str) -> Optional[str]:
+    value_type, value = doc.xref_get_key(xref, key)
+    return None if value_type == 'null' else value
+
+
+def _descriptor_descent(doc: fitz.Document, font_xref: int) -> Optional[float]:
+    """/Descent of the font's FontDescriptor (descendant font for Type0), per unit of font size"""
+    descendants = _xref_value(doc, font_xref, 'DescendantFonts')
+    if descendants and descendants.startswith('[') and descendants.endswith('R]'):
+        font_xref = int(descendants.strip('[]').split()[0])
+
+    descriptor = _xref_value(doc, font_xref, 'FontDescriptor')
+    if not descriptor or not descriptor.endswith(' R'):
+        return None
+    descent = _xref_value(doc, int(descriptor.split()[0]), 'Descent')
+    if descent is None:
+        return 0.0
+    # Come pdfminer: /Descent è sempre negativo
+    return -abs(float(descent)) * 0.001
+
+
+def page_font_descents(page: fitz.Page) -> Dict[str, float]:
+    """
+    Descent of each page font as pdfminer uses it for char boxes: base-14 metrics
+    for Type1/TrueType fonts pdfminer knows, otherwise the FontDescriptor /Descent
+    """
+    descents = {}
+    for xref, _, font_type, basefont, *_ in page.get_fonts(full=True):
+        metrics = FONT_METRICS.get(basefont) if font_type in ('Type1', 'MMType1', 'TrueType') else None
+        if metrics:
+            descent = -abs(float(metrics[0].get('Descent', 0))) * 0.001
+        else:
+            descent = _descriptor_descent(page.parent, xref)
+        if descent is not None:
+            descents[basefont] = descent
+            descents[basefont.split('+', 1)[-1]] = descent  # PyMuPDF omette il prefisso dei subset
+    return descents
+
+
+def _glyph_char(glyph: Dict, span: Dict, direction: Tuple[float, float], descent: float,
+                rotation_matrix: Optional[fitz.Matrix], page_height: float) -> Dict:
+    """
+    pdfplumber-style char from a rawdict glyph. Like pdfminer, the box spans the advance
+    along the baseline and one font size across it, starting at the font descent.
+    """
+    cos, sin = direction  # direzione della riga in coordinate PyMuPDF (y verso il basso)
+    size = span['size']
+    origin_x, origin_y = glyph['origin']
+    gx0, gy0, gx1, gy1 = glyph['bbox']
+    advance = abs(cos) * (gx1 - gx0) + abs(sin) * (gy1 - gy0)
+
+    # "Su" rispetto al testo: (sin, -cos)
+    low = descent * size
+    high = low + size
+    xs = []
+    ys = []
+    for along in (0.0, advance):
+        for across in (low, high):
+            xs.append(origin_x + along * cos + across * sin)
+            ys.append(origin_y + along * sin - across * cos)
+
+    x0, x1, top, bottom = min(xs), max(xs), min(ys), max(ys)
+    if rotation_matrix is not None:
+        rect = fitz.Rect(x0, top, x1, bottom) * rotation_matrix
+        x0, top, x1, bottom = rect.x0, rect.y0, rect.x1, rect.y1
+        point = fitz.Point(cos, sin) * fitz.Matrix(rotation_matrix.a, rotation_matrix.b,
+                                                    rotation_matrix.c, rotation_matrix.d, 0, 0)
+        cos, sin = point.x, point.y
+
+    # Matrice come pdfminer (coordinate PDF, y verso l'alto): rotazione 90° = (0, 1, -1, 0, x, y)
+    a, b, c, d = cos, -sin, sin, cos
+    return {
+        'text': glyph['c'],
+        'x0': x0,
+        'x1': x1,
+        'top': top,
+        'bottom': bottom,
+        'doctop': top,
+        'width': x1 - x0,
+        'height': bottom - top,
+        'size': size,
+        'fontname': span['font'],
+        'matrix': (a, b, c, d, origin_x, page_height - origin_y),
+        'upright': a * d > 0 and b * c <= 0
+    }
+
+
+def pymupdf_page_chars(page: fitz.Page) -> List[Dict]:
+    """Chars of a PyMuPDF page in content order, in pdfplumber coordinates (top-left origin, points)"""
+    rotation_matrix = page.rotation_matrix if page.rotation else None
+    page_height = page.rect.height
+    descents = page_font_descents(page)
+
+    chars = []
+    for block in page.get_text('rawdict', flags=RAWDICT_FLAGS)['blocks']:
+        for line in block.get('lines', []):
+            direction = line['dir']
+            for span in line['spans']:
+                descent = descents.get(span['font'], span['descender'])
+                for glyph in span['chars']:
+                    if glyph.get('synthetic'):
+                        continue  # spazi aggiunti da PyMuPDF, non presenti nel PDF
+                    char = _glyph_char(glyph, span, direction, descent, rotation_matrix, page_height)
+                    char['y0'] = page_height - char['bottom']
+                    char['y1'] = page_height - char['top']
+                    chars.append(char)
+    return chars
+
+
+def extract_words(chars: List[Dict]) -> List[Dict]:
+    """Words from chars with the application settings (pdfplumber grouping)"""
+    return pdfplumber_extract_words(chars, **WORD_SETTINGS)
+
+
+def extract_text(chars: List[Dict], width: float, height: float) -> str:
+    """Page text as pdfplumber's page.extract_text() builds it"""
+    if not chars:
+        return ''
+    return chars_to_textmap(chars, layout_bbox=(0, 0, width, height),
+                            layout_width=width, layout_height=height).as_string
+
+
+def crop_chars(chars: List[Dict], region: Tuple[float, float, float, float]) -> List[Dict]:
+    """Chars intersecting region (x0, top, x1, bottom), clipped to it like page.crop()"""
+    return crop_to_bbox(chars, region)
@@ -0,0 +1,131 @@
+"""
+Text Region Detection
+Finds candidate text areas on a binarized page (morphology + connected components)
+and packs them into a compact mosaic, so Tesseract reads only the text instead of
+the whole sheet. OCR boxes found on the mosaic are mapped back to page coordinates
+"""
+
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+
+Region = Tuple[int, int, int, int]  # x, y, width, height
+
+
+def _merge_regions(regions: List[Region], gap: int) -> List[Region]:
+    """Union regions that overlap or are closer than gap pixels, until stable"""
+    boxes = [[x, y, x + w, y + h] for x, y, w, h in regions]
+    merged = True
+    while merged:
+        merged = False
+        boxes.sort()
+        result = []
+        for box in boxes:
+            for other in result:
+                if (box[0] <= other[2] + gap and other[0] <= box[2] + gap and
+                        box[1] <= other[3] + gap and other[1] <= box[3] + gap):
+                    other[0] = min(other[0], box[0])
+                    other[1] = min(other[1], box[1])
+                    other[2] = max(other[2], box[2])
+                    other[3] = max(other[3], box[3])
+                    merged = True
+                    break
+            else:
+                result.append(box)
+        boxes = result
+
+    return [(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in boxes]
+
+
+def detect_text_regions(binary: np.ndarray, min_height: int = 8, max_height: int = 200,
+                        padding: int = 8, merge_gap: int = 10) -> List[Region]:
+    """
+    Candidate text regions of a binarized page (foreground = 255), sizes in pixels at 300 DPI.
+    Long drawing lines are removed first so they don't join unrelated labels.
+    """
+    height, width = binary.shape[:2]
+
+    # Linee lunghe orizzontali/verticali (quote, cornici) fuori dalla maschera del testo
+    line_length = max(40, min(height, width) // 40)
+    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN,
+                                  cv2.getStructuringElement(cv2.MORPH_RECT, (line_length, 1)))
+    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN,
+                                cv2.getStructuringElement(cv2.MORPH_RECT, (1, line_length)))
+    text_mask = cv2.subtract(binary, cv2.bitwise_or(horizontal, vertical))
+
+    # Unisci i caratteri in parole/righe
+    joined = cv2.dilate(text_mask, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 5)))
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(joined, connectivity=8)
+
+    regions = []
+    for i in range(1, count):
+        x, y, w, h = (int(value) for value in stats[i][:4])
+        if h < min_height or h > max_height:
+            continue
+        regions.append((max(0, x - padding), max(0, y - padding),
+                        min(width, x + w + padding) - max(0, x - padding),
+                        min(height, y + h + padding) - max(0, y - padding)))
+
+    regions = _merge_regions(regions, merge_gap)
+    regions.sort(key=lambda r: (r[1], r[0]))
+    return regions
+
+
+def build_mosaic(binary: np.ndarray, regions: List[Region], max_width: int = None,
+                 gap: int = 32) -> Tuple[np.ndarray, List[Dict]]:
+    """
+    Pack region crops into rows of a single image (shelf packing), separated by gap
+    pixels of background so Tesseract never joins words of different crops.
+    Returns the mosaic and placements {'region', 'mosaic_x', 'mosaic_y'}.
+    """
+    if max_width is None:
+        max_width = binary.shape[1]
+    max_width = max([max_width] + [w + 2 * gap for _, _, w, _ in regions])
+
+    placements = []
+    cursor_x, cursor_y, row_height = gap, gap, 0
+    for region in sorted(regions, key=lambda r: -r[3]):
+        _, _, w, h = region
+        if cursor_x + w + gap > max_width:
+            cursor_x = gap
+            cursor_y += row_height + gap
+            row_height = 0
+        placements.append({'region': region, 'mosaic_x': cursor_x, 'mosaic_y': cursor_y})
+        cursor_x += w + gap
+        row_height = max(row_height, h)
+
+    mosaic_height = cursor_y + row_height + gap
+    mosaic = np.zeros((mosaic_height, max_width), dtype=binary.dtype)
+    for placement in placements:
+        x, y, w, h = placement['region']
+        mx, my = placement['mosaic_x'], placement['mosaic_y']
+        mosaic[my:my + h, mx:mx + w] = binary[y:y + h, x:x + w]
+
+    return mosaic, placements
+
+
+def map_ocr_data_to_page(ocr_data: Dict, placements: List[Dict]) -> Dict:
+    """
+    Translate image_to_data boxes from mosaic to page coordinates.
+    Words are assigned to the crop containing their center; words outside any crop are dropped.
+    """
+    mapped = {column: [] for column in ocr_data}
+    for i in range(len(ocr_data['text'])):
+        left, top = ocr_data['left'][i], ocr_data['top'][i]
+        center_x = left + ocr_data['width'][i] / 2
+        center_y = top + ocr_data['height'][i] / 2
+
+        for placement in placements:
+            _, _, w, h = placement['region']
+            mx, my = placement['mosaic_x'], placement['mosaic_y']
+            if mx <= center_x < mx + w and my <= center_y < my + h:
+                for column in ocr_data:
+                    mapped[column].append(ocr_data[column][i])
+                mapped['left'][-1] = left - mx + placement['region'][0]
+                mapped['top'][-1] = top - my + placement['region'][1]
+                break
+
+    return mapped
@@ -0,0 +1,71 @@
+"""
+Tile Pyramid
+Geometry of a deep-zoom tile pyramid for a PDF page: the highest level is the page
+rendered at max_dpi, every lower level halves the resolution, down to level 0 which
+fits in a single tile. Tiles are rendered on demand with get_pixmap(clip=...)
+"""
+
+import math
+from typing import Dict, Optional, Tuple
+
+
+class TilePyramid:
+    def __init__(self, page_width: float, page_height: float, max_dpi: int = 300, tile_size: int = 512):
+        """Initialize pyramid for a page of the given size in PDF points (rotation already applied)"""
+        self.page_width = page_width
+        self.page_height = page_height
+        self.max_dpi = max_dpi
+        self.tile_size = tile_size
+
+        self.width, self.height = self._pixel_size(max_dpi / 72.0)
+
+        longest = max(self.width, self.height, 1)
+        self.levels = math.ceil(math.log2(longest / tile_size)) + 1 if longest > tile_size else 1
+
+    def _pixel_size(self, scale: float) -> Tuple[int, int]:
+        return max(1, math.ceil(self.page_width * scale)), max(1, math.ceil(self.page_height * scale))
+
+    def level_scale(self, level: int) -> float:
+        """Zoom factor (pixels per PDF point) of a level"""
+        return (self.max_dpi / 72.0) / (2 ** (self.levels - 1 - level))
+
+    def level_size(self, level: int) -> Tuple[int, int]:
+        """Pixel size of the whole page at a level"""
+        return self._pixel_size(self.level_scale(level))
+
+    def tile_grid(self, level: int) -> Tuple[int, int]:
+        """Number of tile columns and rows at a level"""
+        width, height = self.level_size(level)
+        return math.ceil(width / self.tile_size), math.ceil(height / self.tile_size)
+
+    def tile_clip(self, level: int, x: int, y: int) -> Optional[Tuple[float, float, float, float]]:
+        """Page area (in PDF points) covered by a tile, or None if the tile does not exist"""
+        if level < 0 or level >= self.levels:
+            return None
+
+        columns, rows = self.tile_grid(level)
+        if x < 0 or y < 0 or x >= columns or y >= rows:
+            return None
+
+        width, height = self.level_size(level)
+        scale = self.level_scale(level)
+        x0 = x * self.tile_size
+        y0 = y * self.tile_size
+        x1 = min(x0 + self.tile_size, width)
+        y1 = min(y0 + self.tile_size, height)
+
+        return (x0 / scale, y0 / scale,
+                min(x1 / scale, self.page_width), min(y1 / scale, self.page_height))
+
+    def to_dict(self) -> Dict:
+        """Pyramid description for the viewer"""
+        return {
+            'width': self.width,
+            'height': self.height,
+            'max_dpi': self.max_dpi,
+            'tile_size': self.tile_size,
+            'levels': [
+                {'level': level, 'size': self.level_size(level), 'grid': self.tile_grid(level)}
+                for level in range(self.levels)
+            ]
+        }
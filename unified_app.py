@@ -9,13 +9,12 @@ Combines:
 """
 
 import os
-from flask import Flask, render_template, request, jsonify, send_file, session
+from flask import (Flask, render_template, request, jsonify, send_file, session, url_for, make_response,
+                   Response, stream_with_context, copy_current_request_context)
 from werkzeug.utils import secure_filename
-import pdfplumber
 import fitz  # PyMuPDF
 import pytesseract
 from PIL import Image, ImageDraw
-import cv2
 import numpy as np
 import base64
 import io
@@ -27,8 +26,34 @@ from dotenv import load_dotenv
 import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill
 import uuid
+import re
+from urllib.parse import parse_qs, urlparse
+import hashlib
+import threading
+import time
+import tracemalloc
+import asyncio
+from contextlib import contextmanager, nullcontext
 from ai_providers import AIProviderManager
-from document_cache import DocumentCache
+from ai_limits import ProviderLimits, parse_provider_limits
+from document_cache import DocumentCache, PAGE_TEXT_BATCH, compact_ocr_data
+from page_cache import PageRasterCache
+from document_pool import DocumentHandlePool
+from tile_pyramid import TilePyramid
+from ocr_executor import OCRExecutor
+from job_queue import Job, JobQueue
+from chunked_upload import ChunkedUploadStore
+from preprocessing import PreprocessPipeline, PROFILES as PREPROCESS_PROFILES, DEFAULT_PROFILE
+from text_regions import detect_text_regions, build_mosaic, map_ocr_data_to_page
+from spatial_index import GridIndex
+from word_table import WordTable
+from text_backend import (BACKENDS as TEXT_BACKENDS, DEFAULT_BACKEND as DEFAULT_TEXT_BACKEND, pymupdf_page_chars,
+                          extract_words as extract_words_from_chars, extract_text as extract_text_from_chars,
+                          crop_chars)
+from box_overlap import remove_text_duplicates, resolve_rotation_overlaps
+from page_extraction import ExtractionPool, extract_page_data, contains_numbers
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # Load environment variables from .env file
 load_dotenv()
@@ -45,81 +70,254 @@ app.config['TEMPLATES_FOLDER'] = 'saved_templates'
 app.config['DIMENSION_PROMPTS_FOLDER'] = 'saved_dimension_prompts'
 app.config['LAYOUT_PROMPTS_FOLDER'] = 'layout_prompts'
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max
-ALLOWED_EXTENSIONS = {'pdf'}
 
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['TEMPLATES_FOLDER'], exist_ok=True)
-os.makedirs(app.config['DIMENSION_PROMPTS_FOLDER'], exist_ok=True)
-os.makedirs(app.config['LAYOUT_PROMPTS_FOLDER'], exist_ok=True)
+# Bytes read per step while an upload is hashed and written to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+app.config['PAGE_CACHE_FOLDER'] = 'page_cache'
+ALLOWED_EXTENSIONS = {'pdf'}
 
-# Configure AI Provider Manager
 DEMO_MODE = os.environ.get('DEMO_MODE', 'false').lower() == 'true'
-ai_manager = AIProviderManager()
-
-# Initialize Document Cache Manager
-doc_cache = DocumentCache()
-print("[Cache] Document cache initialized")
-
-# Global upload status tracking
-upload_status = {
-    'status': 'idle',  # idle, uploading, extracting, analyzing, retry, complete
-    'message': '',
-    'page': 0,
-    'total_pages': 0,
-    'retry_attempt': 0,
-    'temperature': 0.0,
-    'from_cache': False
-}
+
+# OCR preprocessing: default profile (quality, median, bilateral, pyramid)
+app.config['OCR_PREPROCESS_PROFILE'] = os.environ.get('OCR_PREPROCESS_PROFILE', DEFAULT_PROFILE)
+
+# OCR only on detected text regions packed into a mosaic (opt-in, also per request).
+# Not a win with Tesseract 5 (benchmark_text_regions.py on rasterized drawings: 1.06x, 68% recall)
+app.config['OCR_TEXT_REGIONS'] = os.environ.get('OCR_TEXT_REGIONS', '0') == '1'
+
+# Picco di memoria per pagina via tracemalloc (solo diagnostica: rallenta ogni allocazione)
+app.config['TRACE_PAGE_MEMORY'] = os.environ.get('TRACE_PAGE_MEMORY', '0') == '1'
+
+# Text backend for textual PDFs: 'pdfplumber' (reference) or 'pymupdf' (rawdict, faster)
+app.config['PDF_TEXT_BACKEND'] = os.environ.get('PDF_TEXT_BACKEND', DEFAULT_TEXT_BACKEND)
+if app.config['PDF_TEXT_BACKEND'] not in TEXT_BACKENDS:
+    print(f"[Text] Unknown PDF_TEXT_BACKEND '{app.config['PDF_TEXT_BACKEND']}', using {DEFAULT_TEXT_BACKEND}")
+    app.config['PDF_TEXT_BACKEND'] = DEFAULT_TEXT_BACKEND
+
+# Worker processes for whole-document textual extraction (default: CPU count, 1 = serial),
+# one long-lived pool shared by all requests (processes started on first use)
+app.config['EXTRACT_WORKERS'] = int(os.environ.get('EXTRACT_WORKERS', '0')) or os.cpu_count() or 1
+
+# Deep-zoom tiles for the viewer (full resolution level rendered at TILE_MAX_DPI)
+app.config['TILE_SIZE'] = int(os.environ.get('TILE_SIZE', '512'))
+app.config['TILE_MAX_DPI'] = int(os.environ.get('TILE_MAX_DPI', '300'))
+
+# Pages with more text than this (characters) are textual, otherwise they need OCR
+TEXTUAL_PAGE_MIN_CHARS = 100
+
+# File hash memo: (path, inode, mtime, size) -> sha256, avoids rehashing current.pdf on every request
+_file_hash_memo = {}
 
 # Keep backward compatibility with legacy code
 ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY', '')
 anthropic_client = None
-if ANTHROPIC_API_KEY:
-    anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
 
-if DEMO_MODE:
-    print("[WARNING] DEMO MODE ENABLED - Using simulated AI responses")
-elif ai_manager.is_any_available():
-    available = ai_manager.get_available_providers()
-    print(f"AI Providers initialized: {', '.join(available.values())}")
-    print(f"Current provider: {ai_manager.get_current_provider_name()}")
-else:
-    print("Warning: No AI providers configured. Add API keys to .env file.")
+
+def init_services():
+    """
+    Create the folders and the services shared by all requests (AI providers, caches,
+    worker pools, job queues). Called once when the app module is loaded, not when an
+    extraction worker re-imports this script
+    """
+    global ai_manager, doc_cache, raster_cache, doc_pool, ocr_executor, preprocess_pipeline
+    global extract_pool, upload_jobs, chunked_uploads, ai_limits, anthropic_client
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['TEMPLATES_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['DIMENSION_PROMPTS_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['LAYOUT_PROMPTS_FOLDER'], exist_ok=True)
+
+    # Configure AI Provider Manager
+    ai_manager = AIProviderManager()
+
+    # Initialize Document Cache Manager
+    doc_cache = DocumentCache(
+        max_ocr_bytes=int(os.environ.get('OCR_CACHE_MAX_MB', '256')) * 1024 * 1024
+    )
+    print("[Cache] Document cache initialized")
+
+    # Initialize rendered page cache (disk + memory LRU)
+    raster_cache = PageRasterCache(
+        cache_dir=app.config['PAGE_CACHE_FOLDER'],
+        max_disk_bytes=int(os.environ.get('PAGE_CACHE_MAX_DISK_MB', '2048')) * 1024 * 1024,
+        max_memory_bytes=int(os.environ.get('PAGE_CACHE_MAX_MEMORY_MB', '256')) * 1024 * 1024
+    )
+    print("[Cache] Page raster cache initialized")
+
+    # Shared open-document handles (PyMuPDF/pdfplumber) keyed by file hash
+    doc_pool = DocumentHandlePool(
+        max_open=int(os.environ.get('DOC_POOL_MAX_OPEN', '8')),
+        idle_timeout=int(os.environ.get('DOC_POOL_IDLE_TIMEOUT', '300'))
+    )
+
+    # Bounded pool for Tesseract passes (PSM modes and rotations run concurrently)
+    ocr_executor = OCRExecutor(max_workers=int(os.environ.get('OCR_WORKERS', '0')) or None)
+
+    # Binarized page cache of the OCR preprocessing
+    preprocess_pipeline = PreprocessPipeline(max_cached_pages=int(os.environ.get('PREPROCESS_CACHE_PAGES', '8')))
+
+    extract_pool = ExtractionPool(max_workers=app.config['EXTRACT_WORKERS'])
+
+    # Background ingestion jobs (/upload, /upload/jobs): bounded number of documents processed at once
+    upload_jobs = JobQueue(max_workers=int(os.environ.get('UPLOAD_WORKERS', '2')))
+
+    # Resumable chunked uploads (/upload/chunked): each chunk is one request under MAX_CONTENT_LENGTH,
+    # the whole file up to CHUNKED_UPLOAD_MAX_MB
+    chunked_uploads = ChunkedUploadStore(
+        os.path.join(app.config['UPLOAD_FOLDER'], 'chunked'),
+        chunk_size=int(os.environ.get('CHUNKED_UPLOAD_CHUNK_MB', '8')) * 1024 * 1024,
+        max_size=int(os.environ.get('CHUNKED_UPLOAD_MAX_MB', '4096')) * 1024 * 1024,
+        max_age=int(os.environ.get('CHUNKED_UPLOAD_MAX_AGE_HOURS', '24')) * 3600
+    )
+
+    # Per-provider limits on AI calls (pages of an upload are extracted concurrently): requests in flight
+    # and requests per minute (0 = unlimited), per-provider overrides as "gemini=8/60,claude=4/50"
+    ai_limits = ProviderLimits(
+        max_concurrency=int(os.environ.get('AI_MAX_CONCURRENCY', '4')),
+        requests_per_minute=int(os.environ.get('AI_REQUESTS_PER_MINUTE', '0')),
+        overrides=parse_provider_limits(os.environ.get('AI_PROVIDER_LIMITS', ''))
+    )
+
+    if ANTHROPIC_API_KEY:
+        anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
+
+    if DEMO_MODE:
+        print("[WARNING] DEMO MODE ENABLED - Using simulated AI responses")
+    elif ai_manager.is_any_available():
+        available = ai_manager.get_available_providers()
+        print(f"AI Providers initialized: {', '.join(available.values())}")
+        print(f"Current provider: {ai_manager.get_current_provider_name()}")
+    else:
+        print("Warning: No AI providers configured. Add API keys to .env file.")
+
+
+# I worker di estrazione (spawn/forkserver) eseguono di nuovo lo script principale come
+# __mp_main__ prima di ogni processo: lì servono solo le funzioni di page_extraction,
+# non cartelle, database, pool di thread/processi e client AI
+if __name__ != '__mp_main__':
+    init_services()
 
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def _file_hash_memo_key(file_path):
+    st = os.stat(file_path)
+    return os.path.abspath(file_path), st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def remember_file_hash(file_path, file_hash):
+    """Record a hash computed while the file was written (no rehash on the next get_file_hash)"""
+    if len(_file_hash_memo) >= 64:
+        _file_hash_memo.clear()
+    _file_hash_memo[_file_hash_memo_key(file_path)] = file_hash
+
+
+def get_file_hash(file_path):
+    """Get SHA256 of a file, reusing the previous result while the file is unchanged"""
+    memo_key = _file_hash_memo_key(file_path)
+
+    file_hash = _file_hash_memo.get(memo_key)
+    if file_hash is None:
+        file_hash = doc_cache.calculate_file_hash(file_path)
+        remember_file_hash(file_path, file_hash)
+    return file_hash
+
+
 # ============================================================================
 # PDF PROCESSING CLASS (from web_app.py)
 # ============================================================================
 
+class _PixmapBuffer:
+    """Exposes PyMuPDF pixmap samples to NumPy without copying, keeping the pixmap alive"""
+
+    def __init__(self, pix):
+        self.pixmap = pix
+        if pix.n > 1:
+            shape = (pix.height, pix.width, pix.n)
+            strides = (pix.stride, pix.n, 1)
+        else:
+            shape = (pix.height, pix.width)
+            strides = (pix.stride, 1)
+
+        self.__array_interface__ = {
+            'shape': shape,
+            'typestr': '|u1',
+            'data': (pix.samples_ptr, False),
+            'strides': strides,
+            'version': 3
+        }
+
+
 class PDFProcessor:
     """Handles PDF analysis and text extraction with intelligent type detection"""
 
-    def __init__(self, pdf_path):
+    def __init__(self, pdf_path, file_hash=None, text_backend=None):
         self.pdf_path = pdf_path
+        self.file_hash = file_hash
+        self.text_backend = text_backend or app.config['PDF_TEXT_BACKEND']
+        self._page_metadata = None
         self.pdf_type = None
         self.pages_info = []
 
+    def get_file_hash(self):
+        """Get content hash of the PDF (computed lazily, used as cache key)"""
+        if self.file_hash is None:
+            self.file_hash = get_file_hash(self.pdf_path)
+        return self.file_hash
+
+    def _compute_page_metadata(self):
+        """Geometry and classification of every page (one pass over the document)"""
+        pages = []
+        with doc_pool.fitz_document(self.get_file_hash(), self.pdf_path) as doc:
+            for page_num, page in enumerate(doc):
+                text_length = len(page.get_text().strip())
+                pages.append({
+                    'page_num': page_num,
+                    'width': page.rect.width,
+                    'height': page.rect.height,
+                    'rotation': page.rotation,
+                    'text_length': text_length,
+                    'image_count': len(page.get_images()),
+                    'drawing_count': len(page.get_cdrawings()),
+                    'page_type': 'textual' if text_length > TEXTUAL_PAGE_MIN_CHARS else 'image'
+                })
+        return pages
+
+    def get_page_metadata(self):
+        """Per-page metadata table, computed once per file hash and persisted in the document cache"""
+        if self._page_metadata is None:
+            file_hash = self.get_file_hash()
+            pages = doc_cache.get_page_metadata(file_hash)
+            if pages is None:
+                start = time.perf_counter()
+                pages = self._compute_page_metadata()
+                doc_cache.save_page_metadata(file_hash, pages)
+                print(f"[Cache] Page metadata for {len(pages)} pages computed in {time.perf_counter() - start:.2f}s")
+            self._page_metadata = pages
+        return self._page_metadata
+
+    def get_page_pixel_size(self, page_num, dpi):
+        """Size in pixels of the page rendered at dpi (same rounding as get_pixmap), without rendering it"""
+        page = self.get_page_metadata()[page_num]
+        zoom = dpi / 72
+        irect = (fitz.Rect(0, 0, page['width'], page['height']) * fitz.Matrix(zoom, zoom)).irect
+        return irect.width, irect.height
+
     def detect_pdf_type(self):
-        """Detect if PDF is textual, rasterized, or hybrid"""
-        doc = fitz.open(self.pdf_path)
+        """Detect if PDF is textual, rasterized, or hybrid (from the first 5 pages of the metadata table)"""
         text_pages = 0
         image_pages = 0
 
-        for page_num in range(min(5, len(doc))):
-            page = doc[page_num]
-            text = page.get_text().strip()
-            images = page.get_images()
-
+        self.pages_info = []
+        for page in self.get_page_metadata()[:5]:
             page_info = {
-                'page_num': page_num,
-                'has_text': len(text) > 100,
-                'has_images': len(images) > 0,
-                'text_length': len(text),
-                'image_count': len(images)
+                'page_num': page['page_num'],
+                'has_text': page['text_length'] > TEXTUAL_PAGE_MIN_CHARS,
+                'has_images': page['image_count'] > 0,
+                'text_length': page['text_length'],
+                'image_count': page['image_count']
             }
 
             if page_info['has_text']:
@@ -129,8 +327,6 @@ class PDFProcessor:
 
             self.pages_info.append(page_info)
 
-        doc.close()
-
         total_checked = len(self.pages_info)
 
         if text_pages == total_checked:
@@ -144,99 +340,224 @@ class PDFProcessor:
 
     def get_page_count(self):
         """Get total number of pages"""
-        with pdfplumber.open(self.pdf_path) as pdf:
-            return len(pdf.pages)
+        return len(self.get_page_metadata())
+
+    def get_page_chars(self, page_num=0):
+        """Chars of a page from the text backend, with page width/height (None if the page doesn't exist)"""
+        if self.text_backend == 'pymupdf':
+            with doc_pool.fitz_document(self.get_file_hash(), self.pdf_path) as doc:
+                if page_num >= len(doc):
+                    return None
+                page = doc[page_num]
+                return pymupdf_page_chars(page), page.rect.width, page.rect.height
+
+        with doc_pool.pdfplumber_document(self.get_file_hash(), self.pdf_path) as pdf:
+            if page_num >= len(pdf.pages):
+                return None
+            page = pdf.pages[page_num]
+            return page.chars, page.width, page.height
 
     def extract_with_pdfplumber(self, page_num=0, rotation=0, region=None):
-        """Extract text with coordinates using pdfplumber"""
+        """Extract text with coordinates (pdfplumber word grouping over the text backend's chars)"""
         extracted_data = []
 
-        with pdfplumber.open(self.pdf_path) as pdf:
-            if page_num >= len(pdf.pages):
-                return extracted_data
+        page_chars = self.get_page_chars(page_num)
+        if page_chars is None:
+            return extracted_data
+
+        chars = page_chars[0]
+        if region:
+            chars = crop_chars(chars, region)
+
+        for word in extract_words_from_chars(chars):
+            extracted_data.append({
+                'text': word['text'],
+                'x0': word['x0'],
+                'y0': word['top'],
+                'x1': word['x1'],
+                'y1': word['bottom'],
+                'width': word['x1'] - word['x0'],
+                'height': word['bottom'] - word['top']
+            })
+
+        return extracted_data
+
+    def extract_word_table(self, page_num=0):
+        """Words of a page as a columnar WordTable (same word grouping as extract_with_pdfplumber)"""
+        page_chars = self.get_page_chars(page_num)
+        if page_chars is None:
+            return WordTable([], [], [], [], [])
+        return WordTable.from_records(extract_words_from_chars(page_chars[0]))
 
+    def get_page_text(self, page_num=0):
+        """Text of a page as pdfplumber's extract_text() lays it out (text backend)"""
+        if self.text_backend == 'pymupdf':
+            page_chars = self.get_page_chars(page_num)
+            return extract_text_from_chars(*page_chars) if page_chars else ''
+
+        with doc_pool.pdfplumber_document(self.get_file_hash(), self.pdf_path) as pdf:
+            if page_num >= len(pdf.pages):
+                return ''
             page = pdf.pages[page_num]
+            try:
+                return page.extract_text()
+            finally:
+                # Rilascia oggetti/layout della pagina (il documento resta aperto nel pool)
+                page.close()
+
+    def iter_page_texts(self):
+        """
+        Generator of (page_num, text) for every page, in order. Pages already in the page
+        text store are read from it; the others are extracted one at a time (layout released
+        after each page) and stored in batches as they stream, so an interrupted stream
+        resumes where it stopped
+        """
+        file_hash = self.get_file_hash()
+        page_count = self.get_page_count()
+
+        # Le pagine vengono salvate in ordine: lo store contiene un prefisso del documento
+        next_page = 0
+        for page_num, text in doc_cache.iter_page_texts(file_hash, self.text_backend):
+            if page_num != next_page:
+                break
+            yield page_num, text
+            next_page += 1
+
+        if next_page >= page_count:
+            return
+
+        # Testo estratto con un altro backend: sostituito
+        doc_cache.delete_page_texts(file_hash, other_than=self.text_backend)
+        batch = []
+        for page_num in range(next_page, page_count):
+            text = self.get_page_text(page_num) or ''
+            batch.append((page_num, text))
+            if len(batch) == PAGE_TEXT_BATCH:
+                doc_cache.save_page_texts(file_hash, batch, self.text_backend)
+                batch = []
+            yield page_num, text
+        if batch:
+            doc_cache.save_page_texts(file_hash, batch, self.text_backend)
+
+    def iter_full_text(self, max_chars=None):
+        """
+        Full text in chunks ('--- Page N ---' sections separated by a blank line), streamed
+        from iter_page_texts; with max_chars stops once that many characters were produced
+        """
+        produced = 0
+        for page_num, text in self.iter_page_texts():
+            if not text:
+                continue
+            separator = '\n' if produced else ''
+            chunk = f"{separator}--- Page {page_num + 1} ---\n{text}\n"
+            yield chunk
+            produced += len(chunk)
+            if max_chars is not None and produced >= max_chars:
+                return
+
+    def get_full_text_pdfplumber(self, max_chars=None):
+        """All text from all pages (at least max_chars characters of it, if given)"""
+        return ''.join(self.iter_full_text(max_chars))
+
+    def _render_page_png(self, page_num, dpi):
+        """Render a PDF page to PNG bytes using PyMuPDF (None if page doesn't exist)"""
+        with doc_pool.fitz_document(self.get_file_hash(), self.pdf_path) as doc:
+            if page_num >= len(doc):
+                return None
 
-            if region:
-                page = page.crop(region)
+            page = doc[page_num]
+            zoom = dpi / 72
+            mat = fitz.Matrix(zoom, zoom)
+            pix = page.get_pixmap(matrix=mat)
+            return pix.tobytes("png")
 
-            words = page.extract_words(
-                x_tolerance=3,
-                y_tolerance=3,
-                keep_blank_chars=False,
-                use_text_flow=True
-            )
+    def get_tile_pyramid(self, page_num=0):
+        """Get the deep-zoom tile pyramid geometry of a page (None if page doesn't exist)"""
+        with doc_pool.fitz_document(self.get_file_hash(), self.pdf_path) as doc:
+            if page_num >= len(doc):
+                return None
+            rect = doc[page_num].rect
 
-            for word in words:
-                extracted_data.append({
-                    'text': word['text'],
-                    'x0': word['x0'],
-                    'y0': word['top'],
-                    'x1': word['x1'],
-                    'y1': word['bottom'],
-                    'width': word['x1'] - word['x0'],
-                    'height': word['bottom'] - word['top']
-                })
+        return TilePyramid(rect.width, rect.height,
+                           max_dpi=app.config['TILE_MAX_DPI'], tile_size=app.config['TILE_SIZE'])
 
-        return extracted_data
+    def _render_page_tile(self, page_num, pyramid, level, x, y, fmt):
+        """Render only the page area covered by one tile"""
+        clip = pyramid.tile_clip(level, x, y)
+        if clip is None:
+            return None
 
-    def get_full_text_pdfplumber(self):
-        """Extract all text from all pages using pdfplumber"""
-        full_text = []
+        with doc_pool.fitz_document(self.get_file_hash(), self.pdf_path) as doc:
+            zoom = pyramid.level_scale(level)
+            pix = doc[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=fitz.Rect(clip))
+            png_bytes = pix.tobytes("png")
 
-        with pdfplumber.open(self.pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if text:
-                    full_text.append(f"--- Page {page_num + 1} ---\n{text}\n")
+        return encode_png_as(png_bytes, fmt)
 
-        return "\n".join(full_text)
+    def get_page_tile(self, page_num, level, x, y, fmt='png'):
+        """Get one tile of the page pyramid, rendered on demand and cached per document hash"""
+        pyramid = self.get_tile_pyramid(page_num)
+        if pyramid is None:
+            return None
+
+        return raster_cache.get_or_render(
+            self.get_file_hash(), page_num, pyramid.max_dpi,
+            lambda: self._render_page_tile(page_num, pyramid, level, x, y, fmt),
+            variant=f"tile{pyramid.tile_size}_z{level}_{x}_{y}.{fmt}"
+        )
+
+    def get_page_png(self, page_num=0, dpi=150):
+        """Get PDF page as PNG bytes, served from the raster cache when available"""
+        return raster_cache.get_or_render(
+            self.get_file_hash(), page_num, dpi,
+            lambda: self._render_page_png(page_num, dpi)
+        )
 
     def get_page_image(self, page_num=0, dpi=150):
         """Convert PDF page to base64 encoded image using PyMuPDF"""
         try:
-            doc = fitz.open(self.pdf_path)
-
-            if page_num >= len(doc):
-                doc.close()
+            img_data = self.get_page_png(page_num=page_num, dpi=dpi)
+            if img_data is None:
                 return None
 
-            page = doc[page_num]
-            zoom = dpi / 72
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat)
-
-            img_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_data))
-            doc.close()
-
-            buffered = io.BytesIO()
-            img.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
+            img_str = base64.b64encode(img_data).decode()
             return img_str
 
         except Exception as e:
             print(f"Error converting PDF page to image: {e}")
             return None
 
+    def get_page_array(self, page_num=0, dpi=300, grayscale=False):
+        """
+        Render PDF page straight into a NumPy array for OCR processing.
+        The array wraps the pixmap samples (no PNG encode/decode round trip);
+        with grayscale=True the page is rendered directly in the gray colorspace.
+        """
+        try:
+            with doc_pool.fitz_document(self.get_file_hash(), self.pdf_path) as doc:
+                if page_num >= len(doc):
+                    return None
+
+                page = doc[page_num]
+                zoom = dpi / 72
+                mat = fitz.Matrix(zoom, zoom)
+                colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+                pix = page.get_pixmap(matrix=mat, colorspace=colorspace, alpha=False)
+
+            return np.asarray(_PixmapBuffer(pix))
+
+        except Exception as e:
+            print(f"Error getting PDF page as array: {e}")
+            return None
+
     def get_page_as_pil(self, page_num=0, dpi=300):
         """Get PDF page as PIL Image for OCR processing"""
         try:
-            doc = fitz.open(self.pdf_path)
-
-            if page_num >= len(doc):
-                doc.close()
+            img_data = self.get_page_png(page_num=page_num, dpi=dpi)
+            if img_data is None:
                 return None
 
-            page = doc[page_num]
-            zoom = dpi / 72
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat)
-
-            img_data = pix.tobytes("png")
             img = Image.open(io.BytesIO(img_data))
-            doc.close()
-
             return img
 
         except Exception as e:
@@ -248,457 +569,90 @@ class PDFProcessor:
 # ADVANCED OCR FUNCTIONS (from app.py)
 # ============================================================================
 
-def preprocess_image(image):
-    """Pre-process image to improve OCR using CV2"""
-    img_array = np.array(image)
-    gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-    enhanced = clahe.apply(gray)
-
-    denoised = cv2.fastNlMeansDenoising(enhanced, None, h=5, templateWindowSize=7, searchWindowSize=21)
-    _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-    if np.mean(binary) > 127:
-        binary = cv2.bitwise_not(binary)
-
-    return Image.fromarray(binary)
-
-
-def contains_numbers(text):
-    """Check if text contains at least one number"""
-    if not text:
-        return False
-    return any(c.isdigit() for c in text)
-
-def is_date(text):
-    """Verifica se il testo sembra una data"""
-    import re
-    # Patterns per date comuni: DD/MM/YYYY, DD-MM-YYYY, DD.MM.YYYY, YYYY-MM-DD, etc.
-    date_patterns = [
-        r'\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4}',  # DD/MM/YYYY o simili
-        r'\d{4}[/\-\.]\d{1,2}[/\-\.]\d{1,2}',      # YYYY-MM-DD o simili
-        r'\d{1,2}\s+(?:gen|feb|mar|apr|mag|giu|lug|ago|set|ott|nov|dic)[a-z]*\s+\d{2,4}',  # DD mese YYYY
-    ]
-    for pattern in date_patterns:
-        if re.search(pattern, text.lower()):
-            return True
-    return False
-
-def is_reference(text):
-    """Verifica se il testo sembra un riferimento progetto/documento"""
-    import re
-    # Patterns per riferimenti: numero progetto, codice documento, etc.
-    # Es: "P-12345", "DOC-001", "REV.2", "N°123", ecc.
-    ref_patterns = [
-        r'(?:prog|project|doc|ref|cod|rif|rev|n)[°\.]?\s*[:\-]?\s*\d+',
-        r'[A-Z]{2,}-\d+',  # Codici tipo "AB-123"
-        r'(?:rev|version|ver)[\.:]?\s*\d+',
-    ]
-    for pattern in ref_patterns:
-        if re.search(pattern, text.lower()):
-            return True
-    return False
-
-def is_measurement_unit(text):
-    """Verifica se il testo contiene unità di misura"""
-    units = ['mm', 'cm', 'm', 'km', 'kg', 'g', 'l', 'ml', '°', 'kw', 'kva', 'v', 'a', 'hz', 'bar', 'mpa']
-    text_lower = text.lower()
-    return any(unit in text_lower for unit in units)
-
-def extract_context_around(word, all_words, max_distance=50):
-    """Estrae parole di contesto vicine a una parola data"""
-    context = []
-    word_center_x = word['x0'] + (word['x1'] - word['x0']) / 2
-    word_center_y = word['top'] + (word['bottom'] - word['top']) / 2
-
-    for other in all_words:
-        if other['text'] == word['text'] and abs(other['x0'] - word['x0']) < 1:
-            continue  # Stessa parola
-
-        other_center_x = other['x0'] + (other['x1'] - other['x0']) / 2
-        other_center_y = other['top'] + (other['bottom'] - other['top']) / 2
-
-        distance = ((word_center_x - other_center_x)**2 + (word_center_y - other_center_y)**2)**0.5
-
-        if distance < max_distance:
-            context.append({
-                'text': other['text'],
-                'distance': distance,
-                'direction': 'left' if other_center_x < word_center_x else 'right'
-            })
-
-    # Ordina per distanza
-    context.sort(key=lambda x: x['distance'])
-    return context[:5]  # Ritorna al massimo 5 parole di contesto
-
-def reconstruct_rotated_words(chars):
-    """
-    Ricostruisce parole da caratteri ruotati a 90°/270°.
-    I caratteri ruotati sono già orientati, quindi dobbiamo solo raggrupparli.
-    """
-    if len(chars) == 0:
-        return []
-
-    # Ordina caratteri per posizione (prima per x poi per y, dato che sono ruotati)
-    sorted_chars = sorted(chars, key=lambda c: (c['x0'], c['y0']))
-
-    words = []
-    current_word_chars = []
-    last_char = None
-
-    for char in sorted_chars:
-        if last_char is None:
-            current_word_chars = [char]
-            last_char = char
-            continue
-
-        # Calcola distanza dal carattere precedente
-        x_dist = abs(char['x0'] - last_char['x0'])
-        y_dist = abs(char['y0'] - last_char['y0'])
-
-        # I caratteri ruotati sono adiacenti se hanno x simile e y vicino
-        # (o viceversa a seconda della direzione di rotazione)
-        is_adjacent = (x_dist < 15 and y_dist < 20)
-
-        if is_adjacent:
-            current_word_chars.append(char)
-        else:
-            # Salva la parola corrente
-            if len(current_word_chars) > 0:
-                word = merge_chars_to_word(current_word_chars)
-                if word:
-                    words.append(word)
-            current_word_chars = [char]
-
-        last_char = char
+_memory_trace_lock = threading.Lock()
+_memory_trace_users = 0
+_memory_trace_starts = 0
 
-    # Salva l'ultima parola
-    if len(current_word_chars) > 0:
-        word = merge_chars_to_word(current_word_chars)
-        if word:
-            words.append(word)
 
-    return words
-
-
-def merge_chars_to_word(chars):
-    """Unisce una lista di caratteri in una singola parola"""
-    if len(chars) == 0:
-        return None
-
-    text = ''.join([c['text'] for c in chars])
-    min_x = min(c['x0'] for c in chars)
-    max_x = max(c['x1'] for c in chars)
-    min_y = min(c['top'] for c in chars)
-    max_y = max(c['bottom'] for c in chars)
-
-    return {
-        'text': text,
-        'x0': min_x,
-        'x1': max_x,
-        'top': min_y,
-        'bottom': max_y
-    }
-
-
-def merge_horizontal_digits(words):
+@contextmanager
+def measure_page_memory(page_array=None):
     """
-    Unisce cifre consecutive sulla stessa riga orizzontale.
-    Questo cattura numeri come "1 2 3 4" che sono scritti con spazi larghi.
+    Measure memory used while processing a page.
+    Yields a stats dict filled with the rendered page size. With TRACE_PAGE_MEMORY
+    enabled it also records the tracemalloc peak; the peak is process-wide, so
+    it is only accurate when a single page is processed at a time.
     """
-    if len(words) == 0:
-        return []
-
-    merged = []
-    used = set()
-
-    # Ordina per riga (y) poi per colonna (x)
-    sorted_words = sorted(enumerate(words), key=lambda iw: (iw[1]['top'], iw[1]['x0']))
-
-    for idx_i, (i, word) in enumerate(sorted_words):
-        if i in used:
-            continue
-
-        # Solo per caratteri singoli numerici
-        if len(word['text'].strip()) != 1 or not word['text'].strip().isdigit():
-            merged.append(word)
-            used.add(i)
-            continue
-
-        # Trova altri numeri sulla stessa riga
-        candidates = [i]
-        base_y = word['top']
-        base_x_end = word['x1']
-
-        # Cerca numeri successivi sulla stessa riga
-        for idx_j in range(idx_i + 1, len(sorted_words)):
-            j, other = sorted_words[idx_j]
+    global _memory_trace_users, _memory_trace_starts
+
+    stats = {}
+    if page_array is not None:
+        stats['page_shape'] = list(page_array.shape)
+        stats['page_mb'] = round(page_array.nbytes / (1024 * 1024), 1)
+
+    if not app.config['TRACE_PAGE_MEMORY']:
+        yield stats
+        return
+
+    with _memory_trace_lock:
+        if _memory_trace_users == 0:
+            tracemalloc.start()
+        _memory_trace_users += 1
+        _memory_trace_starts += 1
+        shared = _memory_trace_users > 1
+        if not shared:
+            tracemalloc.reset_peak()
+        start_generation = _memory_trace_starts
+        start_bytes, _ = tracemalloc.get_traced_memory()
 
-            if j in used:
-                continue
-
-            # Deve essere una singola cifra
-            if len(other['text'].strip()) != 1 or not other['text'].strip().isdigit():
-                continue
-
-            # Controlla se è sulla stessa riga
-            y_diff = abs(other['top'] - base_y)
-            if y_diff > 5:  # Tolleranza 5px per la stessa riga
-                break  # Siamo passati ad un'altra riga
-
-            # Controlla distanza orizzontale (max 200px tra cifre)
-            x_dist = other['x0'] - base_x_end
-            if x_dist < 0 or x_dist > 200:
-                continue
-
-            candidates.append(j)
-            base_x_end = other['x1']
-
-        if len(candidates) >= 2:  # Almeno 2 cifre consecutive
-            # Ordina per posizione x
-            candidates.sort(key=lambda idx: words[idx]['x0'])
-
-            # Unisci le cifre
-            merged_text = ''.join([words[idx]['text'].strip() for idx in candidates])
-
-            # Calcola bounding box unificata
-            all_words = [words[idx] for idx in candidates]
-            min_x = min(w['x0'] for w in all_words)
-            max_x = max(w['x1'] for w in all_words)
-            min_y = min(w['top'] for w in all_words)
-            max_y = max(w['bottom'] for w in all_words)
-
-            merged_word = {
-                'text': merged_text,
-                'x0': min_x,
-                'x1': max_x,
-                'top': min_y,
-                'bottom': max_y
-            }
-
-            print(f"Merged horizontal digits: '{merged_text}' from {len(candidates)} digits")
-            merged.append(merged_word)
-            used.update(candidates)
-        else:
-            merged.append(word)
-            used.add(i)
-
-    return merged
+    try:
+        yield stats
+    finally:
+        with _memory_trace_lock:
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            shared = shared or _memory_trace_users > 1 or _memory_trace_starts != start_generation
+            _memory_trace_users -= 1
+            if _memory_trace_users == 0:
+                tracemalloc.stop()
+
+        stats['peak_memory_mb'] = round(max(peak_bytes - start_bytes, 0) / (1024 * 1024), 1)
+        if 'page_mb' in stats:
+            stats['peak_memory_mb'] += stats['page_mb']
+        if shared:
+            # Altre pagine in corso: il picco include anche le loro allocazioni
+            stats['peak_memory_shared'] = True
+        print(f"[Memory] Pagina {stats.get('page_shape')}: picco {stats['peak_memory_mb']} MB")
+
+
+def get_image_size(image):
+    """Return (width, height) of a PIL image or NumPy array"""
+    if isinstance(image, np.ndarray):
+        return image.shape[1], image.shape[0]
+    return image.size
+
+
+def rotate_image(image, angle):
+    """Rotate clockwise by angle (multiple of 90 for arrays), expanding the canvas"""
+    if isinstance(image, np.ndarray):
+        return np.ascontiguousarray(np.rot90(image, k=-(angle // 90)))
+    return image.rotate(-angle, expand=True)
+
+
+def preprocess_image(image, profile=None):
+    """Pre-process image to improve OCR using CV2 (accepts PIL image or NumPy array)"""
+    binary = preprocess_pipeline.run(image, profile or app.config['OCR_PREPROCESS_PROFILE'])
+    return Image.fromarray(binary)
 
 
-def merge_vertical_chars(words):
+def extract_data_from_pdfplumber(pdf_path, page_num=0):
     """
-    Unisce caratteri verticali in parole/numeri completi.
-    Gestisce due casi:
-    1. Caratteri singoli con bbox verticale (altezza >> larghezza)
-    2. Caratteri normali disposti verticalmente uno sotto l'altro
+    Estrae numeri, date e riferimenti da PDF testuale con coordinate (backend di testo da config PDF_TEXT_BACKEND)
+    Restituisce una lista di elementi tipizzati con bbox in punti PDF (72 DPI)
     """
-    if len(words) == 0:
+    processor = PDFProcessor(pdf_path)
+    page_chars = processor.get_page_chars(page_num)
+    if page_chars is None:
         return []
-
-    merged = []
-    used = set()
-
-    for i, word in enumerate(words):
-        if i in used:
-            continue
-
-        # Caso 1: Carattere singolo con bounding box verticale
-        width = word['x1'] - word['x0']
-        height = word['bottom'] - word['top']
-        is_vertical_bbox = height > width * 2
-
-        # Caso 2: Carattere singolo che potrebbe essere parte di testo verticale
-        is_single_char = len(word['text'].strip()) == 1
-
-        if not (is_vertical_bbox or is_single_char):
-            # Parola già completa, mantieni così
-            merged.append(word)
-            used.add(i)
-            continue
-
-        # Cerca altri caratteri nella stessa "colonna verticale"
-        candidates = [i]
-        base_x = (word['x0'] + word['x1']) / 2
-        base_y = word['top']
-        base_height = height
-
-        for j, other in enumerate(words):
-            if j == i or j in used:
-                continue
-
-            # Considera solo caratteri singoli o con bbox verticale
-            other_width = other['x1'] - other['x0']
-            other_height = other['bottom'] - other['top']
-            other_is_vertical_bbox = other_height > other_width * 2
-            other_is_single_char = len(other['text'].strip()) == 1
-
-            if not (other_is_vertical_bbox or other_is_single_char):
-                continue
-
-            other_x = (other['x0'] + other['x1']) / 2
-            other_y = other['top']
-
-            # Stessa colonna verticale (x simile)
-            x_diff = abs(base_x - other_x)
-
-            # Distanza verticale
-            if other_y > base_y:
-                y_gap = other_y - (word['bottom'] if j > i else word['top'])
-            else:
-                continue  # Salta caratteri sopra (li prenderemo quando sarà il loro turno)
-
-            # Tolleranze più ampie per catturare testo ruotato
-            x_tolerance = max(20, max(width, other_width) * 1.5)
-            y_tolerance = max(50, base_height * 2)
-
-            if x_diff < x_tolerance and y_gap < y_tolerance:
-                candidates.append(j)
-
-        if len(candidates) > 1:
-            # Ordina per posizione verticale (top to bottom)
-            candidates.sort(key=lambda idx: words[idx]['top'])
-
-            # Unisci i caratteri
-            merged_text = ''.join([words[idx]['text'].strip() for idx in candidates])
-
-            # Calcola bounding box unificata
-            all_words = [words[idx] for idx in candidates]
-            min_x = min(w['x0'] for w in all_words)
-            max_x = max(w['x1'] for w in all_words)
-            min_y = min(w['top'] for w in all_words)
-            max_y = max(w['bottom'] for w in all_words)
-
-            merged_word = {
-                'text': merged_text,
-                'x0': min_x,
-                'x1': max_x,
-                'top': min_y,
-                'bottom': max_y
-            }
-
-            print(f"Merged vertical text: '{merged_text}' from {len(candidates)} characters")
-            merged.append(merged_word)
-            used.update(candidates)
-        else:
-            merged.append(word)
-            used.add(i)
-
-    return merged
-
-def extract_numbers_from_pdfplumber(pdf_path, page_num=0):
-    """Estrae numeri, date e riferimenti da PDF testuale usando pdfplumber con coordinate"""
-    results = []
-
-    with pdfplumber.open(pdf_path) as pdf:
-        if page_num >= len(pdf.pages):
-            return results
-
-        page = pdf.pages[page_num]
-
-        # FASE 1: Estrai caratteri con informazioni di rotazione
-        print(f"\n=== PDFPLUMBER CHAR-LEVEL EXTRACTION ===")
-        chars = page.chars
-        print(f"Total chars extracted: {len(chars)}")
-
-        # Raggruppa caratteri ruotati (90° o 270°)
-        rotated_chars = []
-        normal_chars = []
-
-        for char in chars:
-            # pdfplumber usa "matrix" per la trasformazione
-            # matrix[0] e matrix[3] indicano la rotazione
-            # Rotazione 90°: matrix = (0, 1, -1, 0, x, y)
-            # Rotazione 0°: matrix = (1, 0, 0, 1, x, y)
-            matrix = char.get('matrix', (1, 0, 0, 1, 0, 0))
-
-            # Rileva rotazione
-            is_rotated_90 = abs(matrix[0]) < 0.1 and abs(matrix[1]) > 0.9  # 90° clockwise
-            is_rotated_270 = abs(matrix[0]) < 0.1 and abs(matrix[3]) < -0.9  # 270° clockwise (90° counter)
-
-            if is_rotated_90 or is_rotated_270:
-                rotated_chars.append(char)
-            else:
-                normal_chars.append(char)
-
-        print(f"Rotated chars: {len(rotated_chars)}, Normal chars: {len(normal_chars)}")
-
-        # FASE 2: Estrai words normalmente
-        words = page.extract_words(
-            x_tolerance=3,
-            y_tolerance=3,
-            keep_blank_chars=False,
-            use_text_flow=True
-        )
-
-        print(f"\n=== WORD-LEVEL EXTRACTION ===")
-        print(f"Total words extracted: {len(words)}")
-
-        # Stampa alcuni esempi di caratteri singoli per debug
-        single_chars = [w for w in words if len(w['text'].strip()) == 1]
-        print(f"Single characters found: {len(single_chars)}")
-
-        # FASE 3A: Unisci caratteri orizzontali (numeri sulla stessa riga)
-        print(f"\nAttempting to merge horizontal digit sequences...")
-        words_before_h = len(words)
-        words = merge_horizontal_digits(words)
-        words_after_h = len(words)
-        print(f"Words before horizontal merge: {words_before_h}, after merge: {words_after_h}, reduced by: {words_before_h - words_after_h}")
-
-        # FASE 3B: Unisci caratteri verticali (da words)
-        print(f"\nAttempting to merge vertical characters...")
-        words_before = len(words)
-        words = merge_vertical_chars(words)
-        words_after = len(words)
-        print(f"Words before merge: {words_before}, after merge: {words_after}, reduced by: {words_before - words_after}")
-
-        # FASE 4: Ricostruisci parole da caratteri ruotati
-        if len(rotated_chars) > 0:
-            print(f"\nReconstructing words from {len(rotated_chars)} rotated characters...")
-            rotated_words = reconstruct_rotated_words(rotated_chars)
-            print(f"Created {len(rotated_words)} words from rotated chars")
-            words.extend(rotated_words)
-
-        for idx, word in enumerate(words):
-            text = word['text'].strip()
-            if not text:
-                continue
-
-            # Determina il tipo di dato
-            data_type = 'text'
-            if contains_numbers(text):
-                data_type = 'number'
-            if is_date(text):
-                data_type = 'date'
-            if is_reference(text):
-                data_type = 'reference'
-            if is_measurement_unit(text):
-                data_type = 'unit'
-
-            # Estrai solo dati rilevanti (numeri, date, riferimenti, unità)
-            if data_type in ['number', 'date', 'reference', 'unit']:
-                # Estrai contesto (parole vicine)
-                context = extract_context_around(word, words, max_distance=50)
-                context_text = ' '.join([c['text'] for c in context[:3]])
-
-                results.append({
-                    'id': idx,
-                    'text': text,
-                    'type': data_type,
-                    'bbox': {
-                        'x': word['x0'],
-                        'y': word['top'],
-                        'width': word['x1'] - word['x0'],
-                        'height': word['bottom'] - word['top']
-                    },
-                    'context': context_text,
-                    'source': 'pdfplumber',
-                    'confidence': 100  # pdfplumber è preciso al 100%
-                })
-
-    return results
-
+    return extract_page_data(page_chars[0], processor.text_backend)
 
 def is_horizontal_text(bbox, text):
     """Verifica se il testo è orizzontale in base al rapporto larghezza/altezza"""
@@ -781,42 +735,88 @@ def merge_number_x_number(results):
 
     return merged
 
-def process_single_rotation(image, angle, label, min_conf=60):
-    """Processa l'immagine con una specifica rotazione"""
-    print(f"\n=== Elaborazione {label} (soglia: {min_conf}%) ===")
+# Versione del preprocessing nelle chiavi della cache OCR: aggiornare se gli stadi cambiano
+OCR_PREPROCESS_VERSION = 2
+
+
+def compute_image_digest(image):
+    """SHA-256 dei pixel (array NumPy o immagine PIL), usato per indirizzare i risultati OCR in cache"""
+    img_array = np.ascontiguousarray(image if isinstance(image, np.ndarray) else np.asarray(image))
+    digest = hashlib.sha256(f"{img_array.shape}|{img_array.dtype}|".encode('utf-8'))
+    digest.update(img_array.data)
+    return digest.hexdigest()
 
-    if angle != 0:
-        rotated_image = image.rotate(-angle, expand=True)
+
+def run_cached_ocr(image, angle, psm_modes, label, preprocess=None,
+                   image_digest=None, lang='ita+eng', oem=3, text_regions=False):
+    """
+    Esegue un passaggio image_to_data per ogni PSM sull'immagine ruotata (e pre-processata),
+    riusando i risultati in cache. Rotazione e preprocessing vengono fatti solo se manca
+    qualche passaggio. Restituisce i dati OCR compatti nell'ordine di psm_modes.
+    preprocess: profilo di preprocessing (default da config), 'none' per l'immagine così com'è.
+    text_regions: OCR solo sulle regioni di testo rilevate (mosaico), box riportati alla pagina.
+    """
+    if image_digest is None:
+        image_digest = compute_image_digest(image)
+
+    preprocess = preprocess or app.config['OCR_PREPROCESS_PROFILE']
+    preprocess_key = preprocess if preprocess == 'none' else f"{preprocess}-v{OCR_PREPROCESS_VERSION}"
+    text_regions = text_regions and preprocess != 'none'
+    if text_regions:
+        preprocess_key += '+regions'
+    keys = [doc_cache.compute_ocr_key(image_digest, preprocess_key, psm, oem, lang, angle) for psm in psm_modes]
+    results = [doc_cache.get_ocr_result(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    print(f"[OCR Cache] {label}: {len(psm_modes) - len(missing)} hit, {len(missing)} miss")
+    if not missing:
+        return results
+
+    placements = None
+    if preprocess == 'none':
+        prepared_image = rotate_image(image, angle) if angle != 0 else image
     else:
-        rotated_image = image
+        # Pagina binarizzata calcolata una volta a 0°, le altre rotazioni sono np.rot90 (senza perdita)
+        binary = preprocess_pipeline.get_binary(image, image_digest, angle=angle, profile=preprocess)
+        if text_regions:
+            page_pixels = binary.size
+            regions = detect_text_regions(binary)
+            binary, placements = build_mosaic(binary, regions)
+            print(f"[TextRegions] {label}: {len(regions)} regioni, mosaico {binary.shape[1]}x{binary.shape[0]} "
+                  f"({binary.size / page_pixels * 100:.0f}% della pagina)")
+        prepared_image = Image.fromarray(binary)
+
+    ocr_passes = ocr_executor.run_passes(prepared_image, [
+        (f"PSM {psm_modes[i]} ({label})", f'--oem {oem} --psm {psm_modes[i]}') for i in missing
+    ], lang=lang)
+
+    for i, ocr_data in zip(missing, ocr_passes):
+        results[i] = compact_ocr_data(ocr_data)
+        if placements is not None:
+            results[i] = map_ocr_data_to_page(results[i], placements)
+        doc_cache.save_ocr_result(keys[i], results[i], psm=psm_modes[i], rotation=angle)
 
-    processed_image = preprocess_image(rotated_image)
+    return results
 
-    all_results = []
 
-    # PSM 6 - Blocco uniforme
-    print("Esecuzione OCR con PSM 6...")
-    config1 = r'--oem 3 --psm 6'
-    ocr_data1 = pytesseract.image_to_data(processed_image, lang='ita+eng',
-                                          config=config1,
-                                          output_type=pytesseract.Output.DICT)
-    all_results.extend(parse_ocr_data(ocr_data1, min_conf=min_conf))
-
-    # PSM 11 - Testo sparso
-    print("Esecuzione OCR con PSM 11...")
-    config2 = r'--oem 3 --psm 11'
-    ocr_data2 = pytesseract.image_to_data(processed_image, lang='ita+eng',
-                                          config=config2,
-                                          output_type=pytesseract.Output.DICT)
-    all_results.extend(parse_ocr_data(ocr_data2, min_conf=min_conf))
-
-    # PSM 3 - Auto page segmentation
-    print("Esecuzione OCR con PSM 3...")
-    config3 = r'--oem 3 --psm 3'
-    ocr_data3 = pytesseract.image_to_data(processed_image, lang='ita+eng',
-                                          config=config3,
-                                          output_type=pytesseract.Output.DICT)
-    all_results.extend(parse_ocr_data(ocr_data3, min_conf=min_conf))
+def process_single_rotation(image, angle, label, min_conf=60, return_raw=False, image_digest=None,
+                            preprocess_profile=None, text_regions=False):
+    """
+    Processa l'immagine con una specifica rotazione.
+    Con return_raw=True restituisce anche i dati OCR per PSM ({6: ..., 11: ..., 3: ...})
+    """
+    print(f"\n=== Elaborazione {label} (soglia: {min_conf}%) ===")
+
+    # PSM 6 (blocco uniforme), PSM 11 (testo sparso), PSM 3 (auto page segmentation)
+    # in parallelo sull'OCR executor; i risultati sono uniti sempre in quest'ordine
+    print("Esecuzione OCR con PSM 6, 11, 3...")
+    psm_modes = [6, 11, 3]
+    ocr_passes = run_cached_ocr(image, angle, psm_modes, label, preprocess=preprocess_profile,
+                                image_digest=image_digest, text_regions=text_regions)
+
+    all_results = []
+    for ocr_data in ocr_passes:
+        all_results.extend(parse_ocr_data(ocr_data, min_conf=min_conf))
 
     # Filtra solo elementi che contengono numeri o 'x'
     results_with_numbers = [r for r in all_results if contains_numbers(r['text']) or r['text'].lower() == 'x']
@@ -844,8 +844,38 @@ def process_single_rotation(image, angle, label, min_conf=60):
 
     print(f"Trovati {len(final_results)} elementi con numeri per {label}")
 
+    if return_raw:
+        return final_results, dict(zip(psm_modes, ocr_passes))
     return final_results
 
+
+def get_density_elements(ocr_data, min_conf=30):
+    """Box di tutto il testo riconosciuto (anche non numerico), per il calcolo della densità"""
+    all_elements = []
+    n_boxes = len(ocr_data['text'])
+    for i in range(n_boxes):
+        text = ocr_data['text'][i].strip()
+        if not text:
+            continue
+        try:
+            conf = int(ocr_data['conf'][i])
+        except:
+            continue
+        if conf < min_conf:
+            continue
+
+        x = ocr_data['left'][i]
+        y = ocr_data['top'][i]
+        w = ocr_data['width'][i]
+        h = ocr_data['height'][i]
+
+        if w < 3 or h < 3:
+            continue
+
+        all_elements.append({'x': x, 'y': y, 'width': w, 'height': h})
+
+    return all_elements
+
 def transform_bbox_from_90_to_0(bbox, rotated_width, rotated_height, original_width, original_height):
     """Trasforma le coordinate di un bbox dalla rotazione 90° a 0°"""
     x_rot = bbox['x']
@@ -866,15 +896,28 @@ def transform_bbox_from_90_to_0(bbox, rotated_width, rotated_height, original_wi
         'height': h_orig
     }
 
-def calculate_text_density_around(bbox, all_elements, radius_multiplier=3.0):
-    """Calcola la densità di testo nell'area circostante un bounding box"""
+def build_element_center_index(elements):
+    """Indice spaziale dei centri di box {'x', 'y', 'width', 'height'}"""
+    return GridIndex((e['x'] + e['width'] / 2, e['y'] + e['height'] / 2) for e in elements)
+
+
+def calculate_text_density_around(bbox, all_elements, radius_multiplier=3.0, index=None):
+    """
+    Calcola la densità di testo nell'area circostante un bounding box.
+    index: indice dei centri di all_elements (build_element_center_index)
+    """
     center_x = bbox['x'] + bbox['width'] / 2
     center_y = bbox['y'] + bbox['height'] / 2
 
     search_radius = max(bbox['width'], bbox['height']) * radius_multiplier
 
+    if index is not None:
+        candidates = [all_elements[i] for i in index.query_radius(center_x, center_y, search_radius)]
+    else:
+        candidates = all_elements
+
     nearby_count = 0
-    for element in all_elements:
+    for element in candidates:
         elem_center_x = element['x'] + element['width'] / 2
         elem_center_y = element['y'] + element['height'] / 2
 
@@ -886,116 +929,39 @@ def calculate_text_density_around(bbox, all_elements, radius_multiplier=3.0):
     return nearby_count
 
 def remove_overlapping_rectangles(numbers_0deg, numbers_90deg):
-    """Rimuove rettangoli sovrapposti, mantenendo quello con lunghezza maggiore"""
-    filtered_0deg = []
-    filtered_90deg = []
-
-    for num_0 in numbers_0deg:
-        bbox_0 = num_0['bbox']
-        overlaps = False
-
-        for num_90 in numbers_90deg:
-            bbox_90 = num_90['bbox']
-
-            x_overlap = max(0, min(bbox_0['x'] + bbox_0['width'], bbox_90['x'] + bbox_90['width']) -
-                           max(bbox_0['x'], bbox_90['x']))
-            y_overlap = max(0, min(bbox_0['y'] + bbox_0['height'], bbox_90['y'] + bbox_90['height']) -
-                           max(bbox_0['y'], bbox_90['y']))
-
-            overlap_area = x_overlap * y_overlap
-
-            area_0 = bbox_0['width'] * bbox_0['height']
-            area_90 = bbox_90['width'] * bbox_90['height']
-            min_area = min(area_0, area_90)
-
-            if min_area > 0 and overlap_area / min_area > 0.5:
-                length_0 = bbox_0['width']
-                length_90 = bbox_90['height']
-
-                if length_90 > length_0:
-                    overlaps = True
-                    break
-
-        if not overlaps:
-            filtered_0deg.append(num_0)
-
-    for num_90 in numbers_90deg:
-        bbox_90 = num_90['bbox']
-        overlaps = False
-
-        for num_0 in filtered_0deg:
-            bbox_0 = num_0['bbox']
-
-            x_overlap = max(0, min(bbox_0['x'] + bbox_0['width'], bbox_90['x'] + bbox_90['width']) -
-                           max(bbox_0['x'], bbox_90['x']))
-            y_overlap = max(0, min(bbox_0['y'] + bbox_0['height'], bbox_90['y'] + bbox_90['height']) -
-                           max(bbox_0['y'], bbox_90['y']))
-
-            overlap_area = x_overlap * y_overlap
-
-            area_0 = bbox_0['width'] * bbox_0['height']
-            area_90 = bbox_90['width'] * bbox_90['height']
-            min_area = min(area_0, area_90)
+    """Rimuove rettangoli sovrapposti, mantenendo quello con lunghezza maggiore (kernel NumPy in box_overlap)"""
+    return resolve_rotation_overlaps(numbers_0deg, numbers_90deg)
 
-            if min_area > 0 and overlap_area / min_area > 0.5:
-                length_0 = bbox_0['width']
-                length_90 = bbox_90['height']
-
-                if length_0 >= length_90:
-                    overlaps = True
-                    break
-
-        if not overlaps:
-            filtered_90deg.append(num_90)
-
-    return filtered_0deg, filtered_90deg
-
-def extract_numbers_advanced(image, min_conf=60):
+def extract_numbers_advanced(image, min_conf=60, preprocess_profile=None, text_regions=None):
     """
     Estrae testo contenente numeri dall'immagine a 0° e 90°, unificando i risultati
     Restituisce numeri con marker di provenienza (0deg/90deg) per colorazione
+    text_regions: OCR solo sulle regioni di testo (default da config OCR_TEXT_REGIONS)
     """
-    # Elaborazione a 0° (orizzontale)
-    numbers_from_0 = process_single_rotation(image, 0, '0 gradi (Orizzontale)', min_conf=min_conf)
-
-    # Elaborazione a 90° (verticale->orizzontale)
-    numbers_from_90_raw = process_single_rotation(image, 90, '90 gradi (Verticale)', min_conf=min_conf)
-
-    # Ottieni dimensioni
-    original_width, original_height = image.size
-    rotated_image = image.rotate(-90, expand=True)
-    rotated_width, rotated_height = rotated_image.size
-
-    # Filtra i numeri da 90° in base alla densità
+    if text_regions is None:
+        text_regions = app.config['OCR_TEXT_REGIONS']
+
+    # Elaborazione a 0° (orizzontale) e a 90° (verticale->orizzontale) in parallelo.
+    # Le rotazioni girano su thread propri (non sull'OCR executor, che esegue i loro passaggi PSM)
+    # Il digest dell'immagine indirizza i risultati OCR e la pagina binarizzata in cache per entrambe
+    image_digest = compute_image_digest(image)
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix='rotation') as rotations:
+        future_0 = rotations.submit(process_single_rotation, image, 0, '0 gradi (Orizzontale)', min_conf,
+                                    image_digest=image_digest, preprocess_profile=preprocess_profile,
+                                    text_regions=text_regions)
+        future_90 = rotations.submit(process_single_rotation, image, 90, '90 gradi (Verticale)', min_conf,
+                                     return_raw=True, image_digest=image_digest,
+                                     preprocess_profile=preprocess_profile, text_regions=text_regions)
+        numbers_from_0 = future_0.result()
+        numbers_from_90_raw, ocr_passes_90 = future_90.result()
+
+    # Ottieni dimensioni (la rotazione di 90° scambia larghezza e altezza)
+    original_width, original_height = get_image_size(image)
+    rotated_width, rotated_height = original_height, original_width
+
+    # Filtra i numeri da 90° in base alla densità, riusando il passaggio PSM 6 già eseguito a 90°
     print("\nFiltraggio elementi 90° in aree ad alta densità...")
-    processed_image = preprocess_image(rotated_image)
-    config = r'--oem 3 --psm 6'
-    ocr_data = pytesseract.image_to_data(processed_image, lang='ita+eng',
-                                         config=config,
-                                         output_type=pytesseract.Output.DICT)
-
-    all_elements = []
-    n_boxes = len(ocr_data['text'])
-    for i in range(n_boxes):
-        text = ocr_data['text'][i].strip()
-        if not text:
-            continue
-        try:
-            conf = int(ocr_data['conf'][i])
-        except:
-            continue
-        if conf < 30:
-            continue
-
-        x = ocr_data['left'][i]
-        y = ocr_data['top'][i]
-        w = ocr_data['width'][i]
-        h = ocr_data['height'][i]
-
-        if w < 3 or h < 3:
-            continue
-
-        all_elements.append({'x': x, 'y': y, 'width': w, 'height': h})
+    all_elements = get_density_elements(ocr_passes_90[6], min_conf=30)
 
     print(f"Trovati {len(all_elements)} elementi totali nell'immagine ruotata")
 
@@ -1003,8 +969,10 @@ def extract_numbers_advanced(image, min_conf=60):
     removed_count = 0
     density_threshold = 8
 
+    element_index = build_element_center_index(all_elements)
     for result in numbers_from_90_raw:
-        density = calculate_text_density_around(result['bbox'], all_elements, radius_multiplier=2.5)
+        density = calculate_text_density_around(result['bbox'], all_elements, radius_multiplier=2.5,
+                                                index=element_index)
 
         if density <= density_threshold:
             filtered_90_results.append(result)
@@ -1068,60 +1036,45 @@ def extract_numbers_from_pdfplumber(pdf_path, page_num=0):
     processor = PDFProcessor(pdf_path)
 
     # Estrai tutte le parole con coordinate
-    words = processor.extract_with_pdfplumber(page_num=page_num)
+    words = processor.extract_word_table(page_num=page_num)
 
-    if not words:
+    if not len(words):
         return [], [], []
 
     # Filtra solo le parole che contengono numeri
-    number_words = []
-    for word in words:
-        text = word['text']
-        # Cerca pattern numerici (numeri con o senza decimali, unità di misura, etc)
-        if re.search(r'\d', text):
-            number_words.append(word)
-
-    # Converti coordinate pdfplumber in formato pixel per immagine
-    # Ottieni dimensioni pagina
-    with pdfplumber.open(pdf_path) as pdf:
-        page = pdf.pages[page_num]
-        page_width = page.width
-        page_height = page.height
-
-    # Genera immagine per ottenere dimensioni in pixel
-    doc = fitz.open(pdf_path)
-    pdf_page = doc[page_num]
-    zoom = 300 / 72  # DPI 300
-    mat = fitz.Matrix(zoom, zoom)
-    pix = pdf_page.get_pixmap(matrix=mat)
-    img_width = pix.width
-    img_height = pix.height
-    doc.close()
+    # Cerca pattern numerici (numeri con o senza decimali, unità di misura, etc)
+    number_words = words.take([re.search(r'\d', text) is not None for text in words.text])
+
+    # Converti coordinate pdfplumber in formato pixel per immagine a 300 DPI
+    # (dimensioni della pagina dalla tabella metadati, senza renderizzarla)
+    page = processor.get_page_metadata()[page_num]
+    img_width, img_height = processor.get_page_pixel_size(page_num, 300)
 
     # Fattori di scala
-    scale_x = img_width / page_width
-    scale_y = img_height / page_height
+    scale_x = img_width / page['width']
+    scale_y = img_height / page['height']
+
+    # Converti coordinate da punti PDF a pixel immagine (troncate come int())
+    x0 = (number_words.x0 * scale_x).astype(np.int64)
+    y0 = (number_words.top * scale_y).astype(np.int64)
+    x1 = (number_words.x1 * scale_x).astype(np.int64)
+    y1 = (number_words.bottom * scale_y).astype(np.int64)
 
     # Converti a formato unificato
     all_numbers = []
     numbers_horizontal = []  # Numeri orizzontali
 
-    for idx, word in enumerate(number_words):
-        # Converti coordinate da punti PDF a pixel immagine
-        x0 = int(word['x0'] * scale_x)
-        y0 = int(word['y0'] * scale_y)
-        x1 = int(word['x1'] * scale_x)
-        y1 = int(word['y1'] * scale_y)
-
+    for idx, (text, x, y, width, height) in enumerate(zip(number_words.text, x0.tolist(), y0.tolist(),
+                                                          (x1 - x0).tolist(), (y1 - y0).tolist())):
         result = {
             'id': idx,
-            'text': word['text'],
+            'text': text,
             'conf': 100,  # pdfplumber ha sempre alta confidenza
             'bbox': {
-                'x': x0,
-                'y': y0,
-                'width': x1 - x0,
-                'height': y1 - y0
+                'x': x,
+                'y': y,
+                'width': width,
+                'height': height
             },
             'rotation': '0deg',  # PDFplumber estrae sempre orizzontalmente
             'source': 'pdfplumber'
@@ -1140,21 +1093,12 @@ def detect_page_type(pdf_path, page_num=0):
     Rileva se una pagina specifica è testuale o richiede OCR
     Returns: 'textual' or 'image'
     """
-    doc = fitz.open(pdf_path)
-
-    if page_num >= len(doc):
-        doc.close()
+    pages = PDFProcessor(pdf_path).get_page_metadata()
+    if page_num >= len(pages):
         return 'image'
 
-    page = doc[page_num]
-    text = page.get_text().strip()
-    doc.close()
-
-    # Se ha più di 100 caratteri di testo, consideralo testuale
-    if len(text) > 100:
-        return 'textual'
-    else:
-        return 'image'
+    # Se ha più di 100 caratteri di testo è testuale (tabella metadati della pagina)
+    return pages[page_num]['page_type']
 
 
 def parse_ocr_data(ocr_data, min_conf=30):
@@ -1198,37 +1142,8 @@ def parse_ocr_data(ocr_data, min_conf=30):
 
 
 def remove_duplicates_simple(results):
-    """Remove simple duplicates based on overlap and text"""
-    if not results:
-        return []
-
-    unique = []
-
-    for result in results:
-        is_dup = False
-
-        for u in unique:
-            if result['text'].lower() == u['text'].lower():
-                b1 = result['bbox']
-                b2 = u['bbox']
-
-                x_overlap = max(0, min(b1['x']+b1['width'], b2['x']+b2['width']) - max(b1['x'], b2['x']))
-                y_overlap = max(0, min(b1['y']+b1['height'], b2['y']+b2['height']) - max(b1['y'], b2['y']))
-
-                overlap_area = x_overlap * y_overlap
-                area1 = b1['width'] * b1['height']
-
-                if area1 > 0 and overlap_area / area1 > 0.5:
-                    is_dup = True
-                    if result['confidence'] > u['confidence']:
-                        u['confidence'] = result['confidence']
-                        u['bbox'] = result['bbox']
-                    break
-
-        if not is_dup:
-            unique.append(result)
-
-    return unique
+    """Remove simple duplicates based on overlap and text (NumPy kernel in box_overlap)"""
+    return remove_text_duplicates(results)
 
 
 def draw_boxes_on_image(image, results, highlight_id=None):
@@ -1288,55 +1203,243 @@ def draw_unified_boxes(image, numbers_0deg, numbers_90deg, highlight_id=None):
             color = '#FF00FF'  # Fucsia per 90°
             width = 3
 
-        for i in range(width):
-            draw.rectangle([x-i, y-i, x + w + i, y + h + i], outline=color, width=1)
+        for i in range(width):
+            draw.rectangle([x-i, y-i, x + w + i, y + h + i], outline=color, width=1)
+
+    return img_with_boxes
+
+def draw_pdfplumber_boxes(image, dpi, results, highlight_id=None):
+    """Disegna rettangoli colorati per tipo su immagine da pdfplumber"""
+    img_with_boxes = image.copy()
+    draw = ImageDraw.Draw(img_with_boxes)
+
+    # Scala fattore: pdfplumber usa punti (72 DPI), immagine può essere a DPI diverso
+    scale = dpi / 72.0
+
+    # Colori per tipo
+    type_colors = {
+        'number': '#0066FF',      # Blu per numeri
+        'date': '#FF6B35',        # Arancione per date
+        'reference': '#9D4EDD',   # Viola per riferimenti
+        'unit': '#06FFA5'         # Verde acqua per unità
+    }
+
+    for result in results:
+        bbox = result['bbox']
+        x = bbox['x'] * scale
+        y = bbox['y'] * scale
+        w = bbox['width'] * scale
+        h = bbox['height'] * scale
+        result_id = result.get('id')
+        data_type = result.get('type', 'number')
+
+        if result_id == highlight_id:
+            color = '#FFD700'  # Oro per evidenziato
+            width = 5
+        else:
+            color = type_colors.get(data_type, '#0066FF')
+            width = 3
+
+        for i in range(width):
+            draw.rectangle([x-i, y-i, x + w + i, y + h + i], outline=color, width=1)
+
+    return img_with_boxes
+
+
+def image_to_base64(image):
+    """Convert PIL image to base64"""
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    img_str = base64.b64encode(buffered.getvalue()).decode()
+    return f"data:image/png;base64,{img_str}"
+
+
+# ============================================================================
+# BINARY IMAGE DELIVERY (URLs with ETag instead of base64 in JSON)
+# ============================================================================
+
+# Output formats for image routes: fmt -> (PIL format, mimetype)
+IMAGE_FORMATS = {
+    'png': ('PNG', 'image/png'),
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'jpg': ('JPEG', 'image/jpeg')
+}
+FILE_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+MIN_IMAGE_DPI = 36
+MAX_IMAGE_DPI = 600
+
+
+def get_document_path(file_hash):
+    """Resolve the stored PDF for a file hash (None if unknown)"""
+    if not FILE_HASH_PATTERN.match(file_hash):
+        return None
+
+    permanent_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{file_hash}.pdf")
+    if os.path.exists(permanent_path):
+        return permanent_path
+
+    cached_doc = doc_cache.get_document(file_hash)
+    if cached_doc and cached_doc.get('file_path') and os.path.exists(cached_doc['file_path']):
+        return cached_doc['file_path']
+    return None
+
+
+def encode_png_as(png_bytes, fmt):
+    """Re-encode PNG bytes to another output format"""
+    pil_format, _ = IMAGE_FORMATS[fmt]
+    if pil_format == 'PNG':
+        return png_bytes
+
+    image = Image.open(io.BytesIO(png_bytes))
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    buffered = io.BytesIO()
+    image.save(buffered, format=pil_format, quality=90)
+    return buffered.getvalue()
+
+
+def get_page_image_bytes(file_hash, page_num, dpi=150, fmt='png'):
+    """Get rendered page bytes in the requested format (cached per format)"""
+    pdf_path = get_document_path(file_hash)
+    if not pdf_path:
+        return None
+
+    processor = PDFProcessor(pdf_path, file_hash=file_hash)
+    if fmt == 'png':
+        return processor.get_page_png(page_num=page_num, dpi=dpi)
+
+    def render():
+        png_bytes = processor.get_page_png(page_num=page_num, dpi=dpi)
+        return encode_png_as(png_bytes, fmt) if png_bytes is not None else None
+
+    return raster_cache.get_or_render(file_hash, page_num, dpi, render, variant=fmt)
+
+
+def get_overlay_image_bytes(file_hash, page_num, digest, fmt='png'):
+    """
+    Get a stored overlay image (page with extraction boxes) in the requested format.
+    If the raster cache evicted it, it is drawn again from the stored overlay data.
+    """
+    variant = f"overlay-{digest}.png"
+    png_bytes = raster_cache.get(file_hash, page_num, 300, variant=variant)
+    if png_bytes is None:
+        png_bytes = redraw_overlay_image(file_hash, page_num, digest)
+        if png_bytes is None:
+            return None
+    if fmt == 'png':
+        return png_bytes
+
+    return raster_cache.get_or_render(
+        file_hash, page_num, 300,
+        lambda: encode_png_as(png_bytes, fmt),
+        variant=f"overlay-{digest}.{fmt}"
+    )
+
+
+def redraw_overlay_image(file_hash, page_num, digest):
+    """Draw an evicted overlay again from its stored data (None if the data or the PDF is gone)"""
+    overlay_data = doc_cache.get_overlay(file_hash, page_num, digest)
+    if overlay_data is None:
+        return None
+
+    page_png = get_page_image_bytes(file_hash, page_num, dpi=300)
+    if page_png is None:
+        return None
+
+    print(f"[Cache] Overlay {digest[:8]} pagina {page_num} non in cache: ridisegnato")
+    image = draw_overlay(Image.open(io.BytesIO(page_png)), overlay_data)
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    png_bytes = buffered.getvalue()
+    raster_cache.put(file_hash, page_num, 300, png_bytes, variant=f"overlay-{digest}.png")
+    return png_bytes
+
+
+def page_image_url_for(file_hash, page_num, dpi=150, fmt='png'):
+    """URL of the binary page image route"""
+    return url_for('page_image', file_hash=file_hash, page_num=page_num, fmt=fmt, dpi=dpi)
+
+
+def overlay_digest(overlay_data):
+    """Content address of an overlay: digest of the data used to draw it"""
+    return hashlib.sha256(
+        json.dumps(overlay_data, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    ).hexdigest()[:32]
+
+
+def draw_overlay(image, overlay_data):
+    """Draw the boxes described by overlay data on a 300 DPI page image"""
+    highlight_id = overlay_data.get('highlight')
+    if 'pdfplumber' in overlay_data:
+        return draw_pdfplumber_boxes(image, 300, overlay_data['pdfplumber'], highlight_id=highlight_id)
+    return draw_unified_boxes(image, overlay_data.get('0deg', []), overlay_data.get('90deg', []),
+                              highlight_id=highlight_id)
+
+
+def store_overlay_image(image, file_hash, page_num, overlay_data):
+    """
+    Store a page image with drawn boxes in the raster cache and return its URL.
+    The overlay is content-addressed by the data used to draw it, which is kept in the
+    document cache so the image can be drawn again after a raster cache eviction.
+    """
+    digest = overlay_digest(overlay_data)
+    doc_cache.save_overlay(file_hash, page_num, digest, overlay_data)
+
+    variant = f"overlay-{digest}.png"
+    if raster_cache.get(file_hash, page_num, 300, variant=variant) is None:
+        buffered = io.BytesIO()
+        image.save(buffered, format="PNG")
+        raster_cache.put(file_hash, page_num, 300, buffered.getvalue(), variant=variant)
+
+    return url_for('overlay_image', file_hash=file_hash, page_num=page_num, digest=digest, fmt='png')
 
-    return img_with_boxes
 
-def draw_pdfplumber_boxes(image, dpi, results, highlight_id=None):
-    """Disegna rettangoli colorati per tipo su immagine da pdfplumber"""
-    img_with_boxes = image.copy()
-    draw = ImageDraw.Draw(img_with_boxes)
+def resolve_image_payload(image):
+    """
+    Accept either base64 image data or a URL of the image routes
+    and return base64 PNG data for AI providers
+    """
+    if not image:
+        return image
 
-    # Scala fattore: pdfplumber usa punti (72 DPI), immagine può essere a DPI diverso
-    scale = dpi / 72.0
+    url = urlparse(image)
+    if not url.path.startswith('/images/') or image.startswith('data:'):
+        return image
 
-    # Colori per tipo
-    type_colors = {
-        'number': '#0066FF',      # Blu per numeri
-        'date': '#FF6B35',        # Arancione per date
-        'reference': '#9D4EDD',   # Viola per riferimenti
-        'unit': '#06FFA5'         # Verde acqua per unità
-    }
+    path, query = url.path, url.query
+    try:
+        endpoint, values = app.url_map.bind('').match(path, query_args=query)
+    except Exception:
+        return None
 
-    for result in results:
-        bbox = result['bbox']
-        x = bbox['x'] * scale
-        y = bbox['y'] * scale
-        w = bbox['width'] * scale
-        h = bbox['height'] * scale
-        result_id = result.get('id')
-        data_type = result.get('type', 'number')
+    if endpoint == 'page_image':
+        dpi = min(max(_query_int(query, 'dpi', 150), MIN_IMAGE_DPI), MAX_IMAGE_DPI)
+        data = get_page_image_bytes(values['file_hash'], values['page_num'], dpi=dpi)
+    elif endpoint == 'overlay_image':
+        data = get_overlay_image_bytes(values['file_hash'], values['page_num'], values['digest'])
+    else:
+        return None
 
-        if result_id == highlight_id:
-            color = '#FFD700'  # Oro per evidenziato
-            width = 5
-        else:
-            color = type_colors.get(data_type, '#0066FF')
-            width = 3
+    return base64.b64encode(data).decode() if data is not None else None
 
-        for i in range(width):
-            draw.rectangle([x-i, y-i, x + w + i, y + h + i], outline=color, width=1)
 
-    return img_with_boxes
+def _query_int(query, name, default):
+    """Read an integer parameter from a raw query string"""
+    try:
+        return int(parse_qs(query).get(name, [default])[0])
+    except ValueError:
+        return default
 
 
-def image_to_base64(image):
-    """Convert PIL image to base64"""
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    return f"data:image/png;base64,{img_str}"
+def binary_image_response(data, fmt, etag):
+    """Build an immutable, ETag-validated image response (304 if client copy matches)"""
+    response = make_response(data)
+    response.mimetype = IMAGE_FORMATS[fmt][1]
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response.make_conditional(request)
 
 
 # ============================================================================
@@ -1463,6 +1566,12 @@ Fornisci un'analisi dettagliata in italiano, evidenziando elementi che potrebber
         return {'error': f'Error calling AI provider vision ({provider.get_name()}): {str(e)}'}
 
 
+# Characters of document text put in the Q&A and summary prompts: only the pages
+# needed to fill them are read (PDFProcessor.get_full_text_pdfplumber(max_chars))
+QA_CONTEXT_CHARS = 5000
+SUMMARY_CONTEXT_CHARS = 6000
+
+
 def answer_question_about_pdf(question, full_text, extracted_data):
     """
     Feature 3: Question-Answering
@@ -1491,7 +1600,7 @@ Per ottenere risposte accurate, attiva l'API di Claude Opus sul tuo account Anth
 
     # Create context from full text and extracted data
     context = f"""Testo completo del PDF:
-{full_text[:5000]}  # Limit to avoid token limits
+{full_text[:QA_CONTEXT_CHARS]}  # Limit to avoid token limits
 
 Dati estratti (numeri, date, riferimenti):
 {json.dumps(extracted_data[:50], indent=2, ensure_ascii=False)}  # First 50 items
@@ -1614,688 +1723,1034 @@ def summarize_document(full_text, extracted_data, pdf_type):
 
     prompt = f"""Analizza questo documento PDF {pdf_type} e crea un riepilogo strutturato.
 
-Testo del documento (prime 6000 caratteri):
-{full_text[:6000]}
+Testo del documento (prime 6000 caratteri):
+{full_text[:SUMMARY_CONTEXT_CHARS]}
+
+Dati estratti per tipo:
+{json.dumps(data_by_type, indent=2, ensure_ascii=False)}
+
+Crea un riepilogo strutturato in formato JSON con:
+{{
+  "tipo_documento": "descrizione del tipo di documento",
+  "scopo": "scopo principale del documento",
+  "informazioni_chiave": ["lista di informazioni più importanti"],
+  "numeri_rilevanti": ["numeri/misure principali con contesto"],
+  "date_importanti": ["date significative"],
+  "riferimenti": ["codici/riferimenti identificati"],
+  "conclusioni": "sintesi finale del contenuto"
+}}
+
+Rispondi SOLO con il JSON, senza testo aggiuntivo."""
+
+    try:
+        # Use the current AI provider
+        summary_text = provider.analyze_text(prompt, "")
+
+        # Try to parse as JSON
+        try:
+            summary = json.loads(summary_text)
+        except:
+            # If not valid JSON, return as text
+            summary = {'conclusioni': summary_text}
+
+        return {'success': True, 'summary': summary}
+
+    except Exception as e:
+        return {'error': f'Error calling AI provider ({provider.get_name()}): {str(e)}'}
+
+
+# ============================================================================
+# FLASK ROUTES
+# ============================================================================
+
+@app.route('/')
+def index():
+    # Leggi la versione dal file VERSION.txt
+    version = "0.0"
+    try:
+        with open('VERSION.txt', 'r') as f:
+            version = f.read().strip()
+    except Exception as e:
+        print(f"Errore lettura VERSION.txt: {e}")
+    return render_template('unified.html', version=version)
+
+
+def set_current_pdf(source_path):
+    """
+    Make uploads/current.pdf the given content-addressed PDF: a hard link (a copy where links
+    aren't supported) swapped in with an atomic rename, so current.pdf is never written in place
+    """
+    current_path = os.path.join(app.config['UPLOAD_FOLDER'], 'current.pdf')
+    if os.path.exists(current_path) and os.path.samefile(source_path, current_path):
+        return current_path
+
+    temp_path = f"{current_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(source_path, temp_path)
+    except OSError:
+        import shutil
+        shutil.copyfile(source_path, temp_path)
+    os.replace(temp_path, current_path)
+    return current_path
+
+
+def save_upload(file):
+    """
+    Save an uploaded PDF under its content hash and make it current.pdf, in a single pass:
+    the stream is hashed while written to a temp file, then stored by store_upload.
+    Returns (filename, file_hash, permanent_filepath)
+    """
+    filename = secure_filename(file.filename)
+
+    digest = hashlib.sha256()
+    temp_filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"upload-{uuid.uuid4().hex}.part")
+    try:
+        with open(temp_filepath, 'wb') as f:
+            for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+        raise
+
+    file_hash = digest.hexdigest()
+    return filename, file_hash, store_upload(temp_filepath, file_hash)
+
+
+def store_upload(temp_filepath, file_hash):
+    """
+    Rename a received file to <hash>.pdf (dropped if that file already exists)
+    and make it current.pdf. Returns the permanent path
+    """
+    permanent_filename = f"{file_hash}.pdf"
+    permanent_filepath = os.path.join(app.config['UPLOAD_FOLDER'], permanent_filename)
+
+    try:
+        if os.path.exists(permanent_filepath):
+            os.remove(temp_filepath)
+            print(f"[Upload] Already stored: {permanent_filename}")
+        else:
+            os.replace(temp_filepath, permanent_filepath)
+            print(f"[Upload] Saved permanent copy: {permanent_filename}")
+    except BaseException:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+        raise
+
+    current_path = set_current_pdf(permanent_filepath)
+    remember_file_hash(current_path, file_hash)
+    remember_file_hash(permanent_filepath, file_hash)
+
+    return permanent_filepath
+
+
+def first_page_settings(pdf_type):
+    """Extraction method of the first page and the configuration its results depend on"""
+    if pdf_type in ['textual', 'hybrid']:
+        return 'pdfplumber', app.config['PDF_TEXT_BACKEND']
+    return 'ocr', app.config['OCR_PREPROCESS_PROFILE']
+
+
+def first_page_overlay_data(extraction_method, data):
+    """Boxes drawn on the first page overlay (also its content address)"""
+    if extraction_method == 'pdfplumber':
+        return {'pdfplumber': data['all_numbers']}
+    return {'0deg': data['numbers_0deg'], '90deg': data['numbers_90deg']}
+
+
+def draw_first_page_overlay(image, extraction_method, data):
+    return draw_overlay(image, first_page_overlay_data(extraction_method, data))
+
+
+def save_first_page_results(file_hash, extraction_method, data):
+    """Save the first page results for the highlight and analysis routes"""
+    results = {'all_numbers': data['all_numbers']}
+    if extraction_method == 'ocr':
+        results['numbers_0deg'] = data['numbers_0deg']
+        results['numbers_90deg'] = data['numbers_90deg']
+    results.update({'extraction_method': extraction_method, 'file_hash': file_hash, 'page_num': 0})
+
+    results_path = os.path.join(app.config['UPLOAD_FOLDER'], 'ocr_results.json')
+    with open(results_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def extract_first_page(processor, file_hash, pdf_type):
+    """
+    Extract numbers/dates from the first page (pdfplumber for textual PDFs, advanced OCR
+    for raster ones), draw the overlay and store the results in the document cache, so a
+    later upload of the same file is served by load_first_page.
+    Returns (extraction_method, data, page_image_url)
+    """
+    extraction_method, settings = first_page_settings(pdf_type)
+
+    if extraction_method == 'pdfplumber':
+        # Pagina dalla raster cache, solo per disegnare i box (il testo viene dal PDF)
+        image = processor.get_page_as_pil(page_num=0, dpi=300)
+
+        # Usa pdfplumber per PDF testuali
+        print(f"PDF {pdf_type} rilevato - Uso pdfplumber per estrazione")
+        all_numbers = extract_data_from_pdfplumber(processor.pdf_path, page_num=0)
+
+        # Conta per tipo
+        type_counts = {}
+        for num in all_numbers:
+            t = num.get('type', 'number')
+            type_counts[t] = type_counts.get(t, 0) + 1
+        data = {'all_numbers': all_numbers, 'type_counts': type_counts}
+    else:
+        # Usa OCR avanzato per PDF rasterizzati
+        print(f"PDF {pdf_type} rilevato - Uso OCR avanzato")
+        # Pagina renderizzata una volta sola in un array (OCR), l'immagine PIL lo avvolge per disegnare
+        page_array = processor.get_page_array(page_num=0, dpi=300)
+        image = Image.fromarray(page_array)
+        with measure_page_memory(page_array):
+            all_numbers, numbers_0deg, numbers_90deg = extract_numbers_advanced(page_array, min_conf=60)
+        data = {
+            'all_numbers': all_numbers,
+            'numbers_0deg': numbers_0deg,
+            'numbers_90deg': numbers_90deg,
+            'type_counts': {'0deg': len(numbers_0deg), '90deg': len(numbers_90deg)}
+        }
+
+    # Salva l'immagine originale
+    original_path = os.path.join(app.config['UPLOAD_FOLDER'], 'original.png')
+    image.save(original_path)
+
+    # Disegna i rettangoli (colorati per tipo / unificati 0°-90°)
+    overlay_data = first_page_overlay_data(extraction_method, data)
+    page_image_url = store_overlay_image(draw_first_page_overlay(image, extraction_method, data),
+                                         file_hash, 0, overlay_data)
+
+    save_first_page_results(file_hash, extraction_method, data)
+    doc_cache.save_page_extraction(file_hash, 0, extraction_method, settings, data,
+                                   overlay_digest=overlay_digest(overlay_data))
+
+    return extraction_method, data, page_image_url
+
+
+def load_first_page(processor, file_hash, pdf_type):
+    """
+    First page extraction stored at ingest (None if missing or made with other settings).
+    The overlay and the page image come from the raster cache: nothing is parsed or OCRed,
+    and the page is rendered again only if the raster cache evicted them.
+    Returns (extraction_method, data, page_image_url)
+    """
+    stored = doc_cache.get_page_extraction(file_hash, 0)
+    if stored is None or (stored['extraction_method'], stored['settings']) != first_page_settings(pdf_type):
+        return None
+
+    extraction_method, data, digest = stored['extraction_method'], stored['data'], stored['overlay_digest']
+
+    if raster_cache.contains(file_hash, 0, 300, variant=f"overlay-{digest}.png"):
+        page_image_url = url_for('overlay_image', file_hash=file_hash, page_num=0, digest=digest, fmt='png')
+    else:
+        image = processor.get_page_as_pil(page_num=0, dpi=300)
+        page_image_url = store_overlay_image(draw_first_page_overlay(image, extraction_method, data),
+                                             file_hash, 0, first_page_overlay_data(extraction_method, data))
+
+    # Immagine originale per la route highlight: il PNG della pagina così com'è in cache
+    original_path = os.path.join(app.config['UPLOAD_FOLDER'], 'original.png')
+    with open(original_path, 'wb') as f:
+        f.write(processor.get_page_png(page_num=0, dpi=300))
+
+    save_first_page_results(file_hash, extraction_method, data)
+    return extraction_method, data, page_image_url
+
+
+async def extract_page_dimensions(job, processor, page_num, prompt, provider, provider_name, limiter):
+    """
+    Dimension extraction of one page (coroutine of the concurrent per-page extraction): async
+    vision call, then progressive temperature retries on safety errors. Returns the page entry
+    """
+    page_image_b64 = await asyncio.to_thread(processor.get_page_image, page_num=page_num)
+
+    try:
+        async with limiter.request_async():
+            dimensions_text = await provider.analyze_vision_async(prompt, page_image_b64)
+        print(f"Dimensioni estratte per pagina {page_num + 1}")
+        return {'page': page_num + 1, 'dimensions': dimensions_text}
+    except Exception as e:
+        error_msg = str(e).lower()
+        # Check if it's a safety/blocking error
+        if not any(keyword in error_msg for keyword in ['safety', 'finish_reason', 'blocked', 'recitation']):
+            # Not a safety error, just register it
+            print(f"Errore estrazione dimensioni pagina {page_num + 1}: {str(e)}")
+            return {'page': page_num + 1, 'error': str(e)}
+        error = e
+
+    print(f"Safety error detected on page {page_num + 1} with {provider_name}, retrying with increased temperature...")
+    # Progressive retry with increments: +0.1, +0.2, +0.3, +0.4, +0.5
+    for attempt_num, increment in enumerate([0.1, 0.2, 0.3, 0.4, 0.5], 1):
+        print(f"  Attempt page {page_num + 1} with temperature +{increment}...")
+        job.update(stage='retry', retry_attempt=attempt_num, retries=job.retries + 1, temperature=increment,
+                   message=f"Retry pagina {page_num + 1}: tentativo {attempt_num}/5 (temp +{increment})")
+        retry_result = await asyncio.to_thread(
+            retry_vision_with_increased_temperature,
+            provider,
+            prompt,
+            page_image_b64,
+            provider_name,
+            increment,
+            limiter=limiter
+        )
+        if retry_result:
+            print(f"  [OK] Success on page {page_num + 1} with temperature +{increment}")
+            return {'page': page_num + 1, 'dimensions': retry_result}
+
+    # All retries failed
+    print(f"  [FAILED] All retry attempts failed for page {page_num + 1}")
+    return {'page': page_num + 1, 'error': str(error)}
+
+
+async def extract_all_page_dimensions(job, processor, doc_id, page_count, prompt, provider, provider_name, limiter):
+    """
+    Dimension extraction of every page as coroutines on one event loop: at most
+    limiter.max_concurrency pages rendered and in flight for this job, each page saved to
+    page_dimensions as soon as it completes. Returns the page entries in page order
+    """
+    pages_in_flight = asyncio.Semaphore(limiter.max_concurrency)
+
+    async def extract(page_num):
+        async with pages_in_flight:
+            return await extract_page_dimensions(job, processor, page_num, prompt, provider, provider_name, limiter)
+
+    results = [None] * page_count
+    # Un solo client async per il job, chiuso (con le sue connessioni) prima della fine del loop
+    async with provider.async_session():
+        tasks = [asyncio.create_task(extract(page_num)) for page_num in range(page_count)]
+        for completed, next_result in enumerate(asyncio.as_completed(tasks), 1):
+            result = await next_result
+            results[result['page'] - 1] = result
+            save_page_dimension_result(doc_id, result)
+            job.update(stage='dimensions', page=completed,
+                       message=f"Estrazione dimensioni: {completed}/{page_count} pagine")
+    return results
+
+
+def save_page_dimension_result(doc_id, result):
+    """Write one page entry of the dimension results to page_dimensions"""
+    if 'error' in result:
+        # Failed extraction (SAFETY error or technical error)
+        doc_cache.save_page_dimension(
+            document_id=doc_id,
+            page_number=result['page'],
+            error=result['error'],
+            success=False
+        )
+    else:
+        # Successful extraction (AI responded, regardless of content)
+        # success=True means NO SAFETY/technical error
+        doc_cache.save_page_dimension(
+            document_id=doc_id,
+            page_number=result['page'],
+            dimensions_text=result['dimensions'],
+            success=True
+        )
+
+
+def process_upload(job, filename, file_hash, permanent_filepath):
+    """
+    Ingestion of an uploaded document (job worker): type detection, first page extraction,
+    auto layout analysis and per-page dimension extraction, cache save.
+    Progress goes to the job status; returns the upload response data
+    """
+    # Processing reads the content-addressed copy: current.pdf can be replaced by a later upload
+    filepath = permanent_filepath
+
+    # Check if document is already in cache (a document another job is still ingesting is a miss)
+    cached_doc = doc_cache.get_document(file_hash, complete_only=True)
+    if cached_doc:
+        print(f"[Cache HIT] Document found in cache: {filename}")
+        job.update(stage='analyzing', from_cache=True, message='Documento trovato in cache')
+
+        # Get cached page dimensions
+        doc_id = cached_doc['id']
+        cached_pages = doc_cache.get_page_dimensions(doc_id)
+        cached_layout = doc_cache.get_layout_analysis(doc_id)
+
+        # Reconstruct response from cache: page metadata, text and first page extraction are stored
+        processor = PDFProcessor(filepath, file_hash=file_hash)
+        pdf_type, pages_info = processor.detect_pdf_type()
+        page_count = processor.get_page_count()
+
+        if pdf_type in ['textual', 'hybrid']:
+            full_text = processor.get_full_text_pdfplumber()
+        else:
+            full_text = "PDF rasterizzato - usa OCR avanzato per l'estrazione"
+
+        first_page = load_first_page(processor, file_hash, pdf_type)
+        if first_page is None:
+            print("[Cache] First page extraction not stored, extracting...")
+            first_page = extract_first_page(processor, file_hash, pdf_type)
+        extraction_method, first_page_data, page_image_url = first_page
+        all_numbers = first_page_data['all_numbers']
+        type_counts = first_page_data['type_counts']
+
+        # Reconstruct dimensions_extraction from cached data
+        dimensions_extraction = None
+        auto_dimensions_executed = False
+        if cached_pages:
+            # Pagine senza risultato (estrazione interrotta): ritentate come quelle fallite
+            stored_pages = {p['page_number'] for p in cached_pages}
+            for page_number in range(1, page_count + 1):
+                if page_number not in stored_pages:
+                    cached_pages.append({'page_number': page_number, 'dimensions_text': None,
+                                         'error': 'Extraction interrupted', 'retry_count': 0, 'success': False})
+            cached_pages.sort(key=lambda p: p['page_number'])
+
+            # Check for failed pages that need retry
+            failed_pages = [p for p in cached_pages if not p['success']]
+
+            if failed_pages and page_count > 1:
+                print(f"[Cache] Found {len(failed_pages)} failed page(s), retrying with increased temperature...")
+
+                # Get default dimension prompt for retry
+                dimension_prompts_file = os.path.join(app.config['DIMENSION_PROMPTS_FOLDER'], 'dimension_prompts.json')
+                default_dim_prompt = None
+
+                if os.path.exists(dimension_prompts_file):
+                    try:
+                        with open(dimension_prompts_file, 'r', encoding='utf-8') as f:
+                            dimension_data = json.load(f)
+
+                        # Find default prompt
+                        for prompt in dimension_data.get('prompts', []):
+                            if prompt.get('is_default', False):
+                                default_dim_prompt = prompt
+                                break
+
+                        if not default_dim_prompt:
+                            print(f"[Cache] WARNING: No default dimension prompt found in {dimension_prompts_file}")
+                    except Exception as e:
+                        print(f"[Cache] ERROR reading dimension prompts: {str(e)}")
+                else:
+                    print(f"[Cache] WARNING: Dimension prompts file not found: {dimension_prompts_file}")
+
+                if default_dim_prompt:
+                    print(f"[Cache] Using prompt '{default_dim_prompt['name']}' for retry")
+                    current_provider = ai_manager.get_current_provider()
+                    provider_name = ai_manager.get_current_provider_name()
+                    limiter = ai_limits.get(ai_manager.current_provider)
+
+                    # Retry each failed page with progressively higher temperature
+                    for page_data in failed_pages:
+                        page_num = page_data['page_number'] - 1  # Convert to 0-indexed
+                        print(f"[Cache Retry] Attempting page {page_data['page_number']} (previously failed)")
+
+                        # Update job status
+                        job.update(stage='retry', page=page_data['page_number'], total_pages=page_count,
+                                   message=f"Retry pagina {page_data['page_number']} (errore SAFETY)")
+
+                        # Get page image
+                        page_image_b64 = processor.get_page_image(page_num=page_num)
+
+                        # Start with higher temperature since normal already failed
+                        dimensions_text = None
+                        for attempt_num, increment in enumerate([0.2, 0.3, 0.4, 0.5, 0.6], 1):
+                            print(f"  [Cache Retry] Page {page_data['page_number']} with temperature +{increment}...")
+
+                            # Update status with attempt info
+                            job.update(retry_attempt=attempt_num, retries=job.retries + 1, temperature=increment,
+                                       message=f"Retry pagina {page_data['page_number']}: tentativo {attempt_num}/5 (temp +{increment})")
+
+                            retry_result = retry_vision_with_increased_temperature(
+                                current_provider,
+                                default_dim_prompt['content'],
+                                page_image_b64,
+                                provider_name,
+                                increment,
+                                limiter=limiter
+                            )
+                            if retry_result:
+                                dimensions_text = retry_result
+                                print(f"  [Cache Retry SUCCESS] Page {page_data['page_number']} with temperature +{increment}")
+
+                                # Update database with successful result
+                                doc_cache.save_page_dimension(
+                                    document_id=doc_id,
+                                    page_number=page_data['page_number'],
+                                    dimensions_text=dimensions_text,
+                                    retry_count=page_data.get('retry_count', 0) + 1,
+                                    final_temperature=increment,
+                                    success=True
+                                )
+
+                                # Update cached_pages data
+                                page_data['dimensions_text'] = dimensions_text
+                                page_data['success'] = True
+                                page_data['error'] = None
+                                break
+
+                        if not dimensions_text:
+                            print(f"  [Cache Retry FAILED] All retry attempts failed for page {page_data['page_number']}")
+
+            # Build results from updated cached_pages
+            results = []
+            for page_data in cached_pages:
+                if page_data['success']:
+                    results.append({
+                        'page': page_data['page_number'],
+                        'dimensions': page_data['dimensions_text']
+                    })
+                else:
+                    results.append({
+                        'page': page_data['page_number'],
+                        'error': page_data['error']
+                    })
+
+            dimensions_extraction = {
+                'prompt_name': 'default',
+                'prompt_id': 'default',
+                'provider': cached_doc['provider_name'],
+                'results': results
+            }
+            auto_dimensions_executed = True
+
+        # Reconstruct layout_analysis from cached data
+        layout_analysis = None
+        auto_layout_executed = False
+        if cached_layout:
+            layout_analysis = {
+                'analysis': cached_layout['analysis_text'],
+                'provider': cached_layout['provider_name'],
+                'prompt_name': cached_layout['prompt_name']
+            }
+            auto_layout_executed = True
+
+        print(f"[Cache] Returning cached results (estimated time saved: {cached_doc.get('actual_processing_time', 0):.1f}s)")
+
+        # Mark upload as complete
+        job.update(message='Elaborazione completata (da cache)')
+
+        return {
+            'success': True,
+            'pdf_type': pdf_type,
+            'page_count': page_count,
+            'pages_info': pages_info,
+            'full_text': full_text,
+            'page_image_url': page_image_url,
+            'has_numbers': True,
+            'numbers': all_numbers,
+            'numbers_count': len(all_numbers),
+            'extraction_method': extraction_method,
+            'type_counts': type_counts,
+            'auto_layout_executed': auto_layout_executed,
+            'layout_analysis': layout_analysis,
+            'auto_dimensions_executed': auto_dimensions_executed,
+            'dimensions_extraction': dimensions_extraction,
+            'from_cache': True
+        }
+
+    print(f"[Cache MISS] Processing new document: {filename}")
+    job.update(stage='analyzing', message='Analisi documento...')
+
+    # Track processing time
+    start_time = time.time()
+
+    processor = PDFProcessor(filepath, file_hash=file_hash)
+    pdf_type, pages_info = processor.detect_pdf_type()
+    page_count = processor.get_page_count()
+
+    # Extract full text
+    if pdf_type in ['textual', 'hybrid']:
+        full_text = processor.get_full_text_pdfplumber()
+    else:
+        full_text = "PDF rasterizzato - usa OCR avanzato per l'estrazione"
+
+    # Strategia di estrazione basata sul tipo di PDF
+    job.update(stage='extracting', total_pages=page_count, message='Estrazione dati pagina 1...')
+    try:
+        extraction_method, first_page_data, page_image_url = extract_first_page(processor, file_hash, pdf_type)
+        all_numbers = first_page_data['all_numbers']
+        type_counts = first_page_data['type_counts']
+        has_numbers = True
+        numbers_count = len(all_numbers)
+
+    except Exception as e:
+        import traceback
+        print(f"Errore nell'estrazione automatica: {traceback.format_exc()}")
+        # Fallback: immagine senza rettangoli
+        page_image_url = page_image_url_for(file_hash, 0)
+        has_numbers = False
+        numbers_count = 0
+        extraction_method = 'none'
+        type_counts = {}
+        all_numbers = []
+
+    # Auto-analisi layout per PDF multi-pagina se esiste prompt predefinito
+    layout_analysis = None
+    auto_layout_executed = False
+
+    if page_count > 1:
+        try:
+            # Controlla se esiste un prompt layout predefinito
+            layout_prompts_file = os.path.join(app.config['LAYOUT_PROMPTS_FOLDER'], 'layout_prompts.json')
+
+            if os.path.exists(layout_prompts_file):
+                with open(layout_prompts_file, 'r', encoding='utf-8') as f:
+                    layout_data = json.load(f)
+
+                # Trova il prompt predefinito
+                default_prompt = None
+                for prompt in layout_data.get('prompts', []):
+                    if prompt.get('is_default', False):
+                        default_prompt = prompt
+                        break
+
+                if default_prompt:
+                    print(f"PDF multi-pagina rilevato ({page_count} pagine) - Esecuzione auto-analisi layout con prompt predefinito: {default_prompt['name']}")
+                    job.update(stage='layout', message=f"Analisi layout ({page_count} pagine)...")
+
+                    # Esegui analisi layout
+                    current_provider = ai_manager.get_current_provider()
+                    if current_provider:
+                        provider_name = ai_manager.get_current_provider_name()
+
+                        # Raccogli tutte le immagini delle pagine
+                        all_page_images = []
+                        for page_num in range(page_count):
+                            page_image_b64 = processor.get_page_image(page_num=page_num)
+                            all_page_images.append(page_image_b64)
+
+                        # Analizza l'intero documento con tutte le pagine
+                        try:
+                            with ai_limits.get(ai_manager.current_provider).request():
+                                analysis = current_provider.analyze_vision(
+                                    default_prompt['content'],
+                                    all_page_images
+                                )
 
-Dati estratti per tipo:
-{json.dumps(data_by_type, indent=2, ensure_ascii=False)}
+                            layout_analysis = {
+                                'prompt_name': default_prompt['name'],
+                                'prompt_id': default_prompt['id'],
+                                'provider': provider_name,
+                                'page_count': page_count,
+                                'analysis': analysis
+                            }
+                            auto_layout_executed = True
+                            print(f"Auto-analisi layout completata con {provider_name} su {page_count} pagine")
 
-Crea un riepilogo strutturato in formato JSON con:
-{{
-  "tipo_documento": "descrizione del tipo di documento",
-  "scopo": "scopo principale del documento",
-  "informazioni_chiave": ["lista di informazioni più importanti"],
-  "numeri_rilevanti": ["numeri/misure principali con contesto"],
-  "date_importanti": ["date significative"],
-  "riferimenti": ["codici/riferimenti identificati"],
-  "conclusioni": "sintesi finale del contenuto"
-}}
+                        except Exception as e:
+                            print(f"Errore analisi documento: {str(e)}")
+                            layout_analysis = {
+                                'prompt_name': default_prompt['name'],
+                                'prompt_id': default_prompt['id'],
+                                'provider': provider_name,
+                                'page_count': page_count,
+                                'error': str(e)
+                            }
+                            auto_layout_executed = True
 
-Rispondi SOLO con il JSON, senza testo aggiuntivo."""
+        except Exception as e:
+            import traceback
+            print(f"Errore durante auto-analisi layout: {traceback.format_exc()}")
+            # Non bloccare l'upload se l'analisi layout fallisce
 
-    try:
-        # Use the current AI provider
-        summary_text = provider.analyze_text(prompt, "")
+    # Auto-estrazione dimensioni per PDF multi-pagina se esiste prompt predefinito
+    dimensions_extraction = None
+    auto_dimensions_executed = False
 
-        # Try to parse as JSON
+    if page_count > 1:
         try:
-            summary = json.loads(summary_text)
-        except:
-            # If not valid JSON, return as text
-            summary = {'conclusioni': summary_text}
+            # Controlla se esiste un prompt dimensioni predefinito
+            dimension_prompts_file = os.path.join(app.config['DIMENSION_PROMPTS_FOLDER'], 'dimension_prompts.json')
+
+            if os.path.exists(dimension_prompts_file):
+                with open(dimension_prompts_file, 'r', encoding='utf-8') as f:
+                    dimension_data = json.load(f)
+
+                # Trova il prompt predefinito
+                default_dim_prompt = None
+                for prompt in dimension_data.get('prompts', []):
+                    if prompt.get('is_default', False):
+                        default_dim_prompt = prompt
+                        break
 
-        return {'success': True, 'summary': summary}
+                if default_dim_prompt:
+                    print(f"PDF multi-pagina rilevato ({page_count} pagine) - Esecuzione auto-estrazione dimensioni con prompt predefinito: {default_dim_prompt['name']}")
 
-    except Exception as e:
-        return {'error': f'Error calling AI provider ({provider.get_name()}): {str(e)}'}
+                    # Esegui estrazione dimensioni
+                    current_provider = ai_manager.get_current_provider()
+                    if current_provider:
+                        provider_name = ai_manager.get_current_provider_name()
 
+                        limiter = ai_limits.get(ai_manager.current_provider)
 
-# ============================================================================
-# FLASK ROUTES
-# ============================================================================
+                        # Riga del documento creata subito: ogni pagina va in page_dimensions appena estratta.
+                        # Senza actual_processing_time (impostato dal salvataggio finale) resta "in corso"
+                        doc_id = doc_cache.save_document(
+                            file_hash=file_hash,
+                            filename=filename,
+                            file_path=permanent_filepath,
+                            page_count=page_count,
+                            provider_name=provider_name
+                        )
 
-@app.route('/')
-def index():
-    # Leggi la versione dal file VERSION.txt
-    version = "0.0"
+                        # Pagine estratte in parallelo (entro i limiti del provider), risultati in ordine di pagina
+                        job.update(stage='dimensions', page=0, retry_attempt=0, temperature=0.0,
+                                   message=f"Estrazione dimensioni: 0/{page_count} pagine")
+                        results = asyncio.run(extract_all_page_dimensions(
+                            job, processor, doc_id, page_count, default_dim_prompt['content'],
+                            current_provider, provider_name, limiter))
+
+                        dimensions_extraction = {
+                            'prompt_name': default_dim_prompt['name'],
+                            'prompt_id': default_dim_prompt['id'],
+                            'provider': provider_name,
+                            'results': results
+                        }
+                        auto_dimensions_executed = True
+                        print(f"Auto-estrazione dimensioni completata con {provider_name} su {page_count} pagine")
+
+        except Exception as e:
+            import traceback
+            print(f"Errore durante auto-estrazione dimensioni: {traceback.format_exc()}")
+            # Non bloccare l'upload se l'estrazione dimensioni fallisce
+
+    # Calculate processing time
+    processing_time = time.time() - start_time
+
+    # Save to cache
+    job.update(stage='saving', message='Salvataggio in cache...')
     try:
-        with open('VERSION.txt', 'r') as f:
-            version = f.read().strip()
-    except Exception as e:
-        print(f"Errore lettura VERSION.txt: {e}")
-    return render_template('unified.html', version=version)
+        # Save document info
+        provider_name = None
+        if auto_dimensions_executed and dimensions_extraction:
+            provider_name = dimensions_extraction.get('provider')
+        elif auto_layout_executed and layout_analysis:
+            provider_name = layout_analysis.get('provider')
+
+        # Build structured analysis data
+        analysis_data = {
+            'pdf_type': pdf_type,
+            'extraction_method': extraction_method,
+            'page_count': page_count,
+            'processing_time': processing_time
+        }
 
+        # Add layout analysis if executed
+        if auto_layout_executed and layout_analysis:
+            analysis_data['layout_analysis'] = {
+                'prompt_name': layout_analysis.get('prompt_name'),
+                'prompt_id': layout_analysis.get('prompt_id'),
+                'provider': layout_analysis.get('provider'),
+                'analysis': layout_analysis.get('analysis'),
+                'error': layout_analysis.get('error')
+            }
 
-@app.route('/upload', methods=['POST'])
-def upload_file():
-    # Reset upload status
-    upload_status['status'] = 'uploading'
-    upload_status['message'] = 'Upload documento...'
-    upload_status['page'] = 0
-    upload_status['total_pages'] = 0
-    upload_status['retry_attempt'] = 0
-    upload_status['temperature'] = 0.0
-    upload_status['from_cache'] = False
+        # Add dimensions extraction if executed
+        if auto_dimensions_executed and dimensions_extraction:
+            dim_data = {
+                'prompt_name': dimensions_extraction.get('prompt_name'),
+                'prompt_id': dimensions_extraction.get('prompt_id'),
+                'provider': dimensions_extraction.get('provider'),
+                'results_per_page': {}
+            }
 
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
+            # Organize results by page
+            for result in dimensions_extraction.get('results', []):
+                page_num = result['page']
+                dim_data['results_per_page'][str(page_num)] = {
+                    'dimensions_text': result.get('dimensions'),
+                    'error': result.get('error'),
+                    'success': 'error' not in result
+                }
 
-    file = request.files['file']
+            analysis_data['dimensions_extraction'] = dim_data
 
-    if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
+        doc_id = doc_cache.save_document(
+            file_hash=file_hash,
+            filename=filename,
+            file_path=permanent_filepath,
+            page_count=page_count,
+            actual_processing_time=processing_time,
+            provider_name=provider_name,
+            analysis_data=analysis_data
+        )
 
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
+        # Save layout analysis if auto-executed
+        if auto_layout_executed and layout_analysis:
+            doc_cache.save_layout_analysis(
+                document_id=doc_id,
+                analysis_text=layout_analysis['analysis'],
+                provider_name=layout_analysis['provider'],
+                prompt_name=layout_analysis.get('prompt_name', 'default')
+            )
 
-        # Save to temporary current.pdf first
-        temp_filepath = os.path.join(app.config['UPLOAD_FOLDER'], 'current.pdf')
-        file.save(temp_filepath)
+        print(f"[Cache] Document saved to cache (processing time: {processing_time:.1f}s)")
+    except Exception as e:
+        print(f"[Cache] Error saving to cache: {str(e)}")
+        # Don't fail upload if cache save fails
 
-        # Calculate file hash for caching
-        file_hash = doc_cache.calculate_file_hash(temp_filepath)
+    # Mark upload as complete
+    job.update(message='Elaborazione completata')
 
-        # Save permanent copy with hash-based filename
-        import shutil
-        permanent_filename = f"{file_hash}.pdf"
-        permanent_filepath = os.path.join(app.config['UPLOAD_FOLDER'], permanent_filename)
+    return {
+        'success': True,
+        'pdf_type': pdf_type,
+        'page_count': page_count,
+        'pages_info': pages_info,
+        'full_text': full_text,
+        'page_image_url': page_image_url,
+        'has_numbers': has_numbers,
+        'numbers': all_numbers,
+        'numbers_count': numbers_count,
+        'extraction_method': extraction_method,
+        'type_counts': type_counts,
+        'auto_layout_executed': auto_layout_executed,
+        'layout_analysis': layout_analysis,
+        'auto_dimensions_executed': auto_dimensions_executed,
+        'dimensions_extraction': dimensions_extraction
+    }
 
-        # Copy to permanent location if not already there
-        if not os.path.exists(permanent_filepath):
-            shutil.copy2(temp_filepath, permanent_filepath)
-            print(f"[Upload] Saved permanent copy: {permanent_filename}")
 
-        # Use current.pdf for processing (for compatibility)
-        filepath = temp_filepath
+def submit_upload_job():
+    """Save the uploaded file of the request and queue its processing (Job, or an error response)"""
+    if 'file' not in request.files:
+        return None, (jsonify({'error': 'No file part'}), 400)
 
-        # Check if document is already in cache
-        cached_doc = doc_cache.get_document(file_hash)
-        if cached_doc:
-            print(f"[Cache HIT] Document found in cache: {filename}")
-
-            # Get cached page dimensions
-            doc_id = cached_doc['id']
-            cached_pages = doc_cache.get_page_dimensions(doc_id)
-            cached_layout = doc_cache.get_layout_analysis(doc_id)
-
-            # Reconstruct response from cache
-            # Still need to generate page_image for display
-            processor = PDFProcessor(filepath)
-            pdf_type, pages_info = processor.detect_pdf_type()
-            page_count = processor.get_page_count()
-
-            # Get first page image
-            image = processor.get_page_as_pil(page_num=0, dpi=300)
-            original_path = os.path.join(app.config['UPLOAD_FOLDER'], 'original.png')
-            image.save(original_path)
-
-            # Reconstruct extraction based on PDF type
-            if pdf_type in ['textual', 'hybrid']:
-                full_text = processor.get_full_text_pdfplumber()
-                all_numbers = extract_numbers_from_pdfplumber(filepath, page_num=0)
-                img_with_boxes = draw_pdfplumber_boxes(image, 300, all_numbers)
-                page_image = image_to_base64(img_with_boxes)
-                extraction_method = 'pdfplumber'
-
-                # Save results
-                results_path = os.path.join(app.config['UPLOAD_FOLDER'], 'ocr_results.json')
-                with open(results_path, 'w', encoding='utf-8') as f:
-                    json.dump({
-                        'all_numbers': all_numbers,
-                        'extraction_method': 'pdfplumber'
-                    }, f, ensure_ascii=False, indent=2)
-
-                type_counts = {}
-                for num in all_numbers:
-                    t = num.get('type', 'number')
-                    type_counts[t] = type_counts.get(t, 0) + 1
-            else:
-                full_text = "PDF rasterizzato - usa OCR avanzato per l'estrazione"
-                all_numbers, numbers_0deg, numbers_90deg = extract_numbers_advanced(image, min_conf=60)
-                img_with_boxes = draw_unified_boxes(image, numbers_0deg, numbers_90deg)
-                page_image = image_to_base64(img_with_boxes)
-                extraction_method = 'ocr'
-
-                # Save results
-                results_path = os.path.join(app.config['UPLOAD_FOLDER'], 'ocr_results.json')
-                with open(results_path, 'w', encoding='utf-8') as f:
-                    json.dump({
-                        'all_numbers': all_numbers,
-                        'numbers_0deg': numbers_0deg,
-                        'numbers_90deg': numbers_90deg,
-                        'extraction_method': 'ocr'
-                    }, f, ensure_ascii=False, indent=2)
-
-                type_counts = {
-                    '0deg': len(numbers_0deg),
-                    '90deg': len(numbers_90deg)
-                }
+    file = request.files['file']
 
-            # Reconstruct dimensions_extraction from cached data
-            dimensions_extraction = None
-            auto_dimensions_executed = False
-            if cached_pages:
-                # Check for failed pages that need retry
-                failed_pages = [p for p in cached_pages if not p['success']]
+    if file.filename == '':
+        return None, (jsonify({'error': 'No selected file'}), 400)
 
-                if failed_pages and page_count > 1:
-                    print(f"[Cache] Found {len(failed_pages)} failed page(s), retrying with increased temperature...")
+    if not (file and allowed_file(file.filename)):
+        return None, (jsonify({'error': 'Invalid file type'}), 400)
 
-                    # Get default dimension prompt for retry
-                    dimension_prompts_file = os.path.join(app.config['DIMENSION_PROMPTS_FOLDER'], 'dimension_prompts.json')
-                    default_dim_prompt = None
+    filename, file_hash, permanent_filepath = save_upload(file)
+    return queue_upload_job(filename, file_hash, permanent_filepath), None
 
-                    if os.path.exists(dimension_prompts_file):
-                        try:
-                            with open(dimension_prompts_file, 'r', encoding='utf-8') as f:
-                                dimension_data = json.load(f)
 
-                            # Find default prompt
-                            for prompt in dimension_data.get('prompts', []):
-                                if prompt.get('is_default', False):
-                                    default_dim_prompt = prompt
-                                    break
+def queue_upload_job(filename, file_hash, permanent_filepath):
+    """
+    Queue the processing of a stored upload on upload_jobs (called within the request).
+    If the same file is already being processed, its running job is returned instead
+    """
+    job = Job(filename, file_hash)
 
-                            if not default_dim_prompt:
-                                print(f"[Cache] WARNING: No default dimension prompt found in {dimension_prompts_file}")
-                        except Exception as e:
-                            print(f"[Cache] ERROR reading dimension prompts: {str(e)}")
-                    else:
-                        print(f"[Cache] WARNING: Dimension prompts file not found: {dimension_prompts_file}")
+    # Il lavoro gira fuori dalla richiesta: contesto copiato per url_for delle immagini
+    @copy_current_request_context
+    def work(job):
+        return process_upload(job, filename, file_hash, permanent_filepath)
 
-                    if default_dim_prompt:
-                        print(f"[Cache] Using prompt '{default_dim_prompt['name']}' for retry")
-                        current_provider = ai_manager.get_current_provider()
-                        provider_name = ai_manager.get_current_provider_name()
+    submitted = upload_jobs.submit(job, work, reuse_active=True)
+    if submitted is not job:
+        print(f"[Upload] {filename} already being processed: attached to job {submitted.id}")
+    return submitted
 
-                        # Retry each failed page with progressively higher temperature
-                        for page_data in failed_pages:
-                            page_num = page_data['page_number'] - 1  # Convert to 0-indexed
-                            print(f"[Cache Retry] Attempting page {page_data['page_number']} (previously failed)")
 
-                            # Update global status
-                            upload_status['status'] = 'retry'
-                            upload_status['page'] = page_data['page_number']
-                            upload_status['total_pages'] = page_count
-                            upload_status['message'] = f"Retry pagina {page_data['page_number']} (errore SAFETY)"
-                            upload_status['from_cache'] = True
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    """Synchronous upload: queue the ingestion job and wait for its result"""
+    job, error_response = submit_upload_job()
+    if error_response:
+        return error_response
 
-                            # Get page image
-                            page_image_b64 = processor.get_page_image(page_num=page_num)
+    job.done.wait()
+    if job.status == 'error':
+        return jsonify({'error': job.error, 'job_id': job.id}), 500
+    return jsonify(job.result)
 
-                            # Start with higher temperature since normal already failed
-                            dimensions_text = None
-                            for attempt_num, increment in enumerate([0.2, 0.3, 0.4, 0.5, 0.6], 1):
-                                print(f"  [Cache Retry] Page {page_data['page_number']} with temperature +{increment}...")
-
-                                # Update status with attempt info
-                                upload_status['retry_attempt'] = attempt_num
-                                upload_status['temperature'] = increment
-                                upload_status['message'] = f"Retry pagina {page_data['page_number']}: tentativo {attempt_num}/5 (temp +{increment})"
-
-                                retry_result = retry_vision_with_increased_temperature(
-                                    current_provider,
-                                    default_dim_prompt['content'],
-                                    page_image_b64,
-                                    provider_name,
-                                    increment
-                                )
-                                if retry_result:
-                                    dimensions_text = retry_result
-                                    print(f"  [Cache Retry SUCCESS] Page {page_data['page_number']} with temperature +{increment}")
-
-                                    # Update database with successful result
-                                    doc_cache.save_page_dimension(
-                                        document_id=doc_id,
-                                        page_number=page_data['page_number'],
-                                        dimensions_text=dimensions_text,
-                                        retry_count=page_data.get('retry_count', 0) + 1,
-                                        final_temperature=increment,
-                                        success=True
-                                    )
-
-                                    # Update cached_pages data
-                                    page_data['dimensions_text'] = dimensions_text
-                                    page_data['success'] = True
-                                    page_data['error'] = None
-                                    break
-
-                            if not dimensions_text:
-                                print(f"  [Cache Retry FAILED] All retry attempts failed for page {page_data['page_number']}")
-
-                # Build results from updated cached_pages
-                results = []
-                for page_data in cached_pages:
-                    if page_data['success']:
-                        results.append({
-                            'page': page_data['page_number'],
-                            'dimensions': page_data['dimensions_text']
-                        })
-                    else:
-                        results.append({
-                            'page': page_data['page_number'],
-                            'error': page_data['error']
-                        })
-
-                dimensions_extraction = {
-                    'prompt_name': 'default',
-                    'prompt_id': 'default',
-                    'provider': cached_doc['provider_name'],
-                    'results': results
-                }
-                auto_dimensions_executed = True
-
-            # Reconstruct layout_analysis from cached data
-            layout_analysis = None
-            auto_layout_executed = False
-            if cached_layout:
-                layout_analysis = {
-                    'analysis': cached_layout['analysis_text'],
-                    'provider': cached_layout['provider_name'],
-                    'prompt_name': cached_layout['prompt_name']
-                }
-                auto_layout_executed = True
 
-            print(f"[Cache] Returning cached results (estimated time saved: {cached_doc.get('actual_processing_time', 0):.1f}s)")
+@app.route('/upload/jobs', methods=['POST'])
+def submit_upload():
+    """Asynchronous upload: returns the job id right away, progress from /upload/jobs/<job_id>"""
+    job, error_response = submit_upload_job()
+    if error_response:
+        return error_response
 
-            # Mark upload as complete
-            upload_status['status'] = 'complete'
-            upload_status['message'] = 'Elaborazione completata (da cache)'
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'file_hash': job.file_hash,
+        'status_url': url_for('get_upload_job', job_id=job.id)
+    }), 202
 
-            return jsonify({
-                'success': True,
-                'pdf_type': pdf_type,
-                'page_count': page_count,
-                'pages_info': pages_info,
-                'full_text': full_text,
-                'page_image': page_image,
-                'has_numbers': True,
-                'numbers': all_numbers,
-                'numbers_count': len(all_numbers),
-                'extraction_method': extraction_method,
-                'type_counts': type_counts,
-                'auto_layout_executed': auto_layout_executed,
-                'layout_analysis': layout_analysis,
-                'auto_dimensions_executed': auto_dimensions_executed,
-                'dimensions_extraction': dimensions_extraction,
-                'from_cache': True
-            })
 
-        print(f"[Cache MISS] Processing new document: {filename}")
+# Seconds between keep-alive comments on an idle event stream
+SSE_KEEPALIVE_SECONDS = 15
 
-        # Track processing time
-        import time
-        start_time = time.time()
 
-        processor = PDFProcessor(filepath)
-        pdf_type, pages_info = processor.detect_pdf_type()
-        page_count = processor.get_page_count()
+@app.route('/upload/jobs/<job_id>/events')
+def upload_job_events(job_id):
+    """
+    Server-Sent Events of an upload job: 'progress' (status snapshot at every stage, page,
+    retry and temperature change), then 'complete' (with the upload result) or 'failed'.
+    Reconnections resume after the Last-Event-ID header (or ?last_event_id=)
+    """
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
 
-        # Extract full text
-        if pdf_type in ['textual', 'hybrid']:
-            full_text = processor.get_full_text_pdfplumber()
-        else:
-            full_text = "PDF rasterizzato - usa OCR avanzato per l'estrazione"
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', request.args.get('last_event_id', 0)))
+    except ValueError:
+        last_event_id = 0
+
+    def generate(last_event_id):
+        yield 'retry: 2000\n\n'
+        while True:
+            events, finished = job.wait_events(last_event_id, timeout=SSE_KEEPALIVE_SECONDS)
+            if not events:
+                yield ': keepalive\n\n'
+            for event_id, event_type, data in events:
+                yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                last_event_id = event_id
+            if finished:
+                return
+
+    response = Response(generate(last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/upload/jobs/<job_id>')
+def get_upload_job(job_id):
+    """Status of an upload job (stage, page, retries, timings; result once complete)"""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, **job.to_dict()})
+
+
+def chunked_upload_status(upload):
+    """Progress of a chunked upload, with the first page preview URL once available"""
+    data = upload.to_dict()
+    if data['first_page_ready']:
+        data['first_page_url'] = url_for('chunked_upload_first_page', upload_id=upload.id)
+    return data
+
+
+@app.route('/upload/chunked', methods=['POST'])
+def init_chunked_upload():
+    """
+    Start a resumable upload, JSON {filename, size}. The chunks (chunk_size bytes, the last
+    one shorter) are then PUT in order to /upload/chunked/<upload_id>/chunks/<n>
+    """
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename', ''))
+    if not filename or not allowed_file(filename):
+        return jsonify({'success': False, 'error': 'Invalid file type'}), 400
 
-        # Get first page as PIL image for processing
-        image = processor.get_page_as_pil(page_num=0, dpi=300)
+    try:
+        upload = chunked_uploads.create(filename, int(data.get('size', 0)))
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
 
-        # Salva l'immagine originale
-        original_path = os.path.join(app.config['UPLOAD_FOLDER'], 'original.png')
-        image.save(original_path)
+    return jsonify({'success': True, **chunked_upload_status(upload)}), 201
 
-        # Strategia di estrazione basata sul tipo di PDF
-        try:
-            if pdf_type in ['textual', 'hybrid']:
-                # Usa pdfplumber per PDF testuali
-                print(f"PDF {pdf_type} rilevato - Uso pdfplumber per estrazione")
-                all_numbers = extract_numbers_from_pdfplumber(filepath, page_num=0)
-
-                # Disegna rettangoli colorati per tipo
-                img_with_boxes = draw_pdfplumber_boxes(image, 300, all_numbers)
-                page_image = image_to_base64(img_with_boxes)
-
-                # Salva i risultati
-                results_path = os.path.join(app.config['UPLOAD_FOLDER'], 'ocr_results.json')
-                with open(results_path, 'w', encoding='utf-8') as f:
-                    json.dump({
-                        'all_numbers': all_numbers,
-                        'extraction_method': 'pdfplumber'
-                    }, f, ensure_ascii=False, indent=2)
-
-                has_numbers = True
-                numbers_count = len(all_numbers)
-                extraction_method = 'pdfplumber'
-
-                # Conta per tipo
-                type_counts = {}
-                for num in all_numbers:
-                    t = num.get('type', 'number')
-                    type_counts[t] = type_counts.get(t, 0) + 1
 
-            else:
-                # Usa OCR avanzato per PDF rasterizzati
-                print(f"PDF {pdf_type} rilevato - Uso OCR avanzato")
-                all_numbers, numbers_0deg, numbers_90deg = extract_numbers_advanced(image, min_conf=60)
-
-                # Disegna i rettangoli unificati
-                img_with_boxes = draw_unified_boxes(image, numbers_0deg, numbers_90deg)
-                page_image = image_to_base64(img_with_boxes)
-
-                # Salva i risultati per la route highlight
-                results_path = os.path.join(app.config['UPLOAD_FOLDER'], 'ocr_results.json')
-                with open(results_path, 'w', encoding='utf-8') as f:
-                    json.dump({
-                        'all_numbers': all_numbers,
-                        'numbers_0deg': numbers_0deg,
-                        'numbers_90deg': numbers_90deg,
-                        'extraction_method': 'ocr'
-                    }, f, ensure_ascii=False, indent=2)
-
-                has_numbers = True
-                numbers_count = len(all_numbers)
-                extraction_method = 'ocr'
-                type_counts = {
-                    '0deg': len(numbers_0deg),
-                    '90deg': len(numbers_90deg)
-                }
+@app.route('/upload/chunked/<upload_id>')
+def get_chunked_upload(upload_id):
+    """Status of a chunked upload: a client resumes from next_chunk"""
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    return jsonify({'success': True, **chunked_upload_status(upload)})
 
-        except Exception as e:
-            import traceback
-            print(f"Errore nell'estrazione automatica: {traceback.format_exc()}")
-            # Fallback: immagine senza rettangoli
-            page_image = processor.get_page_image(page_num=0)
-            has_numbers = False
-            numbers_count = 0
-            extraction_method = 'none'
-            type_counts = {}
-            all_numbers = []
-
-        # Auto-analisi layout per PDF multi-pagina se esiste prompt predefinito
-        layout_analysis = None
-        auto_layout_executed = False
 
-        if page_count > 1:
-            try:
-                # Controlla se esiste un prompt layout predefinito
-                layout_prompts_file = os.path.join(app.config['LAYOUT_PROMPTS_FOLDER'], 'layout_prompts.json')
-
-                if os.path.exists(layout_prompts_file):
-                    with open(layout_prompts_file, 'r', encoding='utf-8') as f:
-                        layout_data = json.load(f)
-
-                    # Trova il prompt predefinito
-                    default_prompt = None
-                    for prompt in layout_data.get('prompts', []):
-                        if prompt.get('is_default', False):
-                            default_prompt = prompt
-                            break
-
-                    if default_prompt:
-                        print(f"PDF multi-pagina rilevato ({page_count} pagine) - Esecuzione auto-analisi layout con prompt predefinito: {default_prompt['name']}")
-
-                        # Esegui analisi layout
-                        current_provider = ai_manager.get_current_provider()
-                        if current_provider:
-                            provider_name = ai_manager.get_current_provider_name()
-
-                            # Raccogli tutte le immagini delle pagine
-                            all_page_images = []
-                            for page_num in range(page_count):
-                                page_image_b64 = processor.get_page_image(page_num=page_num)
-                                all_page_images.append(page_image_b64)
-
-                            # Analizza l'intero documento con tutte le pagine
-                            try:
-                                analysis = current_provider.analyze_vision(
-                                    default_prompt['content'],
-                                    all_page_images
-                                )
+@app.route('/upload/chunked/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def put_upload_chunk(upload_id, index):
+    """
+    Receive chunk index (raw request body). A chunk already received is acknowledged again
+    (retried request), one past next_chunk is refused with 409
+    """
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
 
-                                layout_analysis = {
-                                    'prompt_name': default_prompt['name'],
-                                    'prompt_id': default_prompt['id'],
-                                    'provider': provider_name,
-                                    'page_count': page_count,
-                                    'analysis': analysis
-                                }
-                                auto_layout_executed = True
-                                print(f"Auto-analisi layout completata con {provider_name} su {page_count} pagine")
-
-                            except Exception as e:
-                                print(f"Errore analisi documento: {str(e)}")
-                                layout_analysis = {
-                                    'prompt_name': default_prompt['name'],
-                                    'prompt_id': default_prompt['id'],
-                                    'provider': provider_name,
-                                    'page_count': page_count,
-                                    'error': str(e)
-                                }
-                                auto_layout_executed = True
+    try:
+        result = upload.write_chunk(index, request.stream, request.content_length or 0)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e), **chunked_upload_status(upload)}), 400
 
-            except Exception as e:
-                import traceback
-                print(f"Errore durante auto-analisi layout: {traceback.format_exc()}")
-                # Non bloccare l'upload se l'analisi layout fallisce
+    if result == 'out_of_order':
+        return jsonify({'success': False, 'error': f'Expected chunk {upload.next_chunk}',
+                        **chunked_upload_status(upload)}), 409
+    return jsonify({'success': True, 'stored': result == 'stored', **chunked_upload_status(upload)})
 
-        # Auto-estrazione dimensioni per PDF multi-pagina se esiste prompt predefinito
-        dimensions_extraction = None
-        auto_dimensions_executed = False
 
-        if page_count > 1:
-            try:
-                # Controlla se esiste un prompt dimensioni predefinito
-                dimension_prompts_file = os.path.join(app.config['DIMENSION_PROMPTS_FOLDER'], 'dimension_prompts.json')
+@app.route('/upload/chunked/<upload_id>/first_page.png')
+def chunked_upload_first_page(upload_id):
+    """
+    First page of a linearized PDF still being uploaded, rendered from its first page section
+    alone: available as soon as those bytes arrive, before the last chunk
+    """
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
 
-                if os.path.exists(dimension_prompts_file):
-                    with open(dimension_prompts_file, 'r', encoding='utf-8') as f:
-                        dimension_data = json.load(f)
-
-                    # Trova il prompt predefinito
-                    default_dim_prompt = None
-                    for prompt in dimension_data.get('prompts', []):
-                        if prompt.get('is_default', False):
-                            default_dim_prompt = prompt
-                            break
-
-                    if default_dim_prompt:
-                        print(f"PDF multi-pagina rilevato ({page_count} pagine) - Esecuzione auto-estrazione dimensioni con prompt predefinito: {default_dim_prompt['name']}")
-
-                        # Esegui estrazione dimensioni
-                        current_provider = ai_manager.get_current_provider()
-                        if current_provider:
-                            provider_name = ai_manager.get_current_provider_name()
-
-                            # Estrai dimensioni pagina per pagina
-                            results = []
-                            for page_num in range(page_count):
-                                page_image_b64 = processor.get_page_image(page_num=page_num)
-
-                                try:
-                                    dimensions_text = current_provider.analyze_vision(
-                                        default_dim_prompt['content'],
-                                        page_image_b64
-                                    )
-                                    results.append({
-                                        'page': page_num + 1,
-                                        'dimensions': dimensions_text
-                                    })
-                                    print(f"Dimensioni estratte per pagina {page_num + 1}")
-                                except Exception as e:
-                                    error_msg = str(e).lower()
-                                    # Check if it's a safety/blocking error
-                                    if any(keyword in error_msg for keyword in ['safety', 'finish_reason', 'blocked', 'recitation']):
-                                        print(f"Safety error detected on page {page_num + 1} with {provider_name}, retrying with increased temperature...")
-                                        dimensions_text = None
-                                        # Progressive retry with increments: +0.1, +0.2, +0.3, +0.4, +0.5
-                                        for increment in [0.1, 0.2, 0.3, 0.4, 0.5]:
-                                            print(f"  Attempt page {page_num + 1} with temperature +{increment}...")
-                                            retry_result = retry_vision_with_increased_temperature(
-                                                current_provider,
-                                                default_dim_prompt['content'],
-                                                page_image_b64,
-                                                provider_name,
-                                                increment
-                                            )
-                                            if retry_result:
-                                                dimensions_text = retry_result
-                                                print(f"  [OK] Success on page {page_num + 1} with temperature +{increment}")
-                                                break
-
-                                        if dimensions_text:
-                                            # Retry succeeded
-                                            results.append({
-                                                'page': page_num + 1,
-                                                'dimensions': dimensions_text
-                                            })
-                                        else:
-                                            # All retries failed
-                                            print(f"  [FAILED] All retry attempts failed for page {page_num + 1}")
-                                            results.append({
-                                                'page': page_num + 1,
-                                                'error': str(e)
-                                            })
-                                    else:
-                                        # Not a safety error, just register it
-                                        print(f"Errore estrazione dimensioni pagina {page_num + 1}: {str(e)}")
-                                        results.append({
-                                            'page': page_num + 1,
-                                            'error': str(e)
-                                        })
-
-                            dimensions_extraction = {
-                                'prompt_name': default_dim_prompt['name'],
-                                'prompt_id': default_dim_prompt['id'],
-                                'provider': provider_name,
-                                'results': results
-                            }
-                            auto_dimensions_executed = True
-                            print(f"Auto-estrazione dimensioni completata con {provider_name} su {page_count} pagine")
+    data = upload.first_page_data()
+    if data is None:
+        error = 'First page not received yet' if upload.linearization else 'PDF is not linearized'
+        return jsonify({'success': False, 'error': error}), 409
 
-            except Exception as e:
-                import traceback
-                print(f"Errore durante auto-estrazione dimensioni: {traceback.format_exc()}")
-                # Non bloccare l'upload se l'estrazione dimensioni fallisce
+    dpi = min(max(request.args.get('dpi', 72, type=int), MIN_IMAGE_DPI), MAX_IMAGE_DPI)
+    try:
+        # Il resto del file manca: MuPDF ricostruisce la xref dagli oggetti ricevuti
+        with fitz.open(stream=data, filetype='pdf') as doc:
+            png = doc[0].get_pixmap(dpi=dpi).tobytes('png')
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Cannot render first page: {e}'}), 409
 
-        # Calculate processing time
-        processing_time = time.time() - start_time
+    return Response(png, mimetype='image/png')
 
-        # Save to cache
-        try:
-            # Save document info
-            provider_name = None
-            if auto_dimensions_executed and dimensions_extraction:
-                provider_name = dimensions_extraction.get('provider')
-            elif auto_layout_executed and layout_analysis:
-                provider_name = layout_analysis.get('provider')
-
-            # Build structured analysis data
-            analysis_data = {
-                'pdf_type': pdf_type,
-                'extraction_method': extraction_method,
-                'page_count': page_count,
-                'processing_time': processing_time
-            }
 
-            # Add layout analysis if executed
-            if auto_layout_executed and layout_analysis:
-                analysis_data['layout_analysis'] = {
-                    'prompt_name': layout_analysis.get('prompt_name'),
-                    'prompt_id': layout_analysis.get('prompt_id'),
-                    'provider': layout_analysis.get('provider'),
-                    'analysis': layout_analysis.get('analysis'),
-                    'error': layout_analysis.get('error')
-                }
+@app.route('/upload/chunked/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    """
+    Complete a chunked upload: check the content hash (optional JSON {sha256}), store the file
+    under it, deduplicated against stored uploads and the document cache, and queue its processing
+    """
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
 
-            # Add dimensions extraction if executed
-            if auto_dimensions_executed and dimensions_extraction:
-                dim_data = {
-                    'prompt_name': dimensions_extraction.get('prompt_name'),
-                    'prompt_id': dimensions_extraction.get('prompt_id'),
-                    'provider': dimensions_extraction.get('provider'),
-                    'results_per_page': {}
-                }
+    expected_hash = ((request.get_json(silent=True) or {}).get('sha256') or '').lower()
 
-                # Organize results by page
-                for result in dimensions_extraction.get('results', []):
-                    page_num = result['page']
-                    dim_data['results_per_page'][str(page_num)] = {
-                        'dimensions_text': result.get('dimensions'),
-                        'error': result.get('error'),
-                        'success': 'error' not in result
-                    }
-
-                analysis_data['dimensions_extraction'] = dim_data
-
-            doc_id = doc_cache.save_document(
-                file_hash=file_hash,
-                filename=filename,
-                file_path=permanent_filepath,
-                page_count=page_count,
-                actual_processing_time=processing_time,
-                provider_name=provider_name,
-                analysis_data=analysis_data
-            )
+    with upload.lock:
+        if not os.path.exists(upload.data_path):
+            return jsonify({'success': False, 'error': 'Upload already finalized'}), 404
+        if not upload.complete:
+            return jsonify({'success': False, 'error': f'Upload incomplete: expected chunk {upload.next_chunk}',
+                            **chunked_upload_status(upload)}), 409
 
-            # Save page dimensions if auto-extracted
-            if auto_dimensions_executed and dimensions_extraction:
-                for result in dimensions_extraction['results']:
-                    page_num = result['page']
-                    if 'error' in result:
-                        # Failed extraction (SAFETY error or technical error)
-                        doc_cache.save_page_dimension(
-                            document_id=doc_id,
-                            page_number=page_num,
-                            error=result['error'],
-                            success=False
-                        )
-                    else:
-                        # Successful extraction (AI responded, regardless of content)
-                        # success=True means NO SAFETY/technical error
-                        doc_cache.save_page_dimension(
-                            document_id=doc_id,
-                            page_number=page_num,
-                            dimensions_text=result['dimensions'],
-                            success=True
-                        )
+        file_hash = upload.file_hash
+        if expected_hash and expected_hash != file_hash:
+            chunked_uploads.remove(upload)
+            return jsonify({'success': False, 'error': 'Hash mismatch: upload discarded',
+                            'file_hash': file_hash}), 400
 
-            # Save layout analysis if auto-executed
-            if auto_layout_executed and layout_analysis:
-                doc_cache.save_layout_analysis(
-                    document_id=doc_id,
-                    analysis_text=layout_analysis['analysis'],
-                    provider_name=layout_analysis['provider'],
-                    prompt_name=layout_analysis.get('prompt_name', 'default')
-                )
+        cached = doc_cache.get_document(file_hash, complete_only=True) is not None
+        if cached:
+            print(f"[Upload] {upload.filename} already in document cache ({file_hash[:16]}...)")
+        permanent_filepath = store_upload(upload.data_path, file_hash)
 
-            print(f"[Cache] Document saved to cache (processing time: {processing_time:.1f}s)")
-        except Exception as e:
-            print(f"[Cache] Error saving to cache: {str(e)}")
-            # Don't fail upload if cache save fails
+    chunked_uploads.remove(upload)
+    job = queue_upload_job(upload.filename, file_hash, permanent_filepath)
 
-        # Mark upload as complete
-        upload_status['status'] = 'complete'
-        upload_status['message'] = 'Elaborazione completata'
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'file_hash': file_hash,
+        'cached': cached,
+        'status_url': url_for('get_upload_job', job_id=job.id)
+    }), 202
 
-        return jsonify({
-            'success': True,
-            'pdf_type': pdf_type,
-            'page_count': page_count,
-            'pages_info': pages_info,
-            'full_text': full_text,
-            'page_image': page_image,
-            'has_numbers': has_numbers,
-            'numbers': all_numbers,
-            'numbers_count': numbers_count,
-            'extraction_method': extraction_method,
-            'type_counts': type_counts,
-            'auto_layout_executed': auto_layout_executed,
-            'layout_analysis': layout_analysis,
-            'auto_dimensions_executed': auto_dimensions_executed,
-            'dimensions_extraction': dimensions_extraction
-        })
 
-    return jsonify({'error': 'Invalid file type'}), 400
+@app.route('/upload/chunked/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    """Abort a chunked upload and delete the received data"""
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+
+    with upload.lock:
+        chunked_uploads.remove(upload)
+    return jsonify({'success': True})
 
 
 @app.route('/get_page/<int:page_num>')
@@ -2304,15 +2759,103 @@ def get_page(page_num):
     if not os.path.exists(filepath):
         return jsonify({'error': 'No PDF loaded'}), 400
 
-    processor = PDFProcessor(filepath)
-    page_image = processor.get_page_image(page_num=page_num)
+    file_hash = get_file_hash(filepath)
 
     return jsonify({
         'success': True,
-        'page_image': page_image
+        'page_image_url': page_image_url_for(file_hash, page_num)
     })
 
 
+@app.route('/images/page/<file_hash>/<int:page_num>.<fmt>')
+def page_image(file_hash, page_num, fmt):
+    """Rendered page as binary image (png/webp/jpeg), cacheable forever by URL"""
+    if fmt not in IMAGE_FORMATS:
+        return jsonify({'error': f'Unsupported image format: {fmt}'}), 400
+    if not FILE_HASH_PATTERN.match(file_hash):
+        return jsonify({'error': 'Invalid image id'}), 400
+
+    dpi = min(max(request.args.get('dpi', 150, type=int), MIN_IMAGE_DPI), MAX_IMAGE_DPI)
+
+    # Content is fully determined by (hash, page, dpi, format): answer revalidations without rendering
+    etag = f"{file_hash}-{page_num}-{dpi}-{fmt}"
+    if request.if_none_match.contains(etag):
+        return binary_image_response(b'', fmt, etag)
+
+    data = get_page_image_bytes(file_hash, page_num, dpi=dpi, fmt=fmt)
+    if data is None:
+        return jsonify({'error': 'Page not found'}), 404
+
+    return binary_image_response(data, fmt, etag)
+
+
+@app.route('/images/tiles/<file_hash>/<int:page_num>/info')
+def page_tiles_info(file_hash, page_num):
+    """Describe the deep-zoom pyramid of a page so the viewer can request visible tiles only"""
+    fmt = request.args.get('format', 'webp')
+    if fmt not in IMAGE_FORMATS:
+        return jsonify({'error': f'Unsupported image format: {fmt}'}), 400
+
+    pdf_path = get_document_path(file_hash)
+    if not pdf_path:
+        return jsonify({'error': 'Document not found'}), 404
+
+    pyramid = PDFProcessor(pdf_path, file_hash=file_hash).get_tile_pyramid(page_num)
+    if pyramid is None:
+        return jsonify({'error': 'Page not found'}), 404
+
+    info = pyramid.to_dict()
+    info['success'] = True
+    # {z}, {x}, {y} are filled in by the viewer (the route only builds integer coordinates)
+    page_url = url_for('page_tile', file_hash=file_hash, page_num=page_num, level=0, x=0, y=0, fmt=fmt)
+    info['tile_url'] = page_url.rsplit('/', 2)[0] + f"/{{z}}/{{x}}_{{y}}.{fmt}"
+    return jsonify(info)
+
+
+@app.route('/images/tiles/<file_hash>/<int:page_num>/<int:level>/<int:x>_<int:y>.<fmt>')
+def page_tile(file_hash, page_num, level, x, y, fmt):
+    """Single deep-zoom tile, rendered on demand with a clip rectangle"""
+    if fmt not in IMAGE_FORMATS:
+        return jsonify({'error': f'Unsupported image format: {fmt}'}), 400
+    if not FILE_HASH_PATTERN.match(file_hash):
+        return jsonify({'error': 'Invalid image id'}), 400
+
+    # Tile size and max DPI are part of the ETag: changing them invalidates client copies
+    etag = (f"{file_hash}-{page_num}-t{app.config['TILE_SIZE']}-{app.config['TILE_MAX_DPI']}"
+            f"-{level}-{x}-{y}-{fmt}")
+    if request.if_none_match.contains(etag):
+        return binary_image_response(b'', fmt, etag)
+
+    pdf_path = get_document_path(file_hash)
+    if not pdf_path:
+        return jsonify({'error': 'Document not found'}), 404
+
+    data = PDFProcessor(pdf_path, file_hash=file_hash).get_page_tile(page_num, level, x, y, fmt=fmt)
+    if data is None:
+        return jsonify({'error': 'Tile not found'}), 404
+
+    return binary_image_response(data, fmt, etag)
+
+
+@app.route('/images/overlay/<file_hash>/<int:page_num>/<digest>.<fmt>')
+def overlay_image(file_hash, page_num, digest, fmt):
+    """Page image with extraction boxes, addressed by the digest of the drawn data"""
+    if fmt not in IMAGE_FORMATS:
+        return jsonify({'error': f'Unsupported image format: {fmt}'}), 400
+    if not FILE_HASH_PATTERN.match(file_hash) or not re.match(r'^[0-9a-f]{32}$', digest):
+        return jsonify({'error': 'Invalid image id'}), 400
+
+    etag = f"{file_hash}-{page_num}-{digest}-{fmt}"
+    if request.if_none_match.contains(etag):
+        return binary_image_response(b'', fmt, etag)
+
+    data = get_overlay_image_bytes(file_hash, page_num, digest, fmt=fmt)
+    if data is None:
+        return jsonify({'error': 'Image not found'}), 404
+
+    return binary_image_response(data, fmt, etag)
+
+
 @app.route('/extract_pdfplumber', methods=['POST'])
 def extract_pdfplumber():
     data = request.json
@@ -2349,25 +2892,27 @@ def extract_ocr():
 
     processor = PDFProcessor(filepath)
 
-    # Get page as PIL image
-    image = processor.get_page_as_pil(page_num=page_num, dpi=300)
-    if not image:
+    # Render page straight into a NumPy array (no PNG round trip)
+    page_array = processor.get_page_array(page_num=page_num, dpi=300)
+    if page_array is None:
         return jsonify({'error': 'Could not load page'}), 500
-
-    # Apply rotation if needed
-    if rotation != 0:
-        image = image.rotate(-rotation, expand=True)
-
-    # Run OCR
-    custom_config = f'--psm {psm_mode} --oem 3'
-    text = pytesseract.image_to_string(image, config=custom_config, lang='ita+eng')
-
-    ocr_data = pytesseract.image_to_data(
-        image,
-        config=custom_config,
-        lang='ita+eng',
-        output_type=pytesseract.Output.DICT
-    )
+    # Le rotazioni non multiple di 90° passano da PIL (stessi pixel, stesso digest)
+    image = page_array if rotation % 90 == 0 else Image.fromarray(page_array)
+
+    # Run OCR (rotation applied inside, only when the result is not cached)
+    image_digest = compute_image_digest(image)
+    ocr_data = run_cached_ocr(image, rotation, [psm_mode], f"OCR pagina {page_num + 1}",
+                              preprocess='none', image_digest=image_digest)[0]
+
+    text_key = doc_cache.compute_ocr_key(image_digest, 'none', psm_mode, 3, 'ita+eng', rotation, output='string')
+    cached_text = doc_cache.get_ocr_result(text_key)
+    if cached_text is not None:
+        text = cached_text['string']
+    else:
+        custom_config = f'--psm {psm_mode} --oem 3'
+        text = pytesseract.image_to_string(rotate_image(image, rotation) if rotation != 0 else image,
+                                           config=custom_config, lang='ita+eng')
+        doc_cache.save_ocr_result(text_key, {'string': text}, psm=psm_mode, rotation=rotation)
 
     # Format OCR data
     words = []
@@ -2397,6 +2942,10 @@ def extract_numbers_advanced_route():
     data = request.json
     page_num = data.get('page_num', 0)
     min_conf = data.get('min_conf', 60)
+    preprocess_profile = data.get('preprocess_profile')
+    text_regions = data.get('text_regions')
+    if preprocess_profile and preprocess_profile not in PREPROCESS_PROFILES:
+        return jsonify({'error': f'Unknown preprocess_profile: {preprocess_profile}'}), 400
 
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], 'current.pdf')
     if not os.path.exists(filepath):
@@ -2404,21 +2953,27 @@ def extract_numbers_advanced_route():
 
     processor = PDFProcessor(filepath)
 
-    # Get page as PIL image
-    image = processor.get_page_as_pil(page_num=page_num, dpi=300)
-    if not image:
+    # Render page straight into a NumPy array (no PNG round trip)
+    page_array = processor.get_page_array(page_num=page_num, dpi=300)
+    if page_array is None:
         return jsonify({'error': 'Could not load page'}), 500
+    image = Image.fromarray(page_array)
 
     # Salva l'immagine originale per future operazioni
     original_path = os.path.join(app.config['UPLOAD_FOLDER'], 'original.png')
     image.save(original_path)
 
     # Extract numbers with advanced processing (returns 3 values now)
-    all_numbers, numbers_0deg, numbers_90deg = extract_numbers_advanced(image, min_conf=min_conf)
+    with measure_page_memory(page_array) as render_stats:
+        all_numbers, numbers_0deg, numbers_90deg = extract_numbers_advanced(
+            page_array, min_conf=min_conf, preprocess_profile=preprocess_profile,
+            text_regions=text_regions)
 
     # Draw unified boxes on image
     img_with_boxes = draw_unified_boxes(image, numbers_0deg, numbers_90deg)
-    img_base64 = image_to_base64(img_with_boxes)
+    file_hash = processor.get_file_hash()
+    image_url = store_overlay_image(img_with_boxes, file_hash, page_num,
+                                    {'0deg': numbers_0deg, '90deg': numbers_90deg})
 
     # Salva i risultati per la route highlight
     results_path = os.path.join(app.config['UPLOAD_FOLDER'], 'ocr_results.json')
@@ -2426,7 +2981,9 @@ def extract_numbers_advanced_route():
         json.dump({
             'all_numbers': all_numbers,
             'numbers_0deg': numbers_0deg,
-            'numbers_90deg': numbers_90deg
+            'numbers_90deg': numbers_90deg,
+            'file_hash': file_hash,
+            'page_num': page_num
         }, f, ensure_ascii=False, indent=2)
 
     return jsonify({
@@ -2435,7 +2992,8 @@ def extract_numbers_advanced_route():
         'count': len(all_numbers),
         'count_0deg': len(numbers_0deg),
         'count_90deg': len(numbers_90deg),
-        'image': img_base64
+        'image_url': image_url,
+        'render_stats': render_stats
     })
 
 
@@ -2452,6 +3010,10 @@ def extract_unified():
     data = request.json
     page_num = data.get('page_num', 0)
     min_conf = data.get('min_conf', 60)
+    preprocess_profile = data.get('preprocess_profile')
+    text_regions = data.get('text_regions')
+    if preprocess_profile and preprocess_profile not in PREPROCESS_PROFILES:
+        return jsonify({'error': f'Unknown preprocess_profile: {preprocess_profile}'}), 400
 
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], 'current.pdf')
     if not os.path.exists(filepath):
@@ -2462,6 +3024,7 @@ def extract_unified():
     print(f"[Unified] Pagina {page_num + 1} rilevata come: {page_type}")
 
     processor = PDFProcessor(filepath)
+    render_stats = None
 
     if page_type == 'textual':
         # Usa pdfplumber per PDF testuali
@@ -2477,12 +3040,16 @@ def extract_unified():
     else:
         # Usa OCR per PDF rasterizzati
         print("[Unified] Usando OCR per estrazione...")
-        image = processor.get_page_as_pil(page_num=page_num, dpi=300)
-        if not image:
+        page_array = processor.get_page_array(page_num=page_num, dpi=300)
+        if page_array is None:
             return jsonify({'error': 'Could not load page'}), 500
+        image = Image.fromarray(page_array)
 
         # Extract numbers with advanced processing
-        all_numbers, numbers_0deg, numbers_90deg = extract_numbers_advanced(image, min_conf=min_conf)
+        with measure_page_memory(page_array) as render_stats:
+            all_numbers, numbers_0deg, numbers_90deg = extract_numbers_advanced(
+                page_array, min_conf=min_conf, preprocess_profile=preprocess_profile,
+                text_regions=text_regions)
         extraction_method = 'ocr'
 
     # Salva l'immagine originale per future operazioni
@@ -2491,7 +3058,9 @@ def extract_unified():
 
     # Draw unified boxes on image
     img_with_boxes = draw_unified_boxes(image, numbers_0deg, numbers_90deg)
-    img_base64 = image_to_base64(img_with_boxes)
+    file_hash = processor.get_file_hash()
+    image_url = store_overlay_image(img_with_boxes, file_hash, page_num,
+                                    {'0deg': numbers_0deg, '90deg': numbers_90deg})
 
     # Salva i risultati per la route highlight
     results_path = os.path.join(app.config['UPLOAD_FOLDER'], 'ocr_results.json')
@@ -2500,7 +3069,9 @@ def extract_unified():
             'all_numbers': all_numbers,
             'numbers_0deg': numbers_0deg,
             'numbers_90deg': numbers_90deg,
-            'extraction_method': extraction_method
+            'extraction_method': extraction_method,
+            'file_hash': file_hash,
+            'page_num': page_num
         }, f, ensure_ascii=False, indent=2)
 
     return jsonify({
@@ -2509,9 +3080,10 @@ def extract_unified():
         'count': len(all_numbers),
         'count_0deg': len(numbers_0deg),
         'count_90deg': len(numbers_90deg),
-        'image': img_base64,
+        'image_url': image_url,
         'extraction_method': extraction_method,
-        'page_type': page_type
+        'page_type': page_type,
+        'render_stats': render_stats
     })
 
 
@@ -2535,22 +3107,28 @@ def highlight_item(item_id):
             results = json.load(f)
 
         extraction_method = results.get('extraction_method', 'ocr')
+        # Risultati salvati prima degli URL immagine non hanno hash/pagina
+        file_hash = results.get('file_hash') or get_file_hash(
+            os.path.join(app.config['UPLOAD_FOLDER'], 'current.pdf'))
+        page_num = results.get('page_num', 0)
 
         if extraction_method == 'pdfplumber':
             # Usa rettangoli colorati per tipo
             all_numbers = results['all_numbers']
             img_with_boxes = draw_pdfplumber_boxes(image, 300, all_numbers, highlight_id=item_id)
+            overlay_data = {'pdfplumber': all_numbers, 'highlight': item_id}
         else:
             # Usa rettangoli blu/fucsia per OCR
             numbers_0deg = results.get('numbers_0deg', [])
             numbers_90deg = results.get('numbers_90deg', [])
             img_with_boxes = draw_unified_boxes(image, numbers_0deg, numbers_90deg, highlight_id=item_id)
+            overlay_data = {'0deg': numbers_0deg, '90deg': numbers_90deg, 'highlight': item_id}
 
-        img_base64 = image_to_base64(img_with_boxes)
+        image_url = store_overlay_image(img_with_boxes, file_hash, page_num, overlay_data)
 
         return jsonify({
             'success': True,
-            'image': img_base64
+            'image_url': image_url
         })
 
     except Exception as e:
@@ -2607,7 +3185,7 @@ def opus_vision():
     """Feature 2: Vision-guided extraction with Opus"""
     try:
         data = request.json
-        image_base64 = data.get('image')
+        image_base64 = resolve_image_payload(data.get('image'))
 
         if not image_base64:
             return jsonify({'error': 'Immagine non fornita'}), 400
@@ -2641,7 +3219,7 @@ def opus_ask():
         # Load full text
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], 'current.pdf')
         processor = PDFProcessor(filepath)
-        full_text = processor.get_full_text_pdfplumber()
+        full_text = processor.get_full_text_pdfplumber(max_chars=QA_CONTEXT_CHARS)
 
         # Load extracted data
         results_path = os.path.join(app.config['UPLOAD_FOLDER'], 'ocr_results.json')
@@ -2669,7 +3247,7 @@ def opus_summarize():
         # Load full text
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], 'current.pdf')
         processor = PDFProcessor(filepath)
-        full_text = processor.get_full_text_pdfplumber()
+        full_text = processor.get_full_text_pdfplumber(max_chars=SUMMARY_CONTEXT_CHARS)
         pdf_type, _ = processor.detect_pdf_type()
 
         # Load extracted data
@@ -2784,8 +3362,16 @@ def ai_status():
 
 @app.route('/upload_status')
 def get_upload_status():
-    """Get current upload/processing status"""
-    return jsonify(upload_status)
+    """Get status of the most recent upload (legacy global status; per-job: /upload/jobs/<job_id>)"""
+    job = upload_jobs.latest
+    if job is None:
+        return jsonify({'status': 'idle', 'message': '', 'page': 0, 'total_pages': 0,
+                        'retry_attempt': 0, 'temperature': 0.0, 'from_cache': False})
+
+    status = job.to_dict(include_result=False)
+    # Stato legacy: fase dell'elaborazione (uploading, analyzing, extracting, ..., retry, complete)
+    status['status'] = 'error' if status['status'] == 'error' else status['stage']
+    return jsonify(status)
 
 
 @app.route('/cache/documents')
@@ -2805,6 +3391,38 @@ def get_cached_documents():
         }), 500
 
 
+@app.route('/cache/search')
+def search_cached_text():
+    """Search page text of all cached documents (part numbers, materials, dimension strings)"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'success': False, 'error': 'Missing query parameter q'}), 400
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+
+        start = time.perf_counter()
+        results = doc_cache.search_page_text(query, limit=limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        return jsonify({
+            'success': True,
+            'query': query,
+            'results': [{
+                'file_hash': result['file_hash'],
+                'filename': result['filename'],
+                'page_number': result['page_num'] + 1,
+                'excerpt': result['excerpt']
+            } for result in results],
+            'elapsed_ms': round(elapsed_ms, 2)
+        })
+    except Exception as e:
+        print(f"[Cache] Error searching text: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @app.route('/cache/document/<file_hash>')
 def load_cached_document(file_hash):
     """Load a specific document from cache by file hash"""
@@ -2898,11 +3516,9 @@ def get_cached_document_page(file_hash, page_number):
                 'error': 'PDF file not found on disk'
             }), 404
 
-        # Load PDF and get page image
-        processor = PDFProcessor(file_path)
-        page_image = processor.get_page_image(page_num=page_number - 1)  # 0-indexed
-
-        if not page_image:
+        # Check page range, the image itself is served by the page image route
+        processor = PDFProcessor(file_path, file_hash=file_hash)
+        if page_number < 1 or page_number > processor.get_page_count():
             return jsonify({
                 'success': False,
                 'error': f'Could not load page {page_number}'
@@ -2910,7 +3526,7 @@ def get_cached_document_page(file_hash, page_number):
 
         return jsonify({
             'success': True,
-            'page_image': page_image,
+            'page_image_url': page_image_url_for(file_hash, page_number - 1),  # 0-indexed
             'page_number': page_number
         })
 
@@ -2927,8 +3543,6 @@ def get_cached_document_page(file_hash, page_number):
 def reload_cached_document_for_extraction(file_hash):
     """Reload cached document PDF file to enable extraction"""
     try:
-        import shutil
-
         cached_doc = doc_cache.get_document(file_hash)
         if not cached_doc:
             return jsonify({'success': False, 'error': 'Document not found'}), 404
@@ -2957,8 +3571,8 @@ def reload_cached_document_for_extraction(file_hash):
         if not os.path.exists(file_path):
             return jsonify({'success': False, 'error': 'PDF file not found in cache'}), 404
 
-        # Copy PDF to current.pdf for extraction
-        shutil.copy2(file_path, current_path)
+        # Link PDF as current.pdf for extraction (atomic replace, the cached file is never written)
+        set_current_pdf(file_path)
 
         print(f"[Cache] Reloaded PDF for extraction: {cached_doc['filename']}")
 
@@ -3018,6 +3632,8 @@ def delete_cached_document(file_hash):
 
         # Delete document and all associated data
         doc_cache.delete_document(file_hash)
+        raster_cache.delete_document(file_hash)
+        doc_pool.close_document(file_hash)
 
         return jsonify({
             'success': True,
@@ -3190,12 +3806,24 @@ def get_pdf_text():
             return jsonify({'success': False, 'error': 'No PDF loaded'}), 404
 
         processor = PDFProcessor(filepath)
-        full_text = processor.get_full_text_pdfplumber()
+        text_chunks = processor.iter_full_text()
+        # Apertura del documento e prima pagina prima della risposta: gli errori iniziali restano un 500
+        first_chunk = next(text_chunks, '')
+
+        def generate():
+            # Stesso JSON di jsonify, prodotto pagina per pagina: "success" chiude l'oggetto,
+            # così un errore a metà flusso dà comunque JSON valido ({"text": parziale, "success": false, "error"})
+            yield '{"text": "' + json.dumps(first_chunk)[1:-1]
+            try:
+                for chunk in text_chunks:
+                    yield json.dumps(chunk)[1:-1]
+            except Exception as e:
+                print(f"[Text] Streaming interrotto: {e}")
+                yield '", "success": false, "error": ' + json.dumps(str(e)) + '}\n'
+                return
+            yield '", "success": true}\n'
 
-        return jsonify({
-            'success': True,
-            'text': full_text
-        })
+        return Response(stream_with_context(generate()), mimetype='application/json')
 
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -3323,7 +3951,8 @@ def retry_with_increased_temperature(provider, prompt, text, provider_name, temp
         return None
 
 
-def retry_vision_with_increased_temperature(provider, prompt, image_base64, provider_name, temp_increment=0.1):
+def retry_vision_with_increased_temperature(provider, prompt, image_base64, provider_name, temp_increment=0.1,
+                                            limiter=None):
     """
     Retry vision AI call with temporarily increased temperature without modifying saved values.
 
@@ -3333,6 +3962,7 @@ def retry_vision_with_increased_temperature(provider, prompt, image_base64, prov
         image_base64: Base64 encoded image
         provider_name: Provider name string
         temp_increment: Temperature increment (default 0.1)
+        limiter: ProviderLimiter the API call goes through (optional)
 
     Returns:
         Response text or None if retry fails.
@@ -3358,10 +3988,11 @@ def retry_vision_with_increased_temperature(provider, prompt, image_base64, prov
             image_data = base64.b64decode(image_base64)
             image = PIL.Image.open(io.BytesIO(image_data))
 
-            response = provider.client.generate_content(
-                [prompt, image],
-                generation_config=generation_config
-            )
+            with limiter.request() if limiter else nullcontext():
+                response = provider.client.generate_content(
+                    [prompt, image],
+                    generation_config=generation_config
+                )
 
             # Handle safety blocks
             if not response.candidates:
@@ -3683,6 +4314,40 @@ def get_pdf_info():
         return jsonify({'error': str(e)}), 500
 
 
+# Contiguous page ranges per worker process (more ranges than workers balances dense pages)
+EXTRACT_RANGES_PER_WORKER = 4
+
+
+def extract_pages_parallel(pdf_path, page_count):
+    """
+    extract_data_from_pdfplumber for every page, one list per page in page order.
+    Contiguous page ranges are spread over the shared extract_pool (EXTRACT_WORKERS processes
+    in total, whatever the number of concurrent requests), each worker keeping the document
+    open across its ranges; results are merged in range order
+    """
+    workers = min(extract_pool.max_workers, page_count)
+    if workers <= 1:
+        return [extract_data_from_pdfplumber(pdf_path, page_num) for page_num in range(page_count)]
+
+    processor = PDFProcessor(pdf_path)
+    file_hash = processor.get_file_hash()
+    # I worker aprono la copia indicizzata per hash: current.pdf può essere sostituito nel frattempo
+    document_path = get_document_path(file_hash) or pdf_path
+
+    size = -(-page_count // (workers * EXTRACT_RANGES_PER_WORKER))
+    ranges = [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+    start_time = time.perf_counter()
+    try:
+        pages = extract_pool.extract_ranges(document_path, file_hash, processor.text_backend, ranges)
+    except BrokenProcessPool as e:
+        print(f"[Extract] Pool dei worker interrotto ({e}): estrazione nel processo")
+        return [extract_data_from_pdfplumber(pdf_path, page_num) for page_num in range(page_count)]
+    print(f"[Extract] {page_count} pagine in {time.perf_counter() - start_time:.2f}s "
+          f"({workers} processi, {len(ranges)} intervalli)")
+    return pages
+
+
 @app.route('/extract_all_pages_pdfplumber', methods=['POST'])
 def extract_all_pages_pdfplumber():
     """Extract data from all pages using pdfplumber"""
@@ -3695,8 +4360,7 @@ def extract_all_pages_pdfplumber():
         page_count = processor.get_page_count()
 
         all_data = []
-        for page_num in range(page_count):
-            page_data = extract_numbers_from_pdfplumber(filepath, page_num)
+        for page_data in extract_pages_parallel(filepath, page_count):
             all_data.extend(page_data)
 
         # Save to results file
@@ -4292,22 +4956,15 @@ def analyze_layout():
         if not os.path.exists(pdf_path):
             return jsonify({'error': 'Nessun PDF caricato'}), 400
 
-        # Open PDF and get page count
-        pdf_document = fitz.open(pdf_path)
-        total_pages = len(pdf_document)
+        # Get page count from the shared document handle
+        processor = PDFProcessor(pdf_path)
+        total_pages = processor.get_page_count()
 
         # Analyze all pages
         results = []
         for page_num in range(total_pages):
-            page = pdf_document[page_num]
-
-            # Convert page to image
-            zoom = 2.0  # Higher resolution for better analysis
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat)
-
-            # Convert to PNG bytes
-            img_data = pix.tobytes("png")
+            # Convert page to PNG (zoom 2.0 = 144 DPI, higher resolution for better analysis)
+            img_data = processor.get_page_png(page_num=page_num, dpi=144)
 
             # Convert to base64
             image_base64 = base64.b64encode(img_data).decode('utf-8')
@@ -4328,8 +4985,6 @@ def analyze_layout():
                     'analysis': f'Errore analisi: {str(page_error)}'
                 })
 
-        pdf_document.close()
-
         # Format results
         formatted_analysis = f"=== ANALISI LAYOUT DOCUMENTO ===\n"
         formatted_analysis += f"Totale pagine: {total_pages}\n"
@@ -4369,7 +5024,7 @@ def extract_dimensions():
 
         data = request.json
         prompt = data.get('prompt')
-        image_base64 = data.get('image')
+        image_base64 = resolve_image_payload(data.get('image'))
 
         if not prompt:
             return jsonify({'error': 'Prompt richiesto'}), 400
@@ -4423,7 +5078,7 @@ def extract_dimensions_with_context():
 
         data = request.json
         prompt = data.get('prompt')
-        image_base64 = data.get('image')
+        image_base64 = resolve_image_payload(data.get('image'))
         context = data.get('context', {})
 
         if not prompt:
@@ -4496,6 +5151,13 @@ def get_cache_stats():
     """Get cache statistics"""
     try:
         stats = doc_cache.get_cache_stats()
+        stats['raster'] = raster_cache.get_stats()
+        stats['document_pool'] = doc_pool.get_stats()
+        stats['ocr'] = ocr_executor.get_stats()
+        stats['preprocess'] = preprocess_pipeline.get_stats()
+        stats['jobs'] = upload_jobs.get_stats()
+        stats['chunked_uploads'] = chunked_uploads.get_stats()
+        stats['ai_limits'] = ai_limits.get_stats()
         return jsonify({
             'success': True,
             'stats': stats
@@ -4510,6 +5172,8 @@ def clear_document_cache(file_hash):
     """Clear cache for specific document"""
     try:
         doc_cache.delete_document(file_hash)
+        raster_cache.delete_document(file_hash)
+        doc_pool.close_document(file_hash)
         return jsonify({
             'success': True,
             'message': 'Document cache cleared'
@@ -4524,6 +5188,8 @@ def clear_all_cache():
     """Clear all cached documents"""
     try:
         doc_cache.clear_all_cache()
+        raster_cache.clear()
+        doc_pool.close_all()
         return jsonify({
             'success': True,
             'message': 'All cache cleared'
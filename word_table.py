@@ -0,0 +1,106 @@
+"""
+Word Table
+Columnar representation of the words of a page (text list + float64 coordinate
+columns in PDF points, top-left origin), so the pdfplumber pipeline filters,
+sorts and measures words with array operations instead of allocating a dict
+per word at every stage. Dicts are built only at the API boundary (to_records)
+"""
+
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+
+class WordTable:
+    __slots__ = ('text', 'x0', 'x1', 'top', 'bottom')
+
+    COORDINATES = ('x0', 'x1', 'top', 'bottom')
+
+    def __init__(self, text: List[str], x0: Sequence[float], x1: Sequence[float],
+                 top: Sequence[float], bottom: Sequence[float]):
+        self.text = list(text)
+        self.x0 = np.asarray(x0, dtype=np.float64)
+        self.x1 = np.asarray(x1, dtype=np.float64)
+        self.top = np.asarray(top, dtype=np.float64)
+        self.bottom = np.asarray(bottom, dtype=np.float64)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'WordTable':
+        """Build from pdfplumber words/chars (any dict with text, x0, x1, top, bottom)"""
+        records = list(records)
+        return cls([r['text'] for r in records],
+                   *([r[column] for r in records] for column in cls.COORDINATES))
+
+    @classmethod
+    def concat(cls, tables: List['WordTable']) -> 'WordTable':
+        """Rows of all tables, in order"""
+        return cls([text for table in tables for text in table.text],
+                   *(np.concatenate([getattr(table, column) for table in tables]) for column in cls.COORDINATES))
+
+    def __len__(self):
+        return len(self.text)
+
+    def take(self, indices) -> 'WordTable':
+        """Subset/reorder rows (integer indices or boolean mask)"""
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        indices = indices.astype(np.intp, copy=False)
+        return WordTable([self.text[i] for i in indices.tolist()],
+                         *(getattr(self, column)[indices] for column in self.COORDINATES))
+
+    @property
+    def width(self) -> np.ndarray:
+        return self.x1 - self.x0
+
+    @property
+    def height(self) -> np.ndarray:
+        return self.bottom - self.top
+
+    @property
+    def center_x(self) -> np.ndarray:
+        return self.x0 + (self.x1 - self.x0) / 2
+
+    @property
+    def center_y(self) -> np.ndarray:
+        return self.top + (self.bottom - self.top) / 2
+
+    def record(self, i: int) -> Dict:
+        """One row as a word dict"""
+        return {'text': self.text[i], 'x0': float(self.x0[i]), 'x1': float(self.x1[i]),
+                'top': float(self.top[i]), 'bottom': float(self.bottom[i])}
+
+    def to_records(self) -> List[Dict]:
+        """All rows as word dicts (API boundary)"""
+        return [{'text': text, 'x0': x0, 'x1': x1, 'top': top, 'bottom': bottom}
+                for text, x0, x1, top, bottom in zip(self.text, self.x0.tolist(), self.x1.tolist(),
+                                                     self.top.tolist(), self.bottom.tolist())]
+
+
+class WordTableBuilder:
+    """Accumulates rows (copied from a table or merged) for a stage's output table"""
+
+    def __init__(self):
+        self.text = []
+        self.x0 = []
+        self.x1 = []
+        self.top = []
+        self.bottom = []
+
+    def add(self, text: str, x0: float, x1: float, top: float, bottom: float):
+        self.text.append(text)
+        self.x0.append(x0)
+        self.x1.append(x1)
+        self.top.append(top)
+        self.bottom.append(bottom)
+
+    def add_row(self, table: WordTable, i: int):
+        self.add(table.text[i], table.x0[i], table.x1[i], table.top[i], table.bottom[i])
+
+    def add_merged(self, table: WordTable, indices: List[int], text: str):
+        """Row spanning the union bbox of the given rows"""
+        self.add(text, table.x0[indices].min(), table.x1[indices].max(),
+                 table.top[indices].min(), table.bottom[indices].max())
+
+    def build(self) -> WordTable:
+        return WordTable(self.text, self.x0, self.x1, self.top, self.bottom)